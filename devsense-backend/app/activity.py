@@ -0,0 +1,23 @@
+import json
+from pathlib import Path
+from datetime import datetime
+
+
+def log_activity(project_name: str, action: str, details: dict = None):
+    """Helper function to log activities"""
+    logs_dir = Path("data/logs")
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    log_file = logs_dir / f"{project_name}_logs.jsonl"
+
+    log_entry = {
+        "timestamp": datetime.now().isoformat(),
+        "action": action,
+        "details": details or {}
+    }
+
+    try:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(log_entry) + '\n')
+    except Exception as e:
+        print(f"Error writing log: {e}")
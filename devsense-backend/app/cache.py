@@ -1,9 +1,196 @@
-QUERY_CACHE = {}
+"""
+Answer cache for the query path.
 
+Answers are keyed by project, index generation, the normalized question,
+the retrieval parameters and a digest of the chat history the question was
+asked after, so a repeated question is answered without embedding it or
+calling the LLM, a re-ingest (new generation) never serves a stale answer
+and a follow-up ("what does it return?") is never answered from another
+conversation. Entries also remember the chunk ids the answer was
+built from; with ANSWER_CACHE_SIMILARITY set, a differently worded question
+that retrieves the same chunks and whose embedding is close enough reuses
+the answer too, skipping just the LLM call.
 
-def get_cached(query: str):
-    return QUERY_CACHE.get(query)
+Entries expire after ANSWER_CACHE_TTL_SECONDS and the least recently used
+are evicted once the cache passes its memory budget.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
 
+import numpy as np
 
-def set_cache(query: str, response: str):
-    QUERY_CACHE[query] = response
\ No newline at end of file
+from app.config import ANSWER_CACHE_ENABLED, ANSWER_CACHE_MAX_MB, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY
+
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def normalize_query(query: str):
+    """Case- and whitespace-insensitive form of a question, ignoring trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+def history_digest(history):
+    """Digest of the chat history a question follows, or None for a fresh session."""
+    if not history:
+        return None
+    data = json.dumps([[message["role"], message["content"]] for message in history])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _scope(key, chunk_ids):
+    # project, generation and history: answers are only similar within one conversation state
+    return (key[0], key[1], key[-1], tuple(chunk_ids))
+
+
+class CachedAnswer:
+    def __init__(self, key, answer, chunk_ids, vector, expires_at):
+        self.key = key
+        self.answer = answer
+        self.chunk_ids = tuple(chunk_ids)
+        self.vector = vector
+        self.expires_at = expires_at
+        self.nbytes = (
+            ENTRY_OVERHEAD_BYTES
+            + len(answer.encode("utf-8"))
+            + len(key[2].encode("utf-8"))
+            + 8 * len(self.chunk_ids)
+            + (vector.nbytes if vector is not None else 0)
+        )
+
+
+class AnswerCache:
+    def __init__(self, max_bytes: int = ANSWER_CACHE_MAX_MB * 1024 * 1024,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._by_chunks = {}  # (project, generation, history, chunk ids) -> keys, for similarity lookups
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(project_name, generation, query, top_k=None, nprobe=None, ef_search=None, history=None):
+        return (project_name, generation, normalize_query(query), top_k, nprobe, ef_search, history_digest(history))
+
+    # ----------------------------
+    # LOOKUP
+    # ----------------------------
+    def get(self, key):
+        """Exact lookup; returns the CachedAnswer or None."""
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_similar(self, key, chunk_ids, vector):
+        """Find an answer to a near-duplicate question that retrieved the same chunks."""
+        if self.similarity <= 0 or vector is None:
+            return None
+
+        vector = _unit(vector)
+        scope = _scope(key, chunk_ids)
+        with self._lock:
+            best, best_score = None, self.similarity
+            for other_key in list(self._by_chunks.get(scope, ())):
+                entry = self._live_entry(other_key)
+                if entry is None or entry.vector is None:
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score >= best_score:
+                    best, best_score = entry, score
+
+            if best is None:
+                return None
+            self._entries.move_to_end(best.key)
+            # the exact-key miss was already counted by get()
+            self.misses -= 1
+            self.semantic_hits += 1
+            return best
+
+    def _live_entry(self, key):
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    # ----------------------------
+    # STORE
+    # ----------------------------
+    def put(self, key, answer, chunk_ids, vector=None):
+        vector = _unit(vector) if vector is not None and self.similarity > 0 else None
+        entry = CachedAnswer(key, answer, chunk_ids, vector, time.time() + self.ttl_seconds)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_chunks.setdefault(_scope(key, entry.chunk_ids), []).append(key)
+            self._total_bytes += entry.nbytes
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        # caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.nbytes
+        scope = _scope(key, entry.chunk_ids)
+        keys = self._by_chunks.get(scope)
+        if keys is not None:
+            keys.remove(key)
+            if not keys:
+                del self._by_chunks[scope]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+            self._total_bytes = 0
+
+    # ----------------------------
+    # STATS
+    # ----------------------------
+    def stats(self):
+        with self._lock:
+            hits = self.hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32").ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
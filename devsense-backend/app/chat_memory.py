@@ -1,21 +1,305 @@
+"""
+Chat session store.
+
+History keeps only the questions and answers of each session, not the
+retrieved context they were answered from, and is trimmed to a token budget
+so prompts stay small. Two backends share one interface:
+
+- ``memory``: per-process dict, sessions evicted after CHAT_SESSION_IDLE_SECONDS
+  of inactivity and least-recently-active first past CHAT_SESSIONS_MAX_MB
+- ``sqlite``: a SQLite file at CHAT_SESSION_PATH, so sessions survive restarts
+  and are shared by every worker process on the host
+"""
+import os
+import sqlite3
+import threading
+import time
 import uuid
+from collections import OrderedDict
+
+from app.chunking import estimate_tokens
+from app.config import (
+    CHAT_SESSION_BACKEND, CHAT_SESSION_PATH, CHAT_SESSION_IDLE_SECONDS,
+    CHAT_SESSIONS_MAX_MB, CHAT_HISTORY_MAX_TOKENS, CHAT_HISTORY_MAX_MESSAGES
+)
+
+MESSAGE_OVERHEAD_BYTES = 64
+
+
+def trim_history(messages: list, max_tokens: int = CHAT_HISTORY_MAX_TOKENS,
+                 max_messages: int = CHAT_HISTORY_MAX_MESSAGES):
+    """Drop the oldest question/answer pairs until the history fits both budgets."""
+    messages = messages[-max_messages:] if max_messages > 0 else list(messages)
+    total = sum(estimate_tokens(message["content"]) for message in messages)
+    while messages and total > max_tokens:
+        # drop whole turns so the history never starts with an answer
+        drop = 2 if len(messages) > 1 and messages[0]["role"] == "user" else 1
+        total -= sum(estimate_tokens(message["content"]) for message in messages[:drop])
+        messages = messages[drop:]
+    return messages
+
+
+def _message_bytes(message: dict):
+    return MESSAGE_OVERHEAD_BYTES + len(message["content"].encode("utf-8"))
+
+
+class MemorySessionStore:
+    def __init__(self, idle_seconds: float = CHAT_SESSION_IDLE_SECONDS,
+                 max_bytes: int = CHAT_SESSIONS_MAX_MB * 1024 * 1024):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        self._sessions = OrderedDict()  # session id -> (last active, messages, bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id: str):
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(session_id)
+            return list(entry[1]) if entry is not None else []
+
+    def add_turn(self, session_id: str, question: str, answer: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            messages = entry[1] if entry is not None else []
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+            messages = trim_history(messages + [
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ])
+            nbytes = sum(_message_bytes(message) for message in messages)
+            self._sessions[session_id] = (time.time(), messages, nbytes)
+            self._total_bytes += nbytes
+
+            self._expire()
+            while self._total_bytes > self.max_bytes and len(self._sessions) > 1:
+                _, (_, _, freed) = self._sessions.popitem(last=False)
+                self._total_bytes -= freed
+                self.evictions += 1
+
+    def create_session(self):
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions[session_id] = (time.time(), [], 0)
+        return session_id
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def _expire(self):
+        # caller holds the lock; sessions are ordered by last activity
+        cutoff = time.time() - self.idle_seconds
+        while self._sessions:
+            session_id, (last_active, _, nbytes) = next(iter(self._sessions.items()))
+            if last_active > cutoff:
+                break
+            del self._sessions[session_id]
+            self._total_bytes -= nbytes
+            self.expirations += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteSessionStore:
+    def __init__(self, path: str = CHAT_SESSION_PATH, idle_seconds: float = CHAT_SESSION_IDLE_SECONDS,
+                 max_bytes: int = CHAT_SESSIONS_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # other worker processes write the same file; wait for their locks
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " last_active REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)")
+        self._conn.commit()
+        self._init_sizes()
+
+    def _init_sizes(self):
+        # sizes are kept as running totals (per session and for the whole
+        # file) so nothing has to scan the messages table; files written
+        # before then are backfilled once
+        self._conn.execute("BEGIN IMMEDIATE")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "size_bytes" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "UPDATE sessions SET size_bytes = ("
+                " SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) + COUNT(*) * ?"
+                " FROM messages WHERE messages.session_id = sessions.session_id)",
+                (MESSAGE_OVERHEAD_BYTES,)
+            )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS store_size ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " size_bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO store_size (id, size_bytes)"
+            " SELECT 0, COALESCE(SUM(size_bytes), 0) FROM sessions"
+        )
+        self._conn.commit()
+
+    def _messages(self, session_id: str):
+        return self._conn.execute(
+            "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+
+    def get_history(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_active FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row[0] <= time.time() - self.idle_seconds:
+                return []
+            return [{"role": role, "content": content} for _, role, content in self._messages(session_id)]
+
+    def add_turn(self, session_id: str, question: str, answer: str):
+        now = time.time()
+        with self._lock:
+            # drop an idle session first so its old turns aren't revived
+            self._expire()
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                [(session_id, "user", question), (session_id, "assistant", answer)]
+            )
+
+            rows = self._messages(session_id)
+            kept = trim_history([{"role": role, "content": content} for _, role, content in rows])
+            dropped = [(row_id,) for row_id, _, _ in rows[:len(rows) - len(kept)]]
+            if dropped:
+                self._conn.executemany("DELETE FROM messages WHERE id = ?", dropped)
+
+            nbytes = sum(_message_bytes(message) for message in kept)
+            row = self._conn.execute("SELECT size_bytes FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, last_active, size_bytes) VALUES (?, ?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active,"
+                " size_bytes = excluded.size_bytes",
+                (session_id, now, nbytes)
+            )
+            self._add_size(nbytes - (row[0] if row is not None else 0))
+
+            self._evict(session_id)
+            self._conn.commit()
+
+    def create_session(self):
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute("INSERT INTO sessions (session_id, last_active) VALUES (?, ?)", (session_id, time.time()))
+            self._conn.commit()
+        return session_id
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._delete([session_id])
+            self._conn.commit()
+
+    def _delete(self, session_ids):
+        freed = 0
+        for session_id in session_ids:
+            row = self._conn.execute("SELECT size_bytes FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is not None:
+                freed += row[0]
+        rows = [(session_id,) for session_id in session_ids]
+        self._conn.executemany("DELETE FROM messages WHERE session_id = ?", rows)
+        self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", rows)
+        self._add_size(-freed)
+
+    def _expire(self):
+        stale = self._conn.execute(
+            "SELECT session_id FROM sessions WHERE last_active <= ?", (time.time() - self.idle_seconds,)
+        ).fetchall()
+        if stale:
+            self._delete([session_id for session_id, in stale])
+            self.expirations += len(stale)
+
+    def _add_size(self, delta: int):
+        if delta:
+            self._conn.execute("UPDATE store_size SET size_bytes = size_bytes + ? WHERE id = 0", (delta,))
+
+    def _size(self):
+        return self._conn.execute("SELECT size_bytes FROM store_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self, keep: str):
+        # least recently active first, one session at a time, never *keep*
+        while self._size() > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT session_id FROM sessions WHERE session_id != ? ORDER BY last_active LIMIT 1", (keep,)
+            ).fetchone()
+            if row is None:
+                break
+            self._delete([row[0]])
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            self._conn.commit()
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {
+                "backend": "sqlite",
+                "sessions": sessions,
+                "size_bytes": self._size(),
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _make_store():
+    if CHAT_SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    return MemorySessionStore()
+
 
-CHAT_SESSIONS = {}
+session_store = _make_store()
 
 
 def create_session():
-    session_id = str(uuid.uuid4())
-    CHAT_SESSIONS[session_id] = []
-    return session_id
+    return session_store.create_session()
 
 
-def add_message(session_id, role, content):
-    if session_id in CHAT_SESSIONS:
-        CHAT_SESSIONS[session_id].append({
-            "role": role,
-            "content": content
-        })
+def add_turn(session_id, question, answer):
+    session_store.add_turn(session_id, question, answer)
 
 
 def get_history(session_id):
-    return CHAT_SESSIONS.get(session_id, [])
\ No newline at end of file
+    return session_store.get_history(session_id)
@@ -0,0 +1,419 @@
+"""
+Compact, memory-mapped chunk metadata store.
+
+A project's chunks are kept in files sharing a path prefix:
+
+- ``<prefix>.records``    fixed-width record per chunk id (file id, offset and
+  length into the contents blob, start/end line)
+- ``<prefix>.contents``   UTF-8 chunk text, concatenated
+- ``<prefix>.files.json`` file id -> repository path table and the segment list
+- ``<prefix>.tombstones`` bitmap of removed chunk ids
+
+Records and contents are append-only *segments*. An incremental ingest
+hard-links the previous store's segments (they are never modified), writes
+its new chunks as one more ``<prefix>.<segment>.{records,contents}`` pair and
+a new tombstone bitmap, so its cost doesn't grow with the size of the store.
+Removed chunks keep their id until the store is compacted (see
+:meth:`ChunkStoreWriter.commit`): segments are merged, removed records and
+text are dropped and the live chunks renumbered, which the caller applies
+to the index, lexical postings and manifest written alongside.
+
+The binary files are memory-mapped, so resolving a search hit is an O(1)
+slice instead of parsing every chunk up front. Stores written before
+segments mark removed chunks inline, with ``file_id`` set to ``TOMBSTONE``.
+"""
+import bisect
+import json
+import mmap
+import os
+import re
+import shutil
+
+import numpy as np
+
+from app.config import CHUNK_STORE_MAX_DEAD_FRACTION, CHUNK_STORE_MAX_SEGMENTS
+
+RECORD_DTYPE = np.dtype([
+    ("file_id", "<u4"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("start_line", "<u4"),
+    ("end_line", "<u4"),
+])
+TOMBSTONE = 0xFFFFFFFF
+BASE_SEGMENT = ""
+
+# where ingestion checks projects out (app.ingestion.BASE_REPO_PATH)
+CHECKOUT_ROOT_RE = re.compile(r"(?:^|/)data/repos/[^/]+/")
+# installed packages and the standard library, whatever the prefix
+EXTERNAL_PATH_RE = re.compile(r"(?:^|/)(?:site-packages|dist-packages|lib/python\d+(?:\.\d+)?)(?:/|$)", re.IGNORECASE)
+WINDOWS_DRIVE_RE = re.compile(r"^[A-Za-z]:/")
+
+
+def store_paths(prefix: str):
+    prefix = str(prefix)
+    return prefix + ".records", prefix + ".contents", prefix + ".files.json"
+
+
+def segment_paths(prefix: str, segment: str):
+    """Records and contents files of one segment of the store at *prefix*."""
+    if segment == BASE_SEGMENT:
+        return store_paths(prefix)[:2]
+    prefix = f"{prefix}.{segment}"
+    return prefix + ".records", prefix + ".contents"
+
+
+def tombstones_path(prefix: str):
+    return str(prefix) + ".tombstones"
+
+
+def store_exists(prefix: str):
+    return all(os.path.exists(path) for path in store_paths(prefix))
+
+
+def _read_table(prefix: str):
+    with open(store_paths(prefix)[2], "r", encoding="utf-8") as f:
+        table = json.load(f)
+    # stores written before segments hold just the file list
+    if isinstance(table, list):
+        return table, [BASE_SEGMENT]
+    return table["files"], table["segments"]
+
+
+def store_files(prefix: str):
+    """Every file of the store at *prefix* that exists on disk."""
+    paths = list(store_paths(prefix)) + [tombstones_path(prefix)]
+    try:
+        _, segments = _read_table(prefix)
+    except (OSError, ValueError):
+        segments = []
+    for segment in segments:
+        paths += [path for path in segment_paths(prefix, segment) if path not in paths]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _map_file(path: str):
+    # mmap can't map empty files
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _link(source: str, target: str):
+    # segments are immutable, so generations can share them
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _copy_live_text(records, contents, out):
+    """Write the text of *records* to *out* back to back, one write per run of
+    adjacent text, and point the records at the new offsets."""
+    lengths = records["length"].astype("uint64")
+    starts = records["offset"]
+    if len(records):
+        breaks = np.flatnonzero(starts[1:] != starts[:-1] + lengths[:-1]) + 1
+        run_starts = np.concatenate([[0], breaks])
+        run_ends = np.concatenate([breaks, [len(records)]]) - 1
+        for first, last in zip(run_starts.tolist(), run_ends.tolist()):
+            out.write(contents[int(starts[first]):int(starts[last] + lengths[last])])
+    records["offset"] = np.cumsum(lengths) - lengths
+    return int(lengths.sum())
+
+
+class ChunkStore:
+    """Read-only, list-like view of a chunk store: ``store[i]`` returns the chunk
+    dict for id *i*, or None if that chunk was removed."""
+
+    def __init__(self, prefix: str):
+        self.prefix = str(prefix)
+        self.files, self.segments = _read_table(prefix)
+
+        records = []
+        self._contents = []
+        for segment in self.segments:
+            records_path, contents_path = segment_paths(prefix, segment)
+            records.append(np.frombuffer(_map_file(records_path), dtype=RECORD_DTYPE))
+            self._contents.append(_map_file(contents_path))
+        self._segment_starts = np.cumsum([0] + [len(r) for r in records])[:-1].tolist()
+        # a single segment stays mapped; several are joined into one table
+        self.records = records[0] if len(records) == 1 else np.concatenate(records)
+
+        self.dead = self.records["file_id"] == TOMBSTONE
+        if os.path.exists(tombstones_path(prefix)):
+            bitmap = np.fromfile(tombstones_path(prefix), dtype="uint8")
+            self.dead |= np.unpackbits(bitmap, count=len(self.records)).astype(bool)
+        self._file_ids = None
+        self._line_index = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, chunk_id):
+        if self.dead[chunk_id]:
+            return None
+        record = self.records[chunk_id]
+        segment = bisect.bisect_right(self._segment_starts, int(chunk_id)) - 1
+
+        offset = int(record["offset"])
+        content = self._contents[segment][offset:offset + int(record["length"])].decode("utf-8")
+        path = self.files[int(record["file_id"])]
+        return {
+            "file": path,
+            "file_path": path,
+            "content": content,
+            "start_line": int(record["start_line"]),
+            "end_line": int(record["end_line"]),
+        }
+
+    def __iter__(self):
+        for chunk_id in range(len(self)):
+            yield self[chunk_id]
+
+    def live_ids(self):
+        return np.flatnonzero(~self.dead)
+
+    def nbytes(self):
+        """Private memory held by the store; the contents blobs live in the page cache."""
+        joined = self.records.nbytes if len(self.segments) > 1 else 0
+        return joined + self.dead.nbytes + sum(len(path) for path in self.files)
+
+    # ----------------------------
+    # LINE LOOKUP
+    # ----------------------------
+    def _build_line_index(self):
+        # live chunk ids grouped by file and sorted by start line; built on
+        # first use and immutable afterwards, so concurrent builds are harmless
+        live = self.live_ids()
+        records = self.records[live]
+        order = np.lexsort((records["start_line"], records["file_id"]))
+        file_ids = records["file_id"][order]
+        bounds = np.searchsorted(file_ids, np.arange(len(self.files) + 1))
+        return live[order], records["start_line"][order], bounds
+
+    def resolve_path(self, path: str):
+        """Match a path from outside the repo (absolute, Windows-style, or
+        relative to some other root) to a stored file.
+
+        Below a project checkout (``data/repos/<project>/``) the rest of the
+        path must match exactly. Otherwise the longest stored suffix wins, but
+        paths into installed packages or the standard library never match and
+        an absolute path must match at least its parent directory too, so a
+        frame in some other ``utils.py`` isn't taken for the repo's.
+        """
+        if self._file_ids is None:
+            self._file_ids = {file_path: i for i, file_path in enumerate(self.files)}
+
+        path = path.replace("\\", "/")
+        checkout = None
+        for checkout in CHECKOUT_ROOT_RE.finditer(path):
+            pass
+        if checkout is not None:
+            candidate = "/".join(part for part in path[checkout.end():].split("/") if part and part != ".")
+            return candidate if candidate in self._file_ids else None
+
+        if EXTERNAL_PATH_RE.search(path):
+            return None
+
+        parts = [part for part in path.split("/") if part and part != "."]
+        shortest = 2 if path.startswith("/") or WINDOWS_DRIVE_RE.match(path) else 1
+        for i in range(len(parts) - shortest + 1):
+            candidate = "/".join(parts[i:])
+            if candidate in self._file_ids:
+                return candidate
+        return None
+
+    def find_chunk(self, file_path: str, line: int):
+        """Id of the live chunk of *file_path* covering *line*, or None. O(log n)."""
+        file_path = self.resolve_path(file_path)
+        if file_path is None:
+            return None
+
+        if self._line_index is None:
+            self._line_index = self._build_line_index()
+        ids, starts, bounds = self._line_index
+
+        file_id = self._file_ids[file_path]
+        lo, hi = bounds[file_id], bounds[file_id + 1]
+        pos = lo + int(np.searchsorted(starts[lo:hi], line, side="right")) - 1
+        if pos < lo:
+            return None
+
+        chunk_id = int(ids[pos])
+        if line > int(self.records[chunk_id]["end_line"]):
+            return None
+        return chunk_id
+
+
+class ChunkStoreWriter:
+    """Streams chunk records into a new version of a store.
+
+    When *previous* is given, new chunks get ids after the previous store's
+    and are written as a new segment; on :meth:`commit` the previous segments
+    are linked into the new store unchanged. The segment is written under a
+    temporary name until then, so readers see no change before the commit.
+    """
+
+    def __init__(self, prefix: str, previous: ChunkStore = None):
+        self.prefix = str(prefix)
+        os.makedirs(os.path.dirname(self.prefix) or ".", exist_ok=True)
+
+        self._previous = previous
+        self.next_id = self._first_id = len(previous) if previous is not None else 0
+        self._segment = f"s{self._first_id}" if self._first_id else BASE_SEGMENT
+        self._tmp_paths = [path + ".tmp" for path in segment_paths(self.prefix, self._segment)]
+        self._records = open(self._tmp_paths[0], "wb")
+        self._contents = open(self._tmp_paths[1], "wb")
+        self._offset = 0
+        self.files = list(previous.files) if previous is not None else []
+        self._file_ids = {path: i for i, path in enumerate(self.files)}
+
+    def _file_id(self, path: str):
+        file_id = self._file_ids.get(path)
+        if file_id is None:
+            file_id = len(self.files)
+            self.files.append(path)
+            self._file_ids[path] = file_id
+        return file_id
+
+    def append(self, file_path: str, content: str, start_line: int = 0, end_line: int = 0):
+        data = content.encode("utf-8")
+        record = np.array(
+            [(self._file_id(file_path), self._offset, len(data), start_line, end_line)],
+            dtype=RECORD_DTYPE
+        )
+        self._records.write(record.tobytes())
+        self._contents.write(data)
+        self._offset += len(data)
+
+        chunk_id = self.next_id
+        self.next_id += 1
+        return chunk_id
+
+    def _dead(self, removed_ids):
+        dead = np.zeros(self.next_id, dtype=bool)
+        if self._previous is not None:
+            dead[:len(self._previous)] = self._previous.dead
+        removed = np.asarray(list(removed_ids), dtype="int64")
+        dead[removed] = True
+        return dead
+
+    def needs_compaction(self, removed_ids=()):
+        """Whether committing with *removed_ids* should compact the store: too
+        large a share of its ids would be dead, or it has too many segments."""
+        if self._previous is None or not self.next_id:
+            return False
+        if len(self._previous.segments) + 1 > CHUNK_STORE_MAX_SEGMENTS:
+            return True
+        return int(self._dead(removed_ids).sum()) > CHUNK_STORE_MAX_DEAD_FRACTION * self.next_id
+
+    def renumbering(self, removed_ids=()):
+        """Old id -> id after compaction (-1 for removed chunks), as an array."""
+        live = ~self._dead(removed_ids)
+        return np.where(live, np.cumsum(live) - 1, -1).astype("int64")
+
+    def _compact(self, dead):
+        # merge every segment into a new base segment holding live chunks only
+        records_path, contents_path = segment_paths(self.prefix, BASE_SEGMENT)
+        new_records = np.fromfile(self._tmp_paths[0], dtype=RECORD_DTYPE)
+        new_contents = _map_file(self._tmp_paths[1])
+
+        previous = self._previous
+        bounds = previous._segment_starts + [len(previous)]
+        sources = [(previous.records[bounds[i]:bounds[i + 1]], previous._contents[i])
+                   for i in range(len(previous.segments))]
+        sources.append((new_records, new_contents))
+
+        start = base = 0
+        with open(records_path + ".compact", "wb") as records_out, open(contents_path + ".compact", "wb") as contents_out:
+            for records, contents in sources:
+                live = records[~dead[start:start + len(records)]].copy()
+                start += len(records)
+                offset = base
+                base += _copy_live_text(live, contents, contents_out)
+                live["offset"] += offset
+                records_out.write(live.tobytes())
+
+        if isinstance(new_contents, mmap.mmap):
+            new_contents.close()
+        for path in self._tmp_paths:
+            os.remove(path)
+        os.replace(contents_path + ".compact", contents_path)
+        os.replace(records_path + ".compact", records_path)
+        return [BASE_SEGMENT]
+
+    def _append_segment(self):
+        segments = []
+        previous = self._previous
+        if previous is not None:
+            for segment in previous.segments:
+                for source, target in zip(segment_paths(previous.prefix, segment), segment_paths(self.prefix, segment)):
+                    if os.path.abspath(source) != os.path.abspath(target):
+                        _link(source, target)
+                segments.append(segment)
+
+        if self.next_id > self._first_id or not segments:
+            for tmp_path, path in zip(self._tmp_paths, segment_paths(self.prefix, self._segment)):
+                os.replace(tmp_path, path)
+            if self._segment not in segments:
+                segments.append(self._segment)
+        else:
+            for path in self._tmp_paths:
+                os.remove(path)
+        return segments
+
+    def commit(self, removed_ids=(), compact: bool = False):
+        """Publish the store. *removed_ids* are previous chunks to tombstone.
+
+        With *compact*, removed chunks are dropped and the rest renumbered as
+        :meth:`renumbering` returns for the same *removed_ids*.
+        """
+        self._records.close()
+        self._contents.close()
+
+        dead = self._dead(removed_ids)
+        if compact and self._previous is not None:
+            segments = self._compact(dead)
+            dead = None
+        else:
+            segments = self._append_segment()
+
+        tombstones = tombstones_path(self.prefix)
+        if dead is not None and dead.any():
+            with open(tombstones + ".tmp", "wb") as f:
+                f.write(np.packbits(dead).tobytes())
+            os.replace(tombstones + ".tmp", tombstones)
+        elif os.path.exists(tombstones):
+            os.remove(tombstones)
+
+        # the file table is swapped last; it names the segments readers map
+        files_path = store_paths(self.prefix)[2]
+        with open(files_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "segments": segments}, f)
+        os.replace(files_path + ".tmp", files_path)
+
+    def abort(self):
+        self._records.close()
+        self._contents.close()
+        for path in self._tmp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_chunk_store(prefix: str, chunks):
+    """Write a list of chunk dicts (``file``/``content`` and optional lines) as a store."""
+    writer = ChunkStoreWriter(prefix)
+    try:
+        for chunk in chunks:
+            writer.append(
+                chunk.get("file_path") or chunk.get("file", ""),
+                chunk.get("content", ""),
+                chunk.get("start_line", 0),
+                chunk.get("end_line", 0)
+            )
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
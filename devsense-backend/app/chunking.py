@@ -1,34 +1,306 @@
+"""
+Syntax-aware source chunking.
+
+Files are split at syntactic boundaries and the pieces packed greedily into
+chunks of up to CHUNK_MAX_TOKENS, with no overlap:
+
+- Python: top-level statements from the ``ast`` module (decorators and the
+  comments directly above a definition stay with it); an oversized class or
+  function is split into its header and its body statements, recursively
+- brace languages (JS/TS, Java, Go, C-family, Rust, ...): blocks found by
+  tracking brace depth outside strings and comments, recursing one level
+  deeper when a block is too large
+- everything else: blank-line separated paragraphs (and Markdown headings)
+
+Anything still too large after that is cut into line windows. Every chunk
+records the 1-based line span it came from.
+"""
+import ast
+import io
 import os
 import uuid
 
-CHUNK_SIZE = 40  # lines per chunk
+from app.config import CHUNK_MAX_TOKENS
+
+CHARS_PER_TOKEN = 4  # rough average for English text and code
+
+# bump when chunk boundaries change so existing projects are re-chunked
+CHUNKER_VERSION = 2
+
+# lines that introduce the next declaration in brace languages
+LEADING_LINE_PREFIXES = ("//", "/*", "*", "@", "#[")
+
+BRACE_EXTENSIONS = {
+    ".js", ".jsx", ".ts", ".tsx", ".java", ".go", ".c", ".cpp", ".h",
+    ".cs", ".swift", ".kt", ".rs", ".php", ".json",
+}
+
+
+def estimate_tokens(text: str):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class _Segment:
+    """Line span ``[start, end]`` (1-based, inclusive) that may be split further."""
+
+    def __init__(self, start, end, split=None):
+        self.start = start
+        self.end = end
+        self._split = split
+
+    def children(self):
+        return self._split() if self._split is not None else None
+
+
+class _Source:
+    def __init__(self, text: str):
+        # split on the same line endings the ast module counts
+        self.lines = io.StringIO(text, newline="").readlines()
+        # prefix sums of line lengths, so any span's size is O(1)
+        self._offsets = [0]
+        for line in self.lines:
+            self._offsets.append(self._offsets[-1] + len(line))
+
+    def tokens(self, start, end):
+        return (self._offsets[end] - self._offsets[start - 1]) // CHARS_PER_TOKEN + 1
+
+    def text(self, start, end):
+        return "".join(self.lines[start - 1:end])
+
+
+# ----------------------------
+# PYTHON
+# ----------------------------
+def _child_statements(node):
+    children = []
+    for field in ("body", "orelse", "handlers", "finalbody"):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            children.extend(child for child in value if hasattr(child, "lineno"))
+    return sorted(children, key=lambda child: child.lineno)
+
+
+def _node_start(node):
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+
+def _python_segments(source, nodes, start, end):
+    """Partition ``[start, end]`` at *nodes*, giving each node the comments above it."""
+    if not nodes:
+        return [_Segment(start, end)]
+
+    starts = []
+    previous_end = start - 1
+    for node in nodes:
+        node_start = max(_node_start(node), start)
+        # pull leading comment lines into the node they describe
+        while node_start - 1 > previous_end and source.lines[node_start - 2].lstrip().startswith("#"):
+            node_start -= 1
+        starts.append(node_start)
+        previous_end = max(previous_end, getattr(node, "end_lineno", node.lineno))
+
+    segments = []
+    if starts[0] > start:
+        segments.append(_Segment(start, starts[0] - 1))
+
+    for i, node in enumerate(nodes):
+        seg_start = starts[i]
+        seg_end = starts[i + 1] - 1 if i + 1 < len(nodes) else end
+        if seg_end < seg_start:
+            continue
+        children = _child_statements(node)
+        split = None
+        if children:
+            split = (lambda s=seg_start, e=seg_end, c=children: _python_segments(source, c, s, e))
+        segments.append(_Segment(seg_start, seg_end, split))
+
+    return segments
 
-def chunk_file(file_path):
-    chunks = []
 
+def _python_top_level(source, text):
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    return _python_segments(source, list(tree.body), 1, len(source.lines))
+
+
+# ----------------------------
+# BRACE LANGUAGES
+# ----------------------------
+def _brace_depths(lines):
+    """Brace depth at the end of each line, ignoring strings and comments."""
+    depths = []
+    depth = 0
+    in_block_comment = False
+    in_template = False
+    for line in lines:
+        quote = None
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            nxt = line[i + 1] if i + 1 < len(line) else ""
+            if in_block_comment:
+                if ch == "*" and nxt == "/":
+                    in_block_comment = False
+                    i += 1
+            elif in_template:
+                if ch == "\\":
+                    i += 1
+                elif ch == "`":
+                    in_template = False
+            elif quote:
+                if ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif ch == "/" and nxt == "/":
+                break
+            elif ch == "/" and nxt == "*":
+                in_block_comment = True
+                i += 1
+            elif ch in "\"'":
+                quote = ch
+            elif ch == "`":
+                in_template = True
+            elif ch in "{[(":
+                depth += 1
+            elif ch in "}])":
+                depth = max(0, depth - 1)
+            i += 1
+        depths.append(depth)
+    return depths
+
+
+def _brace_segments(source, depths, start, end, depth):
+    """Split ``[start, end]`` after every line that returns to *depth*."""
+    segments = []
+    seg_start = start
+    for line_no in range(start, end + 1):
+        if line_no == end or depths[line_no - 1] <= depth:
+            if line_no < end and not source.lines[line_no].strip():
+                # keep blank lines with the block above
+                continue
+            if line_no < end and source.lines[line_no - 1].lstrip().startswith(LEADING_LINE_PREFIXES):
+                # comments and annotations belong to the declaration below
+                continue
+            split = (lambda s=seg_start, e=line_no: _brace_segments(source, depths, s, e, depth + 1))
+            segments.append(_Segment(seg_start, line_no, split))
+            seg_start = line_no + 1
+    if len(segments) == 1 and depth > 0 and segments[0].start == start and segments[0].end == end:
+        # no boundary at this depth; let the caller fall back to line windows
+        segments[0]._split = None
+    return segments
+
+
+# ----------------------------
+# PARAGRAPHS
+# ----------------------------
+def _paragraph_segments(source, markdown=False):
+    segments = []
+    seg_start = 1
+    for line_no in range(1, len(source.lines) + 1):
+        if line_no == seg_start:
+            continue
+        line = source.lines[line_no - 1]
+        previous_blank = not source.lines[line_no - 2].strip()
+        if (previous_blank and line.strip()) or (markdown and line.startswith("#")):
+            segments.append(_Segment(seg_start, line_no - 1))
+            seg_start = line_no
+    if seg_start <= len(source.lines):
+        segments.append(_Segment(seg_start, len(source.lines)))
+    return segments
+
+
+# ----------------------------
+# PACKING
+# ----------------------------
+def _line_windows(source, start, end, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    window_start = start
+    for line_no in range(start, end + 1):
+        if source.tokens(window_start, line_no) > max_tokens and line_no > window_start:
+            yield source.text(window_start, line_no - 1), window_start, line_no - 1
+            window_start = line_no
+        if source.tokens(line_no, line_no) > max_tokens:
+            # a single huge line (minified code, data): cut it by characters
+            line = source.lines[line_no - 1]
+            for offset in range(0, len(line), max_chars):
+                yield line[offset:offset + max_chars], line_no, line_no
+            window_start = line_no + 1
+    if window_start <= end:
+        yield source.text(window_start, end), window_start, end
+
+
+def _pack(source, segments, max_tokens):
+    pending_start = None
+    pending_end = None
+
+    for segment in segments:
+        size = source.tokens(segment.start, segment.end)
+
+        if size > max_tokens:
+            if pending_start is not None:
+                yield source.text(pending_start, pending_end), pending_start, pending_end
+                pending_start = None
+            children = segment.children()
+            if children and len(children) > 1:
+                yield from _pack(source, children, max_tokens)
+            else:
+                yield from _line_windows(source, segment.start, segment.end, max_tokens)
+            continue
+
+        if pending_start is not None and source.tokens(pending_start, segment.end) > max_tokens:
+            yield source.text(pending_start, pending_end), pending_start, pending_end
+            pending_start = None
+
+        if pending_start is None:
+            pending_start = segment.start
+        pending_end = segment.end
+
+    if pending_start is not None:
+        yield source.text(pending_start, pending_end), pending_start, pending_end
+
+
+def chunk_source(text: str, file_path: str = "", max_tokens: int = CHUNK_MAX_TOKENS):
+    """Yield ``(content, start_line, end_line)`` chunks of *text*, using the
+    splitter for *file_path*'s language."""
+    source = _Source(text)
+    if not source.lines:
+        return
+
+    ext = os.path.splitext(file_path)[1].lower()
+    segments = None
+    if ext == ".py":
+        segments = _python_top_level(source, text)
+    elif ext in BRACE_EXTENSIONS:
+        segments = _brace_segments(source, _brace_depths(source.lines), 1, len(source.lines), 0)
+    if segments is None:
+        segments = _paragraph_segments(source, markdown=ext == ".md")
+
+    for content, start_line, end_line in _pack(source, segments, max_tokens):
+        if content.strip():
+            yield content, start_line, end_line
+
+
+def chunk_file(file_path, max_tokens: int = CHUNK_MAX_TOKENS):
     try:
         with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
+            text = f.read()
     except Exception:
         return []
 
-    total_lines = len(lines)
-
-    for i in range(0, total_lines, CHUNK_SIZE):
-        chunk_lines = lines[i:i + CHUNK_SIZE]
-        chunk_text = "".join(chunk_lines)
-
-        chunk = {
+    return [
+        {
             "id": str(uuid.uuid4()),
             "file_path": file_path,
-            "start_line": i + 1,
-            "end_line": min(i + CHUNK_SIZE, total_lines),
-            "content": chunk_text
+            "start_line": start_line,
+            "end_line": end_line,
+            "content": content
         }
-
-        chunks.append(chunk)
-
-    return chunks
+        for content, start_line, end_line in chunk_source(text, file_path, max_tokens)
+    ]
 
 
 def chunk_repository(file_list):
@@ -38,4 +310,4 @@ def chunk_repository(file_list):
         file_chunks = chunk_file(file_path)
         all_chunks.extend(file_chunks)
 
-    return all_chunks
\ No newline at end of file
+    return all_chunks
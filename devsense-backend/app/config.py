@@ -11,3 +11,91 @@ MAX_CHUNKS = int(os.getenv("MAX_CHUNKS", "10000"))
 MAX_FILE_SIZE_KB = MAX_FILE_SIZE // 1000  # Convert to KB for display
 MAX_CONTEXT_CHARS = 15000
 TOP_K_DEFAULT = 10
+
+# Embedding provider (see app/embeddings.py)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "bedrock" if USE_BEDROCK else "hashing").lower()  # bedrock, hashing
+EMBED_DIM = int(os.getenv("EMBED_DIM", "1536"))  # must match the Bedrock model; any size for hashing
+EMBED_HASH_CHAR_NGRAM = int(os.getenv("EMBED_HASH_CHAR_NGRAM", "3"))  # character n-gram length of the hashing provider, 0 disables
+
+# Embedding pipeline
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))  # parallel embedding requests
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))  # chunks handed to the pipeline at once
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))  # attempts per request on throttling
+
+# Embedding cache (content-addressed, shared across projects)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/cache/embeddings.sqlite3")
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+
+# Resident index cache for the query path
+INDEX_CACHE_MAX_MB = int(os.getenv("INDEX_CACHE_MAX_MB", "2048"))
+INDEX_PRELOAD_PROJECTS = [p.strip() for p in os.getenv("INDEX_PRELOAD_PROJECTS", "").split(",") if p.strip()]
+
+# Vector index selection (see app/index_factory.py)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")  # auto, flat, hnsw, ivf_flat, ivf_pq
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none")  # none, fp16, int8
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))  # IVF lists scanned per query
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))  # HNSW search breadth
+INDEX_MAX_STALE_FRACTION = float(os.getenv("INDEX_MAX_STALE_FRACTION", "0.2"))  # rebuild HNSW past this share of stale vectors
+RECALL_SAMPLE_QUERIES = int(os.getenv("RECALL_SAMPLE_QUERIES", "100"))  # recall@k measured after ingest
+
+# Background ingestion jobs
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # repositories ingested concurrently
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))  # finished jobs kept for status queries
+
+# Answer cache for /query (see app/cache.py)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_MB = int(os.getenv("ANSWER_CACHE_MAX_MB", "64"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))  # cosine threshold for near-duplicate questions, 0 disables
+
+# Chat sessions (see app/chat_memory.py)
+CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory")  # memory or sqlite
+CHAT_SESSION_PATH = os.getenv("CHAT_SESSION_PATH", "data/cache/sessions.sqlite3")
+CHAT_SESSION_IDLE_SECONDS = int(os.getenv("CHAT_SESSION_IDLE_SECONDS", "3600"))
+CHAT_SESSIONS_MAX_MB = int(os.getenv("CHAT_SESSIONS_MAX_MB", "64"))
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "2000"))  # history sent with each prompt
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "10"))
+
+# Hybrid retrieval: BM25 over identifiers fused with vector search (see app/lexical_index.py)
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))  # reciprocal rank fusion damping
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))  # candidates per ranker, as a multiple of top_k
+
+# Chunking (see app/chunking.py)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "350"))  # estimated tokens per chunk
+
+# Chunk store compaction (see app/chunk_store.py)
+CHUNK_STORE_MAX_DEAD_FRACTION = float(os.getenv("CHUNK_STORE_MAX_DEAD_FRACTION", "0.25"))  # compact past this share of removed ids
+CHUNK_STORE_MAX_SEGMENTS = int(os.getenv("CHUNK_STORE_MAX_SEGMENTS", "16"))  # compact once incremental ingests add more segments
+
+# Dependency graph (see app/dependency_analyzer.py)
+DEPENDENCY_WORKERS = int(os.getenv("DEPENDENCY_WORKERS", "0"))  # import-parsing processes, 0 = one per CPU
+DEPENDENCY_PARALLEL_MIN_FILES = int(os.getenv("DEPENDENCY_PARALLEL_MIN_FILES", "500"))  # smaller repos are parsed in-process
+
+# Ingestion scan stage: parallel file reads and chunking (see app/ingestion.py)
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "0"))  # chunking processes, 0 = one per CPU
+SCAN_READ_THREADS = int(os.getenv("SCAN_READ_THREADS", "8"))  # concurrent file reads
+SCAN_BATCH_FILES = int(os.getenv("SCAN_BATCH_FILES", "256"))  # files in flight at once
+SCAN_PARALLEL_MIN_FILES = int(os.getenv("SCAN_PARALLEL_MIN_FILES", "500"))  # smaller scans chunk in-process
+
+# Repository acquisition (see app/repositories.py)
+REPO_MIRROR_PATH = os.getenv("REPO_MIRROR_PATH", "data/mirrors")  # bare mirrors, one per repository URL
+SPARSE_CHECKOUT = os.getenv("SPARSE_CHECKOUT", "true").lower() == "true"  # check out only indexable files
+GIT_TIMEOUT_SECONDS = int(os.getenv("GIT_TIMEOUT_SECONDS", "300"))
+
+# Federated search across projects (see search_projects in app/query_engine.py)
+FEDERATED_SEARCH_WORKERS = int(os.getenv("FEDERATED_SEARCH_WORKERS", "8"))  # projects searched concurrently
+FEDERATED_MAX_PROJECTS = int(os.getenv("FEDERATED_MAX_PROJECTS", "64"))  # projects per federated query
+
+# Serve indexes memory-mapped read-only, shared across worker processes (see app/index_cache.py)
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() == "true"
+
+# Index generations (see app/generations.py)
+INDEX_GENERATIONS_RETAINED = int(os.getenv("INDEX_GENERATIONS_RETAINED", "2"))  # published generations kept per project
+
+# Request-path thread pools: retrieval and session I/O (see app/query_engine.py)
+# and blocking Bedrock LLM calls (see app/llm_service_bedrock.py) run on
+# separate pools so slow model calls can't starve retrieval
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "32"))  # concurrent retrievals per worker process
+BEDROCK_LLM_CONCURRENCY = int(os.getenv("BEDROCK_LLM_CONCURRENCY", "100"))  # in-flight Bedrock LLM calls (threads and pooled connections)
@@ -1,199 +1,721 @@
+"""
+File-level dependency graph.
+
+Imports are parsed per file (in a process pool for large repositories) and
+resolved to repository files through a path index built once up front:
+
+- Python: absolute dotted modules are looked up from the source roots (the
+  repository root, parents of top-level packages, ``src`` directories and
+  directories with a project manifest), so ``app.config`` finds
+  ``backend/app/config.py`` next to ``backend/requirements.txt`` but
+  ``logging`` never matches ``svc/utils/logging.py``; relative imports resolve
+  against the importing package. ``from pkg import mod`` resolves to
+  ``pkg/mod.py`` when that is a module, else to ``pkg/__init__.py``.
+- JS/TS: relative specifiers and ``tsconfig``/``jsconfig`` path aliases
+  (plus the common ``@/`` -> ``src/`` convention) are tried with the usual
+  extensions and ``index`` files. Bare package imports are external and
+  produce no edge.
+
+The graph is kept as a compact adjacency structure (CSR: one offsets array
+and one targets array over integer node ids), where an edge ``a -> b`` means
+file *a* imports file *b*. The reverse index (who imports a file) and the
+strongly connected components (import cycles) are computed at build time
+and saved with it, so impact queries only touch the affected files.
+"""
 import os
-import ast
+import re
 import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-DEPENDENCY_PATH = "data/metadata/dependencies.json"
+import numpy as np
 
+from app.config import DEPENDENCY_WORKERS, DEPENDENCY_PARALLEL_MIN_FILES
+from app.generations import Generation, current_generation, LEGACY_GENERATION
 
-def extract_python_dependencies(file_path):
-    dependencies = []
 
-    try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            tree = ast.parse(f.read())
+PYTHON_EXTENSIONS = (".py",)
+PYTHON_ROOT_MARKERS = ("pyproject.toml", "setup.py", "setup.cfg", "requirements.txt")
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+JS_RESOLVE_SUFFIXES = [""] + list(JS_EXTENSIONS) + [f"/index{ext}" for ext in JS_EXTENSIONS]
 
-        for node in ast.walk(tree):
-            # import module
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    dependencies.append(alias.name)
+PY_IMPORT_RE = re.compile(
+    r"^[ \t]*(?:from[ \t]+(\.*)([\w.]*)[ \t]+import[ \t]+(\([^)]*\)|[^\n#;]*)|import[ \t]+([^\n#;]+))",
+    re.MULTILINE,
+)
+JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"\n]+)['"]"""
+)
 
-            # from module import something
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    dependencies.append(node.module)
 
-            # function calls (basic)
-            elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    dependencies.append(node.func.id)
-                elif isinstance(node.func, ast.Attribute):
-                    dependencies.append(node.func.attr)
-
-    except Exception:
-        pass
+# ----------------------------
+# PARSING
+# ----------------------------
+def _import_names(names: str):
+    names = re.sub(r"#[^\n]*", "", names).replace("(", " ").replace(")", " ").replace("\\", " ")
+    return [name.split()[0] for name in names.split(",") if name.split()]
 
-    return list(set(dependencies))
 
+def extract_python_imports(source: str):
+    """``(module, level, names)`` for every import statement in *source*.
 
-def extract_js_dependencies(file_path):
-    import re
+    A line-anchored regex rather than ``ast.parse``: several times faster,
+    and it still works on files with syntax errors or Python 2 code.
+    """
+    imports = []
+    for match in PY_IMPORT_RE.finditer(source):
+        dots, module, names, plain = match.groups()
+        if plain is not None:
+            # import a.b, c as d
+            imports.extend((name, 0, ()) for name in _import_names(plain))
+        else:
+            # from module import something
+            imports.append((module, len(dots), tuple(name for name in _import_names(names) if name != "*")))
+    return imports
 
-    dependencies = []
 
-    try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
+def extract_js_imports(source: str):
+    """Module specifiers of ``import``/``export ... from``/``require``/``import()``."""
+    return list(dict.fromkeys(JS_IMPORT_RE.findall(source)))
 
-        js_imports = re.findall(r'import\s+.*?from\s+[\'"](.+?)[\'"]', content)
-        dependencies.extend(js_imports)
 
+def _parse_file(args):
+    root, rel_path = args
+    try:
+        with open(os.path.join(root, rel_path), "r", encoding="utf-8", errors="ignore") as f:
+            source = f.read()
+        if rel_path.endswith(PYTHON_EXTENSIONS):
+            return rel_path, extract_python_imports(source)
+        if rel_path.endswith(JS_EXTENSIONS):
+            return rel_path, extract_js_imports(source)
     except Exception:
         pass
+    return rel_path, []
+
+
+def parse_imports(root: str, rel_paths, workers: int = DEPENDENCY_WORKERS):
+    """Yield ``(rel_path, imports)`` for every file, in a process pool when
+    there are enough files to pay for it."""
+    tasks = [(root, rel_path) for rel_path in rel_paths if rel_path.endswith(PYTHON_EXTENSIONS + JS_EXTENSIONS)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(tasks) < DEPENDENCY_PARALLEL_MIN_FILES:
+        yield from map(_parse_file, tasks)
+        return
+
+    # spawn, not fork: ingestion calls this from a threaded server process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        yield from executor.map(_parse_file, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+
+
+# ----------------------------
+# RESOLUTION
+# ----------------------------
+def _strip_json_comments(text: str):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    return re.sub(r"(?m)^\s*//.*$", "", text)
+
+
+def _load_js_aliases(root: str, paths: set):
+    """``[(prefix, [replacement dirs])]`` from tsconfig/jsconfig ``paths``, longest prefix first."""
+    aliases = {}
+    for name in ("tsconfig.json", "jsconfig.json"):
+        config_path = os.path.join(root, name) if root else name
+        if name not in paths or not os.path.exists(config_path):
+            continue
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                options = json.loads(_strip_json_comments(f.read())).get("compilerOptions", {})
+        except Exception:
+            continue
+        base_url = options.get("baseUrl", ".")
+        for pattern, targets in (options.get("paths") or {}).items():
+            prefix = pattern.rstrip("*")
+            replacements = [os.path.normpath(os.path.join(base_url, target.rstrip("*"))).replace("\\", "/") for target in targets]
+            aliases.setdefault(prefix, replacements)
+
+    aliases.setdefault("@/", ["src"])
+    return sorted(aliases.items(), key=lambda item: -len(item[0]))
+
+
+def _python_source_roots(rel_paths, root: str = None):
+    """Directories absolute Python imports are resolved from.
+
+    The repository root, the parent of every top-level package (a directory
+    with ``__init__.py`` whose parent has none), ``src`` layouts, and
+    directories holding a Python project manifest (whose ``app`` namespace
+    packages need no ``__init__.py``).
+    """
+    packages = {os.path.dirname(p) for p in rel_paths if os.path.basename(p) == "__init__.py"}
+    directories = {""}
+    for rel_path in rel_paths:
+        directory = os.path.dirname(rel_path)
+        while directory and directory not in directories:
+            directories.add(directory)
+            directory = os.path.dirname(directory)
+
+    roots = {""}
+    for package in packages:
+        parent = os.path.dirname(package)
+        if parent not in packages:
+            roots.add(parent)
+    for directory in directories:
+        if directory in packages:
+            continue
+        if os.path.basename(directory) == "src":
+            roots.add(directory)
+        elif root and any(os.path.isfile(os.path.join(root, directory, name)) for name in PYTHON_ROOT_MARKERS):
+            roots.add(directory)
+    return roots
+
+
+class ModuleResolver:
+    """Maps import statements to repository files via prebuilt indexes."""
+
+    def __init__(self, rel_paths, root: str = None):
+        self.paths = set(rel_paths)
+        python_paths = [p for p in self.paths if p.endswith(PYTHON_EXTENSIONS)]
+        roots = _python_source_roots(python_paths, root)
+        self._modules = {}  # dotted module name (from a source root) -> files defining it
+        for rel_path in python_paths:
+            parts = rel_path[:-3].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            # a file is importable as the path below each source root above it
+            for i in range(len(parts)):
+                if "/".join(parts[:i]) in roots:
+                    self._modules.setdefault(".".join(parts[i:]), []).append(rel_path)
+        self._js_aliases = _load_js_aliases(root, self.paths)
+
+    def _python_module(self, importer: str, module: str):
+        candidates = list(self._modules.get(module, ()))
+        # a script's own directory is on sys.path when it is run directly
+        sibling = "/".join(importer.split("/")[:-1] + module.split("."))
+        for candidate in (f"{sibling}.py", f"{sibling}/__init__.py"):
+            candidate = candidate.lstrip("/")
+            if candidate in self.paths and candidate not in candidates:
+                candidates.append(candidate)
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+        # the module is defined under several source roots: prefer the file
+        # sharing the most directories with the importer, then the shortest
+        importer_dirs = importer.split("/")[:-1]
+
+        def closeness(candidate):
+            shared = 0
+            for a, b in zip(importer_dirs, candidate.split("/")[:-1]):
+                if a != b:
+                    break
+                shared += 1
+            return -shared, candidate.count("/"), candidate
+
+        return min(candidates, key=closeness)
+
+    def _python_relative(self, importer: str, module: str, level: int):
+        package = importer.split("/")[:-1]
+        if level > 1:
+            package = package[:-(level - 1)] if level - 1 <= len(package) else None
+        if package is None:
+            return None
+        base = "/".join(package + (module.split(".") if module else []))
+        for candidate in (f"{base}.py", f"{base}/__init__.py"):
+            if candidate.lstrip("/") in self.paths:
+                return candidate.lstrip("/")
+        return None
+
+    def resolve_python(self, importer: str, module: str, level: int = 0, names=()):
+        targets = []
+        for name in names:
+            # "from pkg import mod" imports the submodule when there is one
+            submodule = f"{module}.{name}" if module else name
+            target = (self._python_relative(importer, submodule, level) if level
+                      else self._python_module(importer, submodule))
+            if target is not None:
+                targets.append(target)
+        if not targets and (module or level):
+            target = self._python_relative(importer, module, level) if level else self._python_module(importer, module)
+            if target is not None:
+                targets.append(target)
+        return targets
+
+    def _js_candidate(self, base: str):
+        base = os.path.normpath(base).replace("\\", "/")
+        if base.startswith("../"):
+            return None
+        for suffix in JS_RESOLVE_SUFFIXES:
+            candidate = base + suffix
+            if candidate in self.paths:
+                return candidate
+        return None
+
+    def resolve_js(self, importer: str, specifier: str):
+        specifier = specifier.split("?")[0]
+        if specifier.startswith("."):
+            return self._js_candidate(os.path.join(os.path.dirname(importer), specifier))
+
+        for prefix, replacements in self._js_aliases:
+            if specifier.startswith(prefix):
+                for replacement in replacements:
+                    target = self._js_candidate(os.path.join(replacement, specifier[len(prefix):]))
+                    if target is not None:
+                        return target
+        # bare specifier: an npm package, not a repo file
+        return None
+
+    def resolve(self, importer: str, imports):
+        if importer.endswith(PYTHON_EXTENSIONS):
+            targets = [target for module, level, names in imports
+                       for target in self.resolve_python(importer, module, level, names)]
+        else:
+            targets = [self.resolve_js(importer, specifier) for specifier in imports]
+        return [target for target in dict.fromkeys(targets) if target is not None and target != importer]
 
-    return list(set(dependencies))
-
-
-def build_dependency_map(file_list):
-    dependency_map = {}
 
-    for file_path in file_list:
-        _, ext = os.path.splitext(file_path)
+# ----------------------------
+# GRAPH
+# ----------------------------
+class DependencyGraph:
+    """File dependency graph in CSR form.
 
-        if ext == ".py":
-            deps = extract_python_dependencies(file_path)
-        elif ext in [".js", ".ts"]:
-            deps = extract_js_dependencies(file_path)
-        else:
-            deps = []
+    The files imported by node ``i`` are ``targets[offsets[i]:offsets[i + 1]]``
+    and the files importing it are
+    ``reverse_targets[reverse_offsets[i]:reverse_offsets[i + 1]]``.
+    ``components[i]`` is the strongly connected component of node ``i``;
+    nodes sharing a component import each other in a cycle.
+    """
 
-        dependency_map[file_path] = deps
+    def __init__(self, nodes, offsets, targets, reverse_offsets=None, reverse_targets=None, components=None):
+        self.nodes = list(nodes)
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.targets = np.asarray(targets, dtype="int32")
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+
+        if reverse_offsets is None or reverse_targets is None:
+            reverse_offsets, reverse_targets = _reverse_csr(self.offsets, self.targets)
+        self.reverse_offsets = np.asarray(reverse_offsets, dtype="int64")
+        self.reverse_targets = np.asarray(reverse_targets, dtype="int32")
+
+        if components is None:
+            components = _strongly_connected_components(self.offsets, self.targets)
+        self.components = np.asarray(components, dtype="int32")
+        self._component_members = None
+        self._by_basename = None
+
+    @classmethod
+    def from_adjacency(cls, nodes, adjacency):
+        """Build from ``{node: [imported nodes]}`` keyed by node name."""
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        counts = np.zeros(len(nodes) + 1, dtype="int64")
+        targets = []
+        for i, node in enumerate(nodes):
+            ids = [node_ids[target] for target in adjacency.get(node, ()) if target in node_ids]
+            counts[i + 1] = len(ids)
+            targets.extend(ids)
+        return cls(nodes, np.cumsum(counts), targets)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def resolve(self, path: str):
+        """Node for *path*, given exactly or as an absolute/differently rooted
+        path matched by its longest suffix."""
+        if path in self.node_ids:
+            return path
+        parts = [part for part in path.replace("\\", "/").split("/") if part and part != "."]
+        for i in range(len(parts)):
+            candidate = "/".join(parts[i:])
+            if candidate in self.node_ids:
+                return candidate
+
+        # a path relative to a subdirectory: nodes ending in it, shortest first
+        if not parts:
+            return None
+        if self._by_basename is None:
+            self._by_basename = {}
+            for node in self.nodes:
+                self._by_basename.setdefault(node.rsplit("/", 1)[-1], []).append(node)
+        suffix = "/" + "/".join(parts)
+        matches = [node for node in self._by_basename.get(parts[-1], ()) if node.endswith(suffix)]
+        return min(matches, key=lambda node: (node.count("/"), node)) if matches else None
+
+    def _imports(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def _importers(self, i):
+        return self.reverse_targets[self.reverse_offsets[i]:self.reverse_offsets[i + 1]]
+
+    def dependencies(self, node: str):
+        """Files *node* imports."""
+        i = self.node_ids.get(node)
+        if i is None:
+            return []
+        return [self.nodes[j] for j in self._imports(i)]
+
+    def dependents(self, node: str):
+        """Files importing *node*."""
+        i = self.node_ids.get(node)
+        if i is None:
+            return []
+        return [self.nodes[j] for j in self._importers(i)]
+
+    def fan_out(self, node: str):
+        i = self.node_ids.get(node)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def fan_in(self, node: str):
+        i = self.node_ids.get(node)
+        return 0 if i is None else int(self.reverse_offsets[i + 1] - self.reverse_offsets[i])
+
+    def cycle(self, node: str):
+        """Other files in *node*'s import cycle (its strongly connected component)."""
+        i = self.node_ids.get(node)
+        if i is None:
+            return []
+        if self._component_members is None:
+            order = np.argsort(self.components, kind="stable")
+            bounds = np.searchsorted(self.components[order], np.arange(int(self.components.max(initial=-1)) + 2))
+            self._component_members = (order, bounds)
+        order, bounds = self._component_members
+        component = self.components[i]
+        return [self.nodes[j] for j in order[bounds[component]:bounds[component + 1]] if j != i]
+
+    def impacted(self, nodes, max_depth: int = None):
+        """``{file: depth}`` for every file that transitively imports any of
+        *nodes*, ``depth`` being the shortest import distance. Breadth-first
+        over the reverse index, so the cost is proportional to the affected
+        subgraph; *max_depth* bounds the blast radius."""
+        sources = {self.node_ids[node] for node in nodes if node in self.node_ids}
+        depths = {}
+        frontier = list(sources)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for i in frontier:
+                for j in self._importers(i).tolist():
+                    if j not in depths and j not in sources:
+                        depths[j] = depth
+                        next_frontier.append(j)
+            frontier = next_frontier
+        return {self.nodes[i]: d for i, d in sorted(depths.items(), key=lambda item: (item[1], item[0]))}
+
+    def to_dict(self):
+        """The ``{"nodes", "edges"}`` JSON form used by the API."""
+        sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.offsets))
+        return {
+            "nodes": self.nodes,
+            "edges": [
+                {"source": self.nodes[s], "target": self.nodes[t]}
+                for s, t in zip(sources.tolist(), self.targets.tolist())
+            ],
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            nodes=np.frombuffer("\n".join(self.nodes).encode("utf-8"), dtype="uint8"),
+            offsets=self.offsets,
+            targets=self.targets,
+            reverse_offsets=self.reverse_offsets,
+            reverse_targets=self.reverse_targets,
+            components=self.components,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            blob = data["nodes"].tobytes().decode("utf-8")
+            derived = [data[name] if name in data.files else None
+                       for name in ("reverse_offsets", "reverse_targets", "components")]
+            return cls(blob.split("\n") if blob else [], data["offsets"], data["targets"], *derived)
+
+
+def _reverse_csr(offsets, targets):
+    n = len(offsets) - 1
+    sources = np.repeat(np.arange(n, dtype="int32"), np.diff(offsets))
+    order = np.argsort(targets, kind="stable")
+    reverse_offsets = np.zeros(n + 1, dtype="int64")
+    reverse_offsets[1:] = np.cumsum(np.bincount(targets, minlength=n))
+    return reverse_offsets, sources[order]
+
+
+def _strongly_connected_components(offsets, targets):
+    """Component id per node (Tarjan's algorithm, iterative so deep import
+    chains don't hit the recursion limit)."""
+    n = len(offsets) - 1
+    offsets = offsets.tolist()
+    targets = targets.tolist()
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    components = [-1] * n
+    stack = []
+    counter = 0
+    component = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                child = targets[edge]
+                if index[child] == -1:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, offsets[child]))
+                elif on_stack[child]:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
 
-    with open(DEPENDENCY_PATH, "w", encoding="utf-8") as f:
-        json.dump(dependency_map, f)
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    components[member] = component
+                    if member == node:
+                        break
+                component += 1
+
+    return np.asarray(components, dtype="int32")
+
+
+def build_graph(root: str, rel_paths, workers: int = DEPENDENCY_WORKERS):
+    """Parse and resolve the imports of *rel_paths* (POSIX paths relative to *root*)."""
+    rel_paths = sorted(set(rel_paths))
+    resolver = ModuleResolver(rel_paths, root)
+
+    node_ids = {rel_path: i for i, rel_path in enumerate(rel_paths)}
+    adjacency = [()] * len(rel_paths)
+    for rel_path, imports in parse_imports(root, rel_paths, workers):
+        adjacency[node_ids[rel_path]] = [node_ids[target] for target in resolver.resolve(rel_path, imports)]
+
+    counts = np.fromiter((len(targets) for targets in adjacency), dtype="int64", count=len(adjacency))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    targets = np.fromiter((t for targets in adjacency for t in targets), dtype="int32", count=int(offsets[-1]))
+    return DependencyGraph(rel_paths, offsets, targets)
+
+
+def _relative_file_list(file_list):
+    file_list = [os.path.abspath(file_path) for file_path in file_list]
+    if not file_list:
+        return "", []
+    root = os.path.commonpath(file_list)
+    if len(file_list) == 1:
+        root = os.path.dirname(root)
+    return root, [os.path.relpath(file_path, root).replace(os.sep, "/") for file_path in file_list]
+
+
+# ----------------------------
+# PER-PROJECT STORAGE
+# ----------------------------
+def dependency_graph_path(project_name: str):
+    """Graph file of the project's published index generation (see
+    :mod:`app.generations`), or of its pre-generation layout."""
+    generation = current_generation(project_name)
+    if generation is None:
+        generation = Generation(project_name, LEGACY_GENERATION, None)
+    return str(generation.dependencies_path)
+
+
+def build_project_graph(project_name: str, project_path, rel_paths, path=None,
+                        workers: int = DEPENDENCY_WORKERS):
+    """Build and save the graph of a project. Ingestion passes the *path* of
+    the generation it is staging; by default the current one is replaced."""
+    graph = build_graph(str(project_path), rel_paths, workers)
+    graph.save(str(path or dependency_graph_path(project_name)))
+    dependency_graph_cache.invalidate(project_name)
+    return graph
 
-    return dependency_map
 
+class DependencyGraphCache:
+    """Graphs loaded once per process and reloaded when the project's current
+    graph file changes (i.e. after a re-ingest publishes a new generation)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # project name -> (file generation, graph)
+        self._lock = threading.Lock()
+
+    def get(self, project_name: str):
+        """The project's DependencyGraph, or None if it was never built."""
+        path = dependency_graph_path(project_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(project_name)
+            return None
+        generation = (path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(project_name)
+            if entry is not None and entry[0] == generation:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        graph = DependencyGraph.load(path)
+        with self._lock:
+            self._entries[project_name] = (generation, graph)
+        return graph
+
+    def invalidate(self, project_name: str):
+        with self._lock:
+            self._entries.pop(project_name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "projects": {name: {"files": len(graph), "edges": graph.edge_count}
+                             for name, (_, graph) in self._entries.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+dependency_graph_cache = DependencyGraphCache()
+
+
+# ----------------------------
+# LEGACY FILE-LIST API
+# ----------------------------
+def extract_python_dependencies(file_path):
+    """Imported module names of a Python file."""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            imports = extract_python_imports(f.read())
+    except Exception:
+        return []
+    return list({module for module, _, _ in imports if module})
 
-def load_dependency_map():
-    if os.path.exists(DEPENDENCY_PATH):
-        with open(DEPENDENCY_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
 
+def extract_js_dependencies(file_path):
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return extract_js_imports(f.read())
+    except Exception:
+        return []
 
-def trace_dependencies(target_file, dependency_map):
-    directly_affected = []
-    indirectly_affected = []
 
-    for file, imports in dependency_map.items():
-        for imp in imports:
-            if target_file in imp:
-                directly_affected.append(file)
+def build_dependency_map(file_list, project_name: str = "default"):
+    """``{file: [files it imports]}`` for *file_list*, saved as *project_name*'s graph."""
+    graph = build_dependency_graph(file_list, project_name)
+    return {node: graph.dependencies(node) for node in graph.nodes}
 
-    for file in directly_affected:
-        for other_file, imports in dependency_map.items():
-            if file in imports:
-                indirectly_affected.append(other_file)
 
-    return list(set(directly_affected)), list(set(indirectly_affected))
+def build_dependency_graph(file_list, project_name: str = "default"):
+    root, rel_paths = _relative_file_list(file_list)
+    return build_project_graph(project_name, root, rel_paths)
 
-def build_dependency_graph(file_list):
-    graph = {
-        "nodes": [],
-        "edges": []
-    }
 
-    dependency_map = {}
+def load_dependency_map(project_name: str = "default"):
+    """The project's graph from the in-process cache; empty if it was never built."""
+    graph = dependency_graph_cache.get(project_name)
+    return graph if graph is not None else DependencyGraph([], [0], [])
 
-    for file_path in file_list:
-        _, ext = os.path.splitext(file_path)
 
-        if ext == ".py":
-            deps = extract_python_dependencies(file_path)
-        elif ext in [".js", ".ts"]:
-            deps = extract_js_dependencies(file_path)
-        else:
-            deps = []
+def trace_dependencies(target_file, dependency_map):
+    direct, indirect, _, _ = calculate_impact_score(target_file, dependency_map)
+    return direct, indirect
 
-        dependency_map[file_path] = deps
-        graph["nodes"].append(file_path)
 
-    # Build edges
-    for source, imports in dependency_map.items():
-        for target in imports:
-            for file_path in file_list:
-                if target in file_path:
-                    graph["edges"].append({
-                        "source": source,
-                        "target": file_path
-                    })
+def _as_graph(graph):
+    if isinstance(graph, DependencyGraph):
+        return graph
+    if isinstance(graph, dict) and "nodes" in graph and "edges" in graph:
+        adjacency = {}
+        for edge in graph["edges"]:
+            adjacency.setdefault(edge.get("source"), []).append(edge.get("target"))
+        return DependencyGraph.from_adjacency(graph["nodes"], adjacency)
+    graph = graph or {}
+    nodes = list(dict.fromkeys(list(graph) + [t for targets in graph.values() for t in targets]))
+    return DependencyGraph.from_adjacency(nodes, graph)
 
-    # Save
-    with open(DEPENDENCY_PATH, "w", encoding="utf-8") as f:
-        json.dump(graph, f)
 
-    return graph
+def _risk_level(score):
+    if score == 0:
+        return "none"
+    if score < 3:
+        return "low"
+    if score < 6:
+        return "medium"
+    return "high"
 
 
-def calculate_impact_score(target_file, graph):
-    """Calculate direct and indirect impact for a target file using a
-    dependency map or graph.
+def calculate_impact_score(target_file, graph, max_depth: int = 2):
+    """Calculate direct and indirect impact for a target file.
 
-    The input *graph* may be a simple mapping of file paths to a list of
-    imports (as produced by :func:`build_dependency_map`), or the graph
-    format produced by :func:`build_dependency_graph` which contains
-    ``nodes`` and ``edges``.  The function normalizes either format into a
-    dependency map before computing the impact.
+    *graph* may be a :class:`DependencyGraph`, the ``nodes``/``edges`` dict
+    form, or a mapping of file paths to the files they import.
 
     The return value is a tuple ``(direct, indirect, score, risk)`` where
     *direct* and *indirect* are lists of file paths that directly or
-    indirectly depend on ``target_file``.  *score* is the sum of the two
-    lists' lengths and *risk* is a simple string based on the score.
+    indirectly (up to *max_depth* levels, None for all) depend on
+    ``target_file``.  *score* is the sum of the two lists' lengths and
+    *risk* is a simple string based on the score.
     """
+    graph = _as_graph(graph)
+    depths = graph.impacted([target_file], max_depth)
 
-    # normalize graph to dependency_map format
-    if isinstance(graph, dict) and "nodes" in graph and "edges" in graph:
-        dependency_map = {node: [] for node in graph["nodes"]}
-        for edge in graph["edges"]:
-            src = edge.get("source")
-            tgt = edge.get("target")
-            if src in dependency_map:
-                dependency_map[src].append(tgt)
-    else:
-        dependency_map = graph or {}
-
-    direct = []
-    indirect = []
-
-    # collect directly affected files
-    for file_path, imports in dependency_map.items():
-        for imp in imports:
-            if target_file in imp:
-                direct.append(file_path)
-                break
-
-    # collect indirectly affected files
-    for file_path in direct:
-        for other_file, imports in dependency_map.items():
-            if other_file in direct:
-                continue
-            for imp in imports:
-                if file_path in imp:
-                    indirect.append(other_file)
-                    break
-
-    direct = list(set(direct))
-    indirect = list(set(indirect))
+    direct = sorted(node for node, depth in depths.items() if depth == 1)
+    indirect = sorted(node for node, depth in depths.items() if depth > 1)
 
     score = len(direct) + len(indirect)
-    if score == 0:
-        risk = "none"
-    elif score < 3:
-        risk = "low"
-    elif score < 6:
-        risk = "medium"
-    else:
-        risk = "high"
-
-    return direct, indirect, score, risk
\ No newline at end of file
+    return direct, indirect, score, _risk_level(score)
+
+
+def analyze_impact(graph, file_paths, max_depth: int = None):
+    """Blast radius of changing all of *file_paths* at once (e.g. a PR).
+
+    Every file importing any of them, transitively up to *max_depth*, with
+    its distance; per-file fan-in/fan-out and import cycles; and the
+    combined score and risk level.
+    """
+    graph = _as_graph(graph)
+    resolved = {path: graph.resolve(path) for path in file_paths}
+    targets = list(dict.fromkeys(node for node in resolved.values() if node is not None))
+    depths = graph.impacted(targets, max_depth)
+
+    score = len(depths)
+    return {
+        "targets": targets,
+        "unknown_files": [path for path, node in resolved.items() if node is None],
+        "direct_dependents": sorted(node for node, depth in depths.items() if depth == 1),
+        "indirect_dependents": sorted(node for node, depth in depths.items() if depth > 1),
+        "depths": depths,
+        "files": {
+            node: {
+                "fan_in": graph.fan_in(node),
+                "fan_out": graph.fan_out(node),
+                "cycle": graph.cycle(node),
+            }
+            for node in targets
+        },
+        "impact_score": score,
+        "risk_level": _risk_level(score),
+    }
@@ -0,0 +1,172 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Vectors are stored in SQLite keyed by ``sha256(model_id + text)``, so the same
+chunk text is only embedded once per model no matter which project or
+re-ingest it comes from. The cache is trimmed least-recently-used first once
+it grows past its byte budget.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.config import EMBED_CACHE_ENABLED, EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB
+
+# evict down to this fraction of the budget so we don't evict on every insert
+EVICT_TARGET_RATIO = 0.9
+
+
+def cache_key(text: str, model_id: str):
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_bytes: int = EMBED_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        self._total_bytes = row[0]
+
+    # ----------------------------
+    # LOOKUP
+    # ----------------------------
+    def get_many(self, texts: list, model_id: str):
+        """Return a list aligned with *texts* holding cached vectors or None."""
+        keys = [cache_key(text, model_id) for text in texts]
+        found = {}
+
+        with self._lock:
+            # SQLite caps bound parameters, so look keys up in slices
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return [found.get(key) for key in keys]
+
+    def get(self, text: str, model_id: str):
+        return self.get_many([text], model_id)[0]
+
+    # ----------------------------
+    # STORE
+    # ----------------------------
+    def put_many(self, texts: list, vectors, model_id: str):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype="float32").tobytes()
+            rows.append((cache_key(text, model_id), model_id, len(blob) // 4, blob, now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount:
+                    self._total_bytes += len(row[3])
+            self._conn.commit()
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, text: str, vector, model_id: str):
+        self.put_many([text], [vector], model_id)
+
+    def _evict(self):
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+
+            freed = 0
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                freed += size
+                if self._total_bytes - freed <= target:
+                    break
+
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            self._conn.commit()
+            self._total_bytes -= freed
+            self.evictions += len(victims)
+
+    # ----------------------------
+    # STATS
+    # ----------------------------
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache instance, or None when EMBED_CACHE_ENABLED is off."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -0,0 +1,102 @@
+"""
+Batched, concurrent embedding pipeline used during ingestion.
+
+Texts are split into requests sized for the embedding provider (one text
+for Titan, up to 96 for Cohere, 64 for the local hashing provider), fanned out over a bounded thread pool and
+retried with exponential backoff when Bedrock throttles.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.config import EMBED_CONCURRENCY, EMBED_MAX_RETRIES
+from app.embeddings import generate_embeddings, get_embedding_provider, max_batch_size, EMBED_DIM
+from app.embedding_cache import get_embedding_cache
+
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, EMBED_CONCURRENCY),
+                thread_name_prefix="embed"
+            )
+        return _executor
+
+
+def _is_retryable(exc):
+    response = getattr(exc, "response", None) or {}
+    code = response.get("Error", {}).get("Code", "")
+    return code in RETRYABLE_ERROR_CODES
+
+
+def _embed_with_retry(texts, max_retries=EMBED_MAX_RETRIES):
+    attempt = 0
+    while True:
+        try:
+            return generate_embeddings(texts)
+        except Exception as exc:
+            attempt += 1
+            if attempt >= max_retries or not _is_retryable(exc):
+                raise
+            # exponential backoff with full jitter
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+
+
+def _embed_uncached(texts):
+    request_size = max_batch_size()
+    requests = [texts[i:i + request_size] for i in range(0, len(texts), request_size)]
+
+    if EMBED_CONCURRENCY <= 1 or len(requests) == 1:
+        results = [_embed_with_retry(batch) for batch in requests]
+    else:
+        executor = _get_executor()
+        results = list(executor.map(_embed_with_retry, requests))
+
+    return np.vstack(results).astype("float32")
+
+
+def embed_texts(texts: list):
+    """Embed *texts* concurrently and return a float32 matrix in input order.
+
+    For providers worth caching (remote models), texts already present in the
+    embedding cache are served from it; only the misses are sent to the model.
+    """
+    if not texts:
+        return np.empty((0, EMBED_DIM), dtype="float32")
+
+    provider = get_embedding_provider()
+    cache = get_embedding_cache() if provider.cacheable else None
+    if cache is None:
+        return _embed_uncached(texts)
+
+    cached = cache.get_many(texts, provider.model_id)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        fresh = _embed_uncached(missing_texts)
+        cache.put_many(missing_texts, fresh, provider.model_id)
+        for i, vector in zip(missing, fresh):
+            cached[i] = vector
+
+    return np.vstack(cached).astype("float32")
+
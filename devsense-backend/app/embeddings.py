@@ -1,9 +1,33 @@
+"""
+Text embeddings.
+
+Vectors come from the provider selected with EMBED_PROVIDER:
+
+- ``bedrock``: Titan or Cohere models on AWS Bedrock (the default when
+  USE_BEDROCK is set)
+- ``hashing``: offline hashed n-gram embeddings (see
+  :mod:`app.embeddings_hashing`), for development and air-gapped
+  deployments
+
+Every provider returns EMBED_DIM-dimensional float32 vectors. Texts are
+embedded either as documents (chunks, at ingest) or as search queries;
+models trained for asymmetric retrieval (Cohere) encode the two
+differently, the others ignore the distinction. Ingestion
+records the provider's :meth:`EmbeddingProvider.signature` and rebuilds a
+project from scratch when it changes.
+"""
 import os
 import json
+import threading
+
 import numpy as np
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
 
+from app.config import EMBED_CONCURRENCY, EMBED_PROVIDER, EMBED_DIM
+from app.embedding_cache import get_embedding_cache
+
 # load default .env then also try s.env (workspace contains s.env currently)
 load_dotenv()
 load_dotenv('s.env', override=False)
@@ -11,30 +35,159 @@ load_dotenv('s.env', override=False)
 USE_BEDROCK = os.getenv("USE_BEDROCK", "false").lower() == "true"
 
 REGION = "us-east-1"
-EMBED_MODEL_ID = "amazon.titan-embed-text-v1"  # Titan returns 1536 dimensions
-EMBED_DIM = 1536  # Titan embedding dimension
+EMBED_MODEL_ID = os.getenv("EMBED_MODEL_ID", "amazon.titan-embed-text-v1")  # Titan v1 returns 1536 dimensions
+
+# Cohere embedding models on Bedrock accept a list of texts per request;
+# Titan only takes a single inputText.
+COHERE_MAX_BATCH = 96
+# Titan v2 embeds at a requested size (256, 512 or 1024)
+TITAN_V2_PREFIX = "amazon.titan-embed-text-v2"
+
+# what a text is embedded as (Cohere's input_type values)
+SEARCH_DOCUMENT = "search_document"
+SEARCH_QUERY = "search_query"
+
+_provider = None
+_provider_lock = threading.Lock()
+
 
-if USE_BEDROCK:
-    bedrock = boto3.client("bedrock-runtime", region_name=REGION)
+class EmbeddingProvider:
+    """Turns texts into ``dim``-dimensional float32 vectors.
 
+    :meth:`embed` takes a list of texts and whether they are documents or
+    queries (SEARCH_DOCUMENT or SEARCH_QUERY), returns one row per text and
+    must be safe to call from several threads at once.
+    """
 
-def generate_embedding(text: str, dim: int = EMBED_DIM):
-    if USE_BEDROCK:
-        body = json.dumps({
-            "inputText": text
-        })
+    name = None
+    cacheable = False  # worth keeping results in the embedding cache
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def model_id(self):
+        """Identifies the vectors produced, for the embedding cache."""
+        raise NotImplementedError
+
+    def max_batch_size(self):
+        """Number of texts a single :meth:`embed` call should carry."""
+        return 1
+
+    def embed(self, texts: list, input_type: str = SEARCH_DOCUMENT):
+        raise NotImplementedError
+
+    def signature(self):
+        """Vectors are only comparable between providers with equal signatures."""
+        return [self.name, self.model_id, self.dim]
+
+
+class BedrockEmbeddingProvider(EmbeddingProvider):
+    name = "bedrock"
+    cacheable = True
+
+    def __init__(self, dim: int, model_id: str = EMBED_MODEL_ID):
+        super().__init__(dim)
+        self._model_id = model_id
+        # one pooled connection per embedding worker so concurrent calls don't queue
+        self._client = boto3.client(
+            "bedrock-runtime",
+            region_name=REGION,
+            config=Config(max_pool_connections=max(EMBED_CONCURRENCY, 10))
+        )
 
-        response = bedrock.invoke_model(
-            modelId=EMBED_MODEL_ID,
-            body=body,
+    @property
+    def model_id(self):
+        if self._model_id.startswith(TITAN_V2_PREFIX):
+            return f"{self._model_id}:{self.dim}"
+        return self._model_id
+
+    def max_batch_size(self):
+        return COHERE_MAX_BATCH if self._model_id.startswith("cohere.embed") else 1
+
+    def _invoke(self, body: dict):
+        response = self._client.invoke_model(
+            modelId=self._model_id,
+            body=json.dumps(body),
             contentType="application/json",
             accept="application/json"
         )
+        return json.loads(response["body"].read())
+
+    def _embed_one(self, text: str):
+        body = {"inputText": text}
+        if self._model_id.startswith(TITAN_V2_PREFIX):
+            body["dimensions"] = self.dim
 
-        response_body = json.loads(response["body"].read())
+        response_body = self._invoke(body)
         embedding = response_body.get("embedding", response_body.get("embeddings", []))
         return np.array(embedding).astype("float32")
 
-    # fallback mock embedding
-    np.random.seed(abs(hash(text)) % (10**8))
-    return np.random.rand(dim).astype("float32")
\ No newline at end of file
+    def embed(self, texts: list, input_type: str = SEARCH_DOCUMENT):
+        if self.max_batch_size() > 1:
+            response_body = self._invoke({
+                "texts": texts,
+                "input_type": input_type
+            })
+            vectors = np.array(response_body["embeddings"]).astype("float32")
+        else:
+            vectors = np.vstack([self._embed_one(text) for text in texts]).astype("float32")
+
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"{self._model_id} returned {vectors.shape[1]}-dimensional embeddings "
+                f"but EMBED_DIM is {self.dim}"
+            )
+        return vectors
+
+
+def _create_provider(name: str, dim: int):
+    if name == "bedrock":
+        return BedrockEmbeddingProvider(dim)
+    if name == "hashing":
+        from app.embeddings_hashing import HashingEmbeddingProvider
+        return HashingEmbeddingProvider(dim)
+    raise ValueError(f"Unknown EMBED_PROVIDER '{name}' (expected bedrock or hashing)")
+
+
+def get_embedding_provider():
+    """The process-wide provider configured by EMBED_PROVIDER and EMBED_DIM."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = _create_provider(EMBED_PROVIDER, EMBED_DIM)
+        return _provider
+
+
+def max_batch_size():
+    """Number of texts a single embedding request can carry for the configured provider"""
+    return get_embedding_provider().max_batch_size()
+
+
+def generate_embedding(text: str, input_type: str = SEARCH_QUERY):
+    """Embed one text, by default as a search query."""
+    provider = get_embedding_provider()
+    cache = get_embedding_cache() if provider.cacheable else None
+    # documents keep the plain model id so ingest-time cache entries are reused
+    cache_model = provider.model_id if input_type == SEARCH_DOCUMENT else f"{provider.model_id}:{input_type}"
+    if cache is not None:
+        cached = cache.get(text, cache_model)
+        if cached is not None:
+            return cached
+
+    embedding = provider.embed([text], input_type)[0]
+    if cache is not None:
+        cache.put(text, embedding, cache_model)
+    return embedding
+
+
+def generate_embeddings(texts: list, input_type: str = SEARCH_DOCUMENT):
+    """Embed several texts in one provider call, by default as documents.
+
+    Returns a float32 matrix with one row per input text. This always calls
+    the provider; callers embedding in bulk check the embedding cache first.
+    """
+    if not texts:
+        return np.empty((0, EMBED_DIM), dtype="float32")
+
+    return get_embedding_provider().embed(texts, input_type)
@@ -0,0 +1,125 @@
+"""
+Offline hashed n-gram embeddings.
+
+Text is split into lower-cased word pieces (snake_case and camelCase
+identifiers are broken up). Each piece, each pair of adjacent pieces and
+each character n-gram of a piece is hashed into one of ``dim`` signed
+buckets (the hashing trick); bucket counts are damped with ``log1p`` and
+rows L2-normalized, so L2 distance and inner product both rank by cosine
+similarity.
+
+Nothing is fitted to the corpus, so a vector never changes once computed
+and incremental ingests stay consistent; weighting rare terms is left to
+the BM25 half of hybrid search (see :mod:`app.lexical_index`). Hashes come
+from blake2b, not ``hash()``, so vectors are the same in every process.
+
+A batch is scattered into one matrix with ``np.bincount`` and per-piece
+hashes are memoized, so embedding costs about as much as tokenizing.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+from app.config import EMBED_HASH_CHAR_NGRAM
+from app.embeddings import EmbeddingProvider, SEARCH_DOCUMENT
+
+# bump when features or weights change so existing projects are re-embedded
+HASHING_VERSION = 1
+
+PIECE_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+")
+
+PAIR_WEIGHT = 1.0
+CHAR_NGRAM_WEIGHT = 0.25  # a piece has several n-grams; keep them from drowning it out
+MAX_CACHED_PIECES = 1 << 18
+
+_PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _hash(text: str):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(hashes):
+    # splitmix64 finalizer: spreads combined hashes over all 64 bits
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    name = "hashing"
+
+    def __init__(self, dim: int, char_ngram: int = EMBED_HASH_CHAR_NGRAM):
+        super().__init__(dim)
+        self.char_ngram = char_ngram
+        # piece -> (piece hash, its n-gram hashes); dict reads and writes are
+        # atomic, so concurrent callers at worst hash a piece twice
+        self._pieces = {}
+
+    @property
+    def model_id(self):
+        return f"hashing-v{HASHING_VERSION}-n{self.char_ngram}"
+
+    def max_batch_size(self):
+        # large enough to vectorize well, small enough to spread a pipeline
+        # batch over its workers
+        return 64
+
+    def _piece_features(self, piece: str):
+        features = self._pieces.get(piece)
+        if features is None:
+            n = self.char_ngram
+            padded = f"<{piece}>"
+            grams = [padded[i:i + n] for i in range(len(padded) - n + 1)] if n > 0 else []
+            features = (_hash(piece), np.array([_hash(gram) for gram in grams], dtype=np.uint64))
+            if len(self._pieces) >= MAX_CACHED_PIECES:
+                self._pieces = {}
+            self._pieces[piece] = features
+        return features
+
+    def _text_features(self, text: str):
+        """Hashes and weights of every feature of *text*."""
+        features = [self._piece_features(piece.lower()) for piece in PIECE_RE.findall(text)]
+        if not features:
+            return None, None
+
+        words = np.fromiter((word for word, _ in features), dtype=np.uint64, count=len(features))
+        pairs = _mix((words[:-1] * _PAIR_MULTIPLIER) ^ words[1:])
+        grams = np.concatenate([grams for _, grams in features])
+
+        hashes = np.concatenate([words, pairs, grams])
+        weights = np.concatenate([
+            np.ones(len(words)),
+            np.full(len(pairs), PAIR_WEIGHT),
+            np.full(len(grams), CHAR_NGRAM_WEIGHT),
+        ])
+        return hashes, weights
+
+    def embed(self, texts: list, input_type: str = SEARCH_DOCUMENT):
+        # documents and queries share one feature space
+        rows, hashes, weights = [], [], []
+        for row, text in enumerate(texts):
+            text_hashes, text_weights = self._text_features(text)
+            if text_hashes is None:
+                continue
+            rows.append(np.full(len(text_hashes), row, dtype=np.int64))
+            hashes.append(text_hashes)
+            weights.append(text_weights)
+
+        if not hashes:
+            return np.zeros((len(texts), self.dim), dtype="float32")
+
+        hashes = np.concatenate(hashes)
+        buckets = ((hashes >> np.uint64(1)) % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where((hashes & np.uint64(1)) == 1, 1.0, -1.0)
+
+        flat = np.concatenate(rows) * self.dim + buckets
+        vectors = np.bincount(flat, weights=signs * np.concatenate(weights), minlength=len(texts) * self.dim)
+        vectors = vectors.reshape(len(texts), self.dim)
+
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype("float32")
@@ -1,6 +1,7 @@
 import re
 from app.vector_store import VectorStore
 from app.embeddings import generate_embedding
+from app.index_cache import index_cache
 
 
 def extract_file_references(error_text: str):
@@ -17,12 +18,48 @@ def extract_file_references(error_text: str):
     return extracted
 
 
-def search_error_context(error_text: str, top_k: int = 5):
-    vector_store = VectorStore()
+def map_file_references(error_text: str, project_name: str = None):
+    """Resolve each stack-trace reference to the ingested chunk containing
+    that line. References outside the project get ``chunk`` set to None."""
+    references = extract_file_references(error_text)
+
+    cached = index_cache.get(project_name or "default")
+    for reference in references:
+        chunk_id = cached.chunks.find_chunk(reference["file_path"], reference["line"]) if cached else None
+        chunk = None
+        if chunk_id is not None:
+            chunk = cached.chunks[chunk_id]
+            chunk["id"] = chunk_id
+        reference["chunk"] = chunk
+
+    return references
+
+
+def search_error_context(error_text: str, top_k: int = 5, project_name: str = None):
+    # chunks the stack trace points at come first, innermost frame first
+    results = []
+    seen = set()
+    for reference in reversed(map_file_references(error_text, project_name)):
+        if len(results) >= top_k:
+            return results
+        chunk = reference["chunk"]
+        if chunk is not None and (chunk["file_path"], chunk["start_line"]) not in seen:
+            seen.add((chunk["file_path"], chunk["start_line"]))
+            results.append(chunk)
+
+    if len(results) >= top_k:
+        return results
+
+    vector_store = VectorStore(project_name)
     vector_store.load()
 
     query_embedding = generate_embedding(error_text)
 
-    results = vector_store.search(query_embedding, top_k=top_k)
+    for chunk in vector_store.search(query_embedding, top_k=top_k):
+        if len(results) >= top_k:
+            break
+        if (chunk["file_path"], chunk["start_line"]) not in seen:
+            seen.add((chunk["file_path"], chunk["start_line"]))
+            results.append(chunk)
 
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,193 @@
+"""
+Versioned on-disk layout for project indexes.
+
+    data/projects/<project>/
+        CURRENT                   name of the published generation
+        generations/<generation>/ index.faiss, index.lexical.npz,
+                                  chunks.{records,contents,files.json,tombstones}
+                                  (plus chunks.<segment>.* hard-linked
+                                  from earlier generations),
+                                  manifest.json, dependencies.npz
+        staging/<generation>/     an ingest in progress
+
+An ingest writes a complete generation into ``staging/``, fsyncs it, renames
+it into ``generations/`` and only then atomically replaces ``CURRENT``.
+Readers resolve ``CURRENT`` once and read every file from that generation's
+directory (they *pin* it), so a query never pairs a new index with old chunk
+metadata or sees a half-written file. The newest INDEX_GENERATIONS_RETAINED
+generations are kept; on POSIX, removing an older one doesn't disturb a
+reader that still has its files open or memory-mapped.
+
+Projects ingested before this layout (flat files under ``data/indexes`` and
+``data/metadata``) are read as the ``legacy`` generation until their next
+ingest publishes a real one.
+"""
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from app.config import INDEX_GENERATIONS_RETAINED
+from app.chunk_store import store_files
+from app.lexical_index import lexical_index_path
+
+BASE_PROJECT_PATH = "data/projects"
+LEGACY_INDEX_PATH = "data/indexes"
+LEGACY_METADATA_PATH = "data/metadata"
+LEGACY_GENERATION = "legacy"
+
+CURRENT_FILE = "CURRENT"
+STALE_STAGING_SECONDS = 24 * 3600  # staging dirs older than this are from crashed ingests
+
+
+class Generation:
+    """Paths of the files making up one generation of a project's index."""
+
+    def __init__(self, project_name: str, name: str, directory: Path):
+        self.project_name = project_name
+        self.name = name
+        self.directory = directory
+
+        if name == LEGACY_GENERATION:
+            self.index_path = Path(LEGACY_INDEX_PATH) / f"{project_name}.index"
+            self.chunks_prefix = Path(LEGACY_METADATA_PATH) / project_name
+            self.manifest_path = Path(LEGACY_METADATA_PATH) / f"{project_name}.manifest.json"
+            self.dependencies_path = Path(LEGACY_METADATA_PATH) / f"{project_name}.deps.npz"
+        else:
+            self.index_path = directory / "index.faiss"
+            self.chunks_prefix = directory / "chunks"
+            self.manifest_path = directory / "manifest.json"
+            self.dependencies_path = directory / "dependencies.npz"
+
+        self.lexical_path = Path(lexical_index_path(self.index_path))
+
+    @property
+    def legacy(self):
+        return self.name == LEGACY_GENERATION
+
+    def files(self):
+        """Every file of this generation that exists on disk."""
+        candidates = [self.index_path, self.lexical_path, self.manifest_path, self.dependencies_path]
+        return [path for path in candidates if path.exists()] + [Path(path) for path in store_files(self.chunks_prefix)]
+
+
+def project_dir(project_name: str):
+    return Path(BASE_PROJECT_PATH) / (project_name or "default")
+
+
+def current_generation(project_name: str):
+    """The published generation of *project_name*, or None if it has none."""
+    project_name = project_name or "default"
+    root = project_dir(project_name)
+    try:
+        name = (root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        name = None
+
+    if name:
+        directory = root / "generations" / name
+        if directory.is_dir():
+            return Generation(project_name, name, directory)
+
+    legacy = Generation(project_name, LEGACY_GENERATION, Path(LEGACY_INDEX_PATH))
+    if legacy.index_path.exists():
+        return legacy
+    return None
+
+
+def list_generations(project_name: str):
+    """Names of the project's published generations, oldest first."""
+    directory = project_dir(project_name) / "generations"
+    if not directory.is_dir():
+        return []
+    return sorted(entry.name for entry in directory.iterdir() if entry.is_dir())
+
+
+def begin_generation(project_name: str):
+    """A new, empty generation in the project's staging area."""
+    project_name = project_name or "default"
+    # names sort by creation time, so pruning can keep the newest
+    now = time.time()
+    name = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+    directory = project_dir(project_name) / "staging" / name
+    directory.mkdir(parents=True)
+    return Generation(project_name, name, directory)
+
+
+def discard_generation(generation: Generation):
+    shutil.rmtree(generation.directory, ignore_errors=True)
+
+
+def _fsync(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path: Path):
+    # directories can't be opened for fsync on Windows; rename durability
+    # there is up to the filesystem
+    if os.name != "nt":
+        _fsync(path)
+
+
+def publish_generation(staging: Generation, retain: int = INDEX_GENERATIONS_RETAINED):
+    """Make a fully written staging generation the project's current one.
+
+    Files are flushed to disk before the generation directory is renamed into
+    place, and that rename is durable before ``CURRENT`` is switched with an
+    atomic replace, so a crash leaves either the old or the new generation
+    current, never a mix.
+    """
+    root = project_dir(staging.project_name)
+    previous = current_generation(staging.project_name)
+
+    for path in staging.files():
+        _fsync(path)
+    _fsync_dir(staging.directory)
+
+    generations_dir = root / "generations"
+    generations_dir.mkdir(parents=True, exist_ok=True)
+    directory = generations_dir / staging.name
+    os.replace(staging.directory, directory)
+    _fsync_dir(generations_dir)
+
+    tmp_path = root / f"{CURRENT_FILE}.{staging.name}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(staging.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, root / CURRENT_FILE)
+    _fsync_dir(root)
+
+    published = Generation(staging.project_name, staging.name, directory)
+    prune_generations(staging.project_name, retain)
+    if previous is not None and previous.legacy:
+        for path in previous.files():
+            path.unlink()
+    return published
+
+
+def prune_generations(project_name: str, retain: int = INDEX_GENERATIONS_RETAINED):
+    """Remove all but the newest *retain* generations (never the current one)
+    and staging directories left behind by crashed ingests."""
+    root = project_dir(project_name)
+    current = current_generation(project_name)
+    names = list_generations(project_name)
+
+    keep = set(names[-max(retain, 1):])
+    if current is not None:
+        keep.add(current.name)
+    for name in names:
+        if name not in keep:
+            shutil.rmtree(root / "generations" / name, ignore_errors=True)
+
+    staging_dir = root / "staging"
+    if staging_dir.is_dir():
+        for entry in staging_dir.iterdir():
+            # leave ingests that may still be running alone
+            if time.time() - entry.stat().st_mtime > STALE_STAGING_SECONDS:
+                shutil.rmtree(entry, ignore_errors=True)
@@ -0,0 +1,141 @@
+"""
+Process-level LRU cache of loaded FAISS indexes and chunk metadata.
+
+Loading a project means reading the index file and opening its chunk store,
+so the query path keeps recently used projects resident. With INDEX_MMAP the
+stored vectors, the chunk store and the lexical postings are memory-mapped
+read-only rather than copied into the process, so uvicorn workers serving
+the same project share one copy through the OS page cache and a cold worker
+can answer its first query without deserializing the whole index.
+
+Entries are keyed by the project's published generation (see
+:mod:`app.generations`): an entry is reloaded once a re-ingest publishes a
+new one, and until then readers keep a consistent index and chunk store.
+Least-recently-used projects are dropped once the memory budget is hit.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from app.config import INDEX_CACHE_MAX_MB, INDEX_MMAP
+from app.chunk_store import ChunkStore, store_paths
+from app.lexical_index import LexicalIndex
+from app.generations import Generation, current_generation
+from app.index_factory import read_index
+
+
+class CachedIndex:
+    def __init__(self, project_name, index, chunks, generation, nbytes, lexical=None):
+        self.project_name = project_name
+        self.index = index
+        self.chunks = chunks
+        self.generation = generation
+        self.nbytes = nbytes
+        self.lexical = lexical
+        # vectors of removed chunks still in an index that can't delete them
+        self.stale_vectors = max(0, index.ntotal - len(chunks.live_ids()))
+
+
+def _generation(generation: Generation):
+    """Identity of a generation's on-disk state: its name or, for the legacy
+    layout that is rewritten in place, the files' mtimes and sizes."""
+    if not generation.legacy:
+        return generation.name
+    try:
+        index_stat = os.stat(generation.index_path)
+        metadata_stat = os.stat(store_paths(generation.chunks_prefix)[0])
+    except FileNotFoundError:
+        return None
+    return (
+        f"{index_stat.st_mtime_ns:x}.{index_stat.st_size:x}-"
+        f"{metadata_stat.st_mtime_ns:x}.{metadata_stat.st_size:x}"
+    )
+
+
+class IndexCache:
+    def __init__(self, max_bytes: int = INDEX_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, project_name: str):
+        """Return the project's CachedIndex, loading it if needed, or None if not ingested."""
+        # pin the current generation; every file below is read from it
+        current = current_generation(project_name)
+        generation = _generation(current) if current is not None else None
+
+        with self._lock:
+            entry = self._entries.get(project_name)
+            if entry is not None and entry.generation == generation:
+                self._entries.move_to_end(project_name)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        if generation is None:
+            self.invalidate(project_name)
+            return None
+
+        # Load outside the lock so one cold project doesn't stall queries for others
+        index = read_index(current.index_path, mmap=INDEX_MMAP)
+        chunks = ChunkStore(current.chunks_prefix)
+
+        # projects ingested before hybrid search have no lexical index
+        lexical = None
+        if current.lexical_path.exists():
+            lexical = LexicalIndex.load(current.lexical_path, mmap=INDEX_MMAP)
+
+        nbytes = os.path.getsize(current.index_path) + chunks.nbytes() + (lexical.nbytes() if lexical else 0)
+        entry = CachedIndex(project_name, index, chunks, generation, nbytes, lexical)
+
+        with self._lock:
+            old = self._entries.pop(project_name, None)
+            if old is not None:
+                self._total_bytes -= old.nbytes
+            self._entries[project_name] = entry
+            self._total_bytes += nbytes
+            self._evict()
+
+        return entry
+
+    def invalidate(self, project_name: str):
+        with self._lock:
+            entry = self._entries.pop(project_name, None)
+            if entry is not None:
+                self._total_bytes -= entry.nbytes
+
+    def preload(self, project_names):
+        for project_name in project_names:
+            try:
+                if self.get(project_name) is None:
+                    print(f"Preload skipped, no index for project '{project_name}'")
+            except Exception as e:
+                print(f"Error preloading index for '{project_name}': {e}")
+
+    def _evict(self):
+        # always keep the most recent entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "projects": list(self._entries.keys()),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "mmap": INDEX_MMAP,
+            }
+
+
+index_cache = IndexCache()
@@ -0,0 +1,195 @@
+"""
+FAISS index construction for project vector indexes.
+
+Supports exact (Flat), graph (HNSW) and inverted-file (IVF-Flat, IVF-PQ)
+indexes, optionally with float16/int8 scalar quantization of the stored
+vectors. Every index is wrapped in IDMap2 so chunk ids stay stable across
+incremental re-ingests.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+from app.config import INDEX_NPROBE, INDEX_EF_SEARCH
+
+INDEX_TYPES = ["flat", "hnsw", "ivf_flat", "ivf_pq"]
+QUANTIZATIONS = {"none": None, "fp16": "SQfp16", "int8": "SQ8"}
+
+# corpus sizes at which "auto" switches to a cheaper index
+HNSW_THRESHOLD = 20000
+IVF_THRESHOLD = 200000
+IVF_PQ_THRESHOLD = 2000000
+
+HNSW_M = 32
+MIN_POINTS_PER_CENTROID = 39  # below this FAISS k-means warns and clusters poorly
+
+
+def choose_index_type(n_vectors: int):
+    """Pick an index type for a corpus of roughly *n_vectors* chunks."""
+    if n_vectors < HNSW_THRESHOLD:
+        return "flat"
+    if n_vectors < IVF_THRESHOLD:
+        return "hnsw"
+    if n_vectors < IVF_PQ_THRESHOLD:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _nlist(n_vectors: int):
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_layout(dim: int, n_vectors: int):
+    # sub-quantizers of ~16 dims each, and no more centroids than the corpus can train
+    m = next(m for m in (dim // 16, dim // 8, dim // 4, dim // 2, dim, 1) if m and dim % m == 0)
+    nbits = max(1, min(8, int(math.log2(max(2, n_vectors // MIN_POINTS_PER_CENTROID)))))
+    return m, nbits
+
+
+def index_description(index_type: str, dim: int, n_vectors: int, quantization: str = "none"):
+    """Build the faiss.index_factory string for the requested index."""
+    if index_type == "auto":
+        index_type = choose_index_type(n_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES} or 'auto'.")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}'. Expected one of {list(QUANTIZATIONS)}.")
+
+    storage = QUANTIZATIONS[quantization]
+
+    if index_type == "flat":
+        return storage or "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}" + (f",{storage}" if storage else "")
+    if index_type == "ivf_flat":
+        return f"IVF{_nlist(n_vectors)}," + (storage or "Flat")
+
+    # PQ already compresses the vectors, so scalar quantization doesn't apply
+    m, nbits = _pq_layout(dim, n_vectors)
+    return f"IVF{_nlist(n_vectors)},PQ{m}x{nbits}"
+
+
+def build_index(dim: int, n_vectors: int, index_type: str = "auto", quantization: str = "none"):
+    """Create an empty (possibly untrained) ID-mapped index and its description."""
+    description = index_description(index_type, dim, n_vectors, quantization)
+    index = faiss.index_factory(dim, f"IDMap2,{description}")
+    return index, description
+
+
+def training_sample_size(index, n_vectors: int):
+    """How many vectors to buffer before training, or 0 if no training is needed."""
+    if index.is_trained:
+        return 0
+    ivf = faiss.try_extract_index_ivf(index)
+    nlist = ivf.nlist if ivf is not None else 256
+    return min(n_vectors, max(nlist * MIN_POINTS_PER_CENTROID, 256 * MIN_POINTS_PER_CENTROID))
+
+
+def write_index(index, path):
+    """Write *index* to a temp file and rename it into place, so processes that
+    have the old file memory-mapped keep a valid (if stale) view of it."""
+    path = str(path)
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_index(path, mmap: bool = False):
+    """Load an index. With *mmap*, the stored vectors (flat codes and IVF
+    lists) are mapped read-only from the file instead of copied into process
+    memory, so every worker process shares one copy through the page cache
+    and a cold load doesn't deserialize them. Such an index must not be
+    modified."""
+    flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    return faiss.read_index(str(path), flags)
+
+
+def search_params(index, nprobe: int = None, ef_search: int = None):
+    """Per-query search parameters for IVF/HNSW indexes (None for exact indexes)."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe or INDEX_NPROBE)
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or INDEX_EF_SEARCH)
+
+    return None
+
+
+def search(index, query_vectors, top_k: int, nprobe: int = None, ef_search: int = None):
+    return index.search(query_vectors, top_k, params=search_params(index, nprobe, ef_search))
+
+
+def remove_ids(index, ids):
+    """Remove *ids* if the index supports it. HNSW graphs can't delete nodes, so
+    their stale vectors stay searchable and are filtered out by the metadata
+    (queries overfetch to make up for them) until :func:`rebuild_index`."""
+    try:
+        return index.remove_ids(np.asarray(ids, dtype="int64"))
+    except RuntimeError:
+        return 0
+
+
+def renumber_ids(index, renumber):
+    """Map the ids of an ID-mapped *index* through *renumber* (an array of
+    old id -> new id) in place, after the chunk store was compacted. Every id
+    in the index must map to a new one."""
+    ids = faiss.vector_to_array(index.id_map)
+    faiss.copy_array_to_vector(np.ascontiguousarray(renumber[ids], dtype="int64"), index.id_map)
+    if isinstance(index, faiss.IndexIDMap2):
+        index.construct_rev_map()
+
+
+def rebuild_index(index, ids, description: str, block: int = 65536):
+    """A new index of the same *description* holding only the vectors of *ids*,
+    copied out of *index* without re-embedding. Used to drop the stale vectors
+    of indexes that can't remove them in place."""
+    ids = np.asarray(ids, dtype="int64")
+    rebuilt = faiss.index_factory(index.d, f"IDMap2,{description}", index.metric_type)
+    for start in range(0, len(ids), block):
+        batch = ids[start:start + block]
+        rebuilt.add_with_ids(index.reconstruct_batch(batch), batch)
+    return rebuilt
+
+
+class RecallTracker:
+    """Exact top-k ground truth for a sample of query vectors, built as the
+    corpus streams into the index, so recall@k can be measured after ingest
+    without keeping every vector in memory."""
+
+    def __init__(self, n_queries: int, k: int = 10):
+        self.n_queries = n_queries
+        self.k = k
+        self.queries = None
+        self._heap = None
+
+    def add(self, vectors, ids):
+        if self.n_queries <= 0:
+            return
+
+        if self.queries is None:
+            self.queries = np.ascontiguousarray(vectors[:self.n_queries])
+            self._heap = faiss.ResultHeap(len(self.queries), self.k)
+
+        distances, positions = faiss.knn(self.queries, vectors, min(self.k, len(vectors)))
+        labels = np.where(positions >= 0, np.asarray(ids, dtype="int64")[positions], -1)
+        if positions.shape[1] < self.k:
+            pad = self.k - positions.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            labels = np.pad(labels, ((0, 0), (0, pad)), constant_values=-1)
+        self._heap.add_result(np.ascontiguousarray(distances, dtype="float32"), np.ascontiguousarray(labels))
+
+    def recall(self, index, nprobe: int = None, ef_search: int = None):
+        """Fraction of the exact top-k neighbours the index returns."""
+        if self.queries is None:
+            return None
+
+        self._heap.finalize()
+        truth = self._heap.I
+        _, found = search(index, self.queries, self.k, nprobe, ef_search)
+
+        hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+        total = int((truth >= 0).sum())
+        return round(hits / total, 4) if total else None
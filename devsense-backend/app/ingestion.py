@@ -1,164 +1,521 @@
 import os
 import json
-import subprocess
-import shutil
+import hashlib
 import faiss
 import numpy as np
-import time
-import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from app.query_engine import embed_text
+from app.embedding_pipeline import embed_texts
+from app.embeddings import get_embedding_provider
+from app.config import (
+    EMBED_BATCH_SIZE, INDEX_TYPE, INDEX_QUANTIZATION, RECALL_SAMPLE_QUERIES, MAX_CHUNKS, CHUNK_MAX_TOKENS,
+    SCAN_WORKERS, SCAN_READ_THREADS, SCAN_BATCH_FILES, SCAN_PARALLEL_MIN_FILES, SPARSE_CHECKOUT,
+    INDEX_MAX_STALE_FRACTION
+)
+from app.chunking import chunk_source, CHARS_PER_TOKEN, CHUNKER_VERSION
+from app.index_factory import build_index, training_sample_size, remove_ids, renumber_ids, rebuild_index, write_index, RecallTracker
+from app.index_cache import index_cache
+from app.chunk_store import ChunkStore, ChunkStoreWriter, store_exists
+from app.lexical_index import LexicalIndex, LexicalIndexBuilder, build_from_chunks, chunk_terms_text
+from app.dependency_analyzer import build_project_graph
+from app.repositories import run_git, checkout_repository, normalize_source
+from app.generations import Generation, current_generation, begin_generation, discard_generation, publish_generation
 
 # ====== HARD LIMITS ======
 MAX_FILE_SIZE_KB = 500
-MAX_TOTAL_CHUNKS = 10000
-CHUNK_SIZE = 500
-CHUNK_OVERLAP = 100
+MAX_TOTAL_CHUNKS = MAX_CHUNKS
 ALLOWED_EXTENSIONS = [".py", ".js", ".ts", ".tsx", ".java", ".md", ".json", ".jsx", ".go", ".rb", ".php", ".c", ".cpp", ".h", ".cs", ".swift", ".kt", ".rs"]
 
+SKIP_DIRS = ["node_modules", ".git", "build", "dist", "__pycache__", "venv", ".venv"]
+
+# read from the checkout by /dependencies even though they aren't indexed
+MANIFEST_FILES = ["requirements.txt", "package.json", "pyproject.toml"]
+
 BASE_REPO_PATH = "data/repos"
 
 
-def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
-    return chunks
+class IngestionCancelled(Exception):
+    """Raised from a progress callback to stop an ingest at the next checkpoint."""
 
 
-def ingest_repository(repo_url: str, project_name: str):
-    # Use Path for cross-platform compatibility
-    project_path = Path(BASE_REPO_PATH) / project_name
-    
-    # Clone repo - use cross-platform directory removal with retry
-    if project_path.exists():
-        try:
-            # On Windows, sometimes files are locked, so we need to be more aggressive
-            for attempt in range(3):
-                try:
-                    shutil.rmtree(project_path, ignore_errors=False)
-                    break
-                except Exception as e:
-                    if attempt < 2:
-                        time.sleep(1)  # Wait and retry
-                    else:
-                        # Last resort: use ignore_errors
-                        shutil.rmtree(project_path, ignore_errors=True)
-            
-            # Wait to ensure cleanup is complete
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"Warning: Could not fully remove old directory: {e}")
-    
-    # Ensure parent directory exists
-    project_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Clone to a temporary directory first (outside OneDrive) to avoid sync issues
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_clone_path = Path(temp_dir) / project_name
-        
-        try:
-            print(f"Cloning to temporary directory: {temp_clone_path}")
-            # Clone to temp directory
-            result = subprocess.run(
-                ["git", "clone", "--depth", "1", repo_url, str(temp_clone_path)],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-            
-            if result.returncode != 0 and "Clone succeeded" not in result.stderr:
-                raise Exception(f"Git clone failed: {result.stderr}")
-            
-            print("Clone completed, moving to final location...")
-            
-            # Now copy from temp to final location (this avoids git checkout issues)
-            shutil.copytree(temp_clone_path, project_path, dirs_exist_ok=True, ignore=shutil.ignore_patterns('.git'))
-            
-            print(f"Repository copied to: {project_path}")
-                
-        except subprocess.TimeoutExpired:
-            raise Exception("Repository clone timed out (>5 minutes)")
-        except Exception as e:
-            raise Exception(f"Failed to clone repository: {str(e)}")
+def _head_commit(project_path: Path):
+    result = run_git(["rev-parse", "HEAD"], cwd=project_path)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _changed_paths(project_path: Path, old_commit: str, new_commit: str):
+    """Paths touched between two commits, or None when git can't tell us."""
+    if not old_commit or not new_commit:
+        return None
+
+    result = run_git(["diff", "--name-only", "--no-renames", "-z", old_commit, new_commit], cwd=project_path)
+    if result.returncode != 0:
+        return None
 
-    all_chunks = []
-    embeddings = []
+    return [path for path in result.stdout.split("\0") if path]
 
-    # Walk through the cloned repository
+
+def _is_indexable(file_path: Path):
+    # Check file extension
+    if not any(file_path.name.endswith(ext) for ext in ALLOWED_EXTENSIONS):
+        return False
+
+    if any(part in SKIP_DIRS for part in file_path.parts):
+        return False
+
+    # Check file size
+    try:
+        file_size_kb = file_path.stat().st_size / 1024
+        return file_size_kb <= MAX_FILE_SIZE_KB
+    except:
+        return False
+
+
+def _walk_source_files(project_path: Path):
+    """Yield repo-relative POSIX paths of every indexable file."""
     for root, dirs, files in os.walk(project_path):
         # Skip heavy folders and .git
-        dirs[:] = [d for d in dirs if d not in ["node_modules", ".git", "build", "dist", "__pycache__", "venv", ".venv"]]
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
 
         for file in files:
             file_path = Path(root) / file
+            if _is_indexable(file_path):
+                yield file_path.relative_to(project_path).as_posix()
+
+
+def _sparse_patterns():
+    """Sparse-checkout patterns materializing only what ingestion reads."""
+    patterns = [f"*{ext}" for ext in ALLOWED_EXTENSIONS]
+    patterns += [f"/{name}" for name in MANIFEST_FILES]
+    patterns += [f"!**/{name}/**" for name in SKIP_DIRS]
+    return patterns
+
+
+def _chunker_signature():
+    return [CHUNKER_VERSION, CHUNK_MAX_TOKENS]
+
+
+def _load_previous_state(generation: Generation, repo_url: str):
+    """Load the index and manifest of a published generation, if compatible."""
+    if not (generation.index_path.exists() and store_exists(generation.chunks_prefix)
+            and generation.manifest_path.exists()):
+        return None
+
+    try:
+        with open(generation.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if "next_id" not in manifest or normalize_source(manifest.get("repo_url", "")) != normalize_source(repo_url):
+            return None
+
+        # chunks cut by another chunker (or chunk size) can't be mixed with new ones
+        if manifest.get("chunker") != _chunker_signature():
+            return None
+
+        # nor can vectors from another embedding provider or dimension
+        if manifest.get("embedding") != get_embedding_provider().signature():
+            return None
+
+        index = faiss.read_index(str(generation.index_path))
+        chunks = ChunkStore(generation.chunks_prefix)
+    except Exception as e:
+        print(f"Could not load previous ingest state, rebuilding: {e}")
+        return None
+
+    # Indexes written before incremental ingestion have positional ids only
+    if not isinstance(index, faiss.IndexIDMap):
+        return None
+
+    return index, chunks, manifest
+
+
+def _previous_lexical_index(generation: Generation, previous_chunks: ChunkStore):
+    """Builder seeded with the last ingest's lexical postings, re-tokenizing
+    the chunk store for projects ingested before the lexical index existed."""
+    path = generation.lexical_path
+    if os.path.exists(path):
+        try:
+            return LexicalIndexBuilder(LexicalIndex.load(path))
+        except Exception as e:
+            print(f"Could not load lexical index, rebuilding it: {e}")
+    return build_from_chunks(previous_chunks)
+
+
+def _estimate_chunk_count(project_path: Path, rel_paths):
+    stride = CHUNK_MAX_TOKENS * CHARS_PER_TOKEN
+    total = 0
+    for rel_path in rel_paths:
+        try:
+            total += (project_path / rel_path).stat().st_size // stride + 1
+        except OSError:
+            continue
+    return min(total, MAX_TOTAL_CHUNKS)
+
+
+def _read_file(project_path: Path, rel_path: str, files: dict):
+    """``(content_hash, text)`` of a file whose content differs from the
+    manifest, else None. Runs on the read thread pool."""
+    file_path = project_path / rel_path
+    if not _is_indexable(file_path):
+        return None
+
+    try:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None
+
+    content_hash = hashlib.sha1(raw).hexdigest()
+    if files.get(rel_path, {}).get("hash") == content_hash:
+        return None
+
+    return content_hash, raw.decode("utf-8", errors="ignore")
+
+
+def _chunk_text(args):
+    # module-level so the process pool can pickle it
+    rel_path, text = args
+    return list(chunk_source(text, rel_path))
+
+
+def _scan_changed_files(project_path: Path, rel_paths, files: dict, parallel: bool = False,
+                        workers: int = SCAN_WORKERS):
+    """Yield ``(rel_path, content_hash, chunks)`` for files whose content
+    differs from the manifest, in the order of *rel_paths*.
+
+    Files are taken SCAN_BATCH_FILES at a time: a thread pool reads and
+    hashes them and, with *parallel* set, a process pool of *workers* (0 for
+    one per CPU) chunks them. Output order and chunk boundaries are the same
+    as a serial scan, and only one batch is in memory at once.
+    """
+    rel_paths = iter(rel_paths)
+    workers = workers or os.cpu_count() or 1
+    readers = ThreadPoolExecutor(max_workers=SCAN_READ_THREADS, thread_name_prefix="ingest-read")
+    chunkers = None
+    try:
+        while True:
+            batch = list(islice(rel_paths, SCAN_BATCH_FILES))
+            if not batch:
+                return
 
-            # Check file extension
-            if not any(file.endswith(ext) for ext in ALLOWED_EXTENSIONS):
-                continue
-
-            # Check file size
-            try:
-                file_size_kb = file_path.stat().st_size / 1024
-                if file_size_kb > MAX_FILE_SIZE_KB:
-                    continue
-            except:
-                continue
-
-            # Read and process file
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-
-                chunks = chunk_text(content)
-
-                for chunk in chunks:
-                    if len(all_chunks) >= MAX_TOTAL_CHUNKS:
-                        print(f"Chunk limit ({MAX_TOTAL_CHUNKS}) reached. Stopping ingestion.")
-                        break
-
-                    embedding = embed_text(chunk)
-                    embeddings.append(embedding)
-                    all_chunks.append({
-                        "file": str(file_path),
-                        "content": chunk
-                    })
-
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-                continue
-
-        if len(all_chunks) >= MAX_TOTAL_CHUNKS:
-            break
-
-    if not embeddings:
+            reads = readers.map(lambda rel_path: _read_file(project_path, rel_path, files), batch)
+            changed = [(rel_path, read) for rel_path, read in zip(batch, reads) if read is not None]
+            tasks = [(rel_path, text) for rel_path, (_, text) in changed]
+
+            if chunkers is None and parallel and workers > 1 and tasks:
+                # spawn, not fork: ingestion runs on server worker threads
+                chunkers = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            if chunkers is not None:
+                chunked = chunkers.map(_chunk_text, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            else:
+                chunked = map(_chunk_text, tasks)
+
+            for (rel_path, (content_hash, _)), chunks in zip(changed, chunked):
+                yield rel_path, content_hash, chunks
+    finally:
+        readers.shutdown(wait=False, cancel_futures=True)
+        if chunkers is not None:
+            chunkers.shutdown(wait=True, cancel_futures=True)
+
+
+class _IndexBuilder:
+    """Adds embedded batches to the FAISS index as they arrive.
+
+    IVF/PQ indexes buffer vectors until a training sample is available, and
+    full builds track exact neighbours for a query sample to report recall.
+    """
+
+    def __init__(self, index, estimated_chunks, index_type, quantization, recall_queries=0):
+        self.index = index
+        self.estimated_chunks = estimated_chunks
+        self.index_type = index_type
+        self.quantization = quantization
+        self.info = None
+        self.recall_tracker = RecallTracker(recall_queries)
+        self._untrained = []
+
+    def add(self, vectors, ids):
+        self.recall_tracker.add(vectors, ids)
+
+        if self.index is None:
+            self.index, description = build_index(vectors.shape[1], self.estimated_chunks, self.index_type, self.quantization)
+            self.info = {"type": self.index_type, "quantization": self.quantization, "description": description}
+
+        if self.index.is_trained:
+            self.index.add_with_ids(vectors, ids)
+            return
+
+        self._untrained.append((vectors, ids))
+        if sum(len(v) for v, _ in self._untrained) >= training_sample_size(self.index, self.estimated_chunks):
+            self._train()
+
+    def _train(self, final=False):
+        # IVF/PQ indexes need a training sample before vectors can be added
+        sample = np.vstack([vectors for vectors, _ in self._untrained])
+        if final:
+            # the whole corpus fit in the training buffer, so size the index to
+            # the real chunk count rather than the estimate
+            self.index, self.info["description"] = build_index(sample.shape[1], len(sample), self.index_type, self.quantization)
+        self.index.train(sample)
+        for vectors, ids in self._untrained:
+            self.index.add_with_ids(vectors, ids)
+        self._untrained.clear()
+
+    def finish(self):
+        if self._untrained:
+            self._train(final=True)
+        recall = self.recall_tracker.recall(self.index) if self.index is not None else None
+        if recall is not None:
+            self.info["recall_at_10"] = recall
+        return self.index
+
+
+def ingest_repository(repo_url: str, project_name: str, incremental: bool = True,
+                      index_type: str = INDEX_TYPE, quantization: str = INDEX_QUANTIZATION,
+                      progress=None):
+    """Check out (or update) a repository and index its source files.
+
+    Ingestion is a streaming pipeline (walk -> read -> chunk -> embed -> index),
+    with reads and chunking spread over worker pools (see
+    :func:`_scan_changed_files`):
+    chunk records stream into the project's chunk store (see
+    :mod:`app.chunk_store`) as they are produced and
+    vectors are added to the index EMBED_BATCH_SIZE at a time, so peak memory
+    does not grow with the size of the repository.
+
+    With *incremental* set and a previous ingest of the same URL on disk, only
+    the new commits are fetched and only files whose content hash changed are
+    re-chunked and re-embedded; vectors of deleted or modified files are
+    removed from the ID-mapped FAISS index (an HNSW index can't delete them,
+    so it is rebuilt from its live vectors once more than
+    INDEX_MAX_STALE_FRACTION of them are stale). Chunk ids double as record slots
+    in the chunk store; new chunks are appended to it as a segment and removed
+    ones tombstoned, until too many are dead and the store is compacted and
+    the index, lexical postings and manifest renumbered with it. A BM25
+    index over the same ids is written next to the FAISS index (see
+    :mod:`app.lexical_index`), and the file dependency graph is rebuilt from
+    the whole checkout (see :mod:`app.dependency_analyzer`).
+
+    The repository is checked out as a worktree of a cached local mirror
+    (see :mod:`app.repositories`), sparse unless SPARSE_CHECKOUT is off.
+
+    *index_type* and *quantization* pick the FAISS index for full builds (see
+    :mod:`app.index_factory`); incremental runs keep the existing index.
+
+    Every ingest writes a new generation of the project's files and
+    publishes it atomically (see :mod:`app.generations`), so concurrent
+    queries keep reading the previous one until it is complete.
+
+    *progress*, if given, is called as ``progress(stage, **counters)`` at each
+    stage and after every embedded batch. It may raise
+    :class:`IngestionCancelled` to abort; nothing on disk changes in that case
+    except the checked-out repository.
+    """
+    def report(stage, **counters):
+        if progress is not None:
+            progress(stage, **counters)
+
+    report("fetching")
+    # Use Path for cross-platform compatibility
+    project_path = Path(BASE_REPO_PATH) / project_name
+
+    current = current_generation(project_name)
+    previous = _load_previous_state(current, repo_url) if incremental and current is not None else None
+    checkout_repository(repo_url, project_path, _sparse_patterns() if SPARSE_CHECKOUT else None)
+
+    if previous is None:
+        manifest = {"repo_url": repo_url, "commit": None, "next_id": 0, "files": {}}
+        candidates = list(_walk_source_files(project_path))
+        builder = _IndexBuilder(None, _estimate_chunk_count(project_path, candidates),
+                                index_type, quantization, RECALL_SAMPLE_QUERIES)
+    else:
+        index, previous_chunks, manifest = previous
+        changed = _changed_paths(project_path, manifest.get("commit"), _head_commit(project_path))
+        if changed is None:
+            # no usable history; fall back to comparing content hashes of every file
+            candidates = list(_walk_source_files(project_path))
+        else:
+            candidates = changed
+        builder = _IndexBuilder(index, 0, index_type, quantization)
+        builder.info = manifest.get("index")
+
+    mode = "full" if previous is None else "incremental"
+    files_total = len(candidates)
+    files_scanned = 0
+    chunks_total = builder.estimated_chunks or _estimate_chunk_count(project_path, candidates)
+    report("scanning", files_total=files_total, chunks_total=chunks_total)
+
+    files = manifest["files"]
+    live_chunks = sum(len(entry["chunk_ids"]) for entry in files.values())
+    stale_ids = []
+    pending_texts = []
+    pending_ids = []
+    files_changed = 0
+    chunks_embedded = 0
+    truncated = False
+
+    # everything is written to a new generation and published at the end
+    staging = begin_generation(project_name)
+    metadata = ChunkStoreWriter(staging.chunks_prefix, previous_chunks if previous is not None else None)
+    if previous is None:
+        lexical = LexicalIndexBuilder()
+    else:
+        lexical = _previous_lexical_index(current, previous_chunks)
+
+    def flush_pending():
+        # embed buffered chunks as one concurrent batch and add them to the index
+        nonlocal chunks_embedded
+        if pending_texts:
+            builder.add(embed_texts(pending_texts), np.array(pending_ids, dtype="int64"))
+            chunks_embedded += len(pending_texts)
+            pending_texts.clear()
+            pending_ids.clear()
+        report("embedding", files_total=files_total, files_scanned=files_scanned,
+               chunks_total=max(chunks_total, chunks_embedded), chunks_embedded=chunks_embedded)
+
+    def scan(rel_paths):
+        nonlocal files_scanned
+        for rel_path in rel_paths:
+            files_scanned += 1
+            yield rel_path
+
+    def drop_file(rel_path):
+        nonlocal live_chunks
+        entry = files.pop(rel_path, None)
+        if entry:
+            stale_ids.extend(entry["chunk_ids"])
+            live_chunks -= len(entry["chunk_ids"])
+
+    try:
+        # Files that disappeared (or stopped being indexable) since the last ingest
+        if previous is not None:
+            if changed is None:
+                present = set(candidates)
+                removed = [path for path in files if path not in present]
+            else:
+                removed = [path for path in candidates if path in files and not _is_indexable(project_path / path)]
+            for rel_path in removed:
+                drop_file(rel_path)
+
+        parallel = files_total >= SCAN_PARALLEL_MIN_FILES
+        for rel_path, content_hash, chunks in _scan_changed_files(project_path, scan(candidates), files, parallel):
+            if live_chunks >= MAX_TOTAL_CHUNKS:
+                print(f"Chunk limit ({MAX_TOTAL_CHUNKS}) reached. Stopping ingestion.")
+                truncated = True
+                break
+
+            previous_hash = files.get(rel_path, {}).get("hash")
+            drop_file(rel_path)
+            files_changed += 1
+
+            chunk_ids = []
+            for chunk, start_line, end_line in chunks:
+                if live_chunks + len(chunk_ids) >= MAX_TOTAL_CHUNKS:
+                    print(f"Chunk limit ({MAX_TOTAL_CHUNKS}) reached. Stopping ingestion.")
+                    truncated = True
+                    break
+
+                chunk_id = metadata.append(rel_path, chunk, start_line, end_line)
+                lexical.add(chunk_id, chunk_terms_text(rel_path, chunk))
+                pending_texts.append(chunk)
+                pending_ids.append(chunk_id)
+                chunk_ids.append(chunk_id)
+
+            # a partly indexed file keeps its old hash, so the next run redoes it
+            files[rel_path] = {"hash": previous_hash if truncated else content_hash, "chunk_ids": chunk_ids}
+            live_chunks += len(chunk_ids)
+
+            if len(pending_texts) >= EMBED_BATCH_SIZE:
+                flush_pending()
+            if truncated:
+                break
+
+        flush_pending()
+        report("indexing", files_total=files_total, files_scanned=files_scanned,
+               chunks_total=chunks_embedded, chunks_embedded=chunks_embedded)
+        index = builder.finish()
+    except BaseException:
+        metadata.abort()
+        discard_generation(staging)
+        raise
+
+    if index is None:
+        metadata.abort()
+        discard_generation(staging)
         return {"message": "No valid files found.", "chunk_count": 0}
 
-    # Convert to numpy array
-    embedding_matrix = np.vstack(embeddings).astype("float32")
+    if stale_ids:
+        remove_ids(index, stale_ids)
 
-    dimension = embedding_matrix.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embedding_matrix)
+    # HNSW keeps the vectors of removed chunks; once too many of its vectors
+    # are stale (or the chunk store is about to be compacted), copy the live
+    # ones into a fresh graph
+    compact = metadata.needs_compaction(stale_ids)
+    index_rebuilt = False
+    stale_vectors = index.ntotal - live_chunks
+    if (stale_vectors > INDEX_MAX_STALE_FRACTION * index.ntotal or (compact and stale_vectors)) \
+            and builder.info and builder.info.get("description"):
+        live_ids = sorted(chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"])
+        index = rebuild_index(index, live_ids, builder.info["description"])
+        index_rebuilt = True
 
-    # Save per-project index
-    indexes_dir = Path("data/indexes")
-    metadata_dir = Path("data/metadata")
-    indexes_dir.mkdir(parents=True, exist_ok=True)
-    metadata_dir.mkdir(parents=True, exist_ok=True)
+    # compacting renumbers the live chunks; every id holder follows suit
+    renumber = None
+    if compact and index.ntotal == live_chunks:
+        renumber = metadata.renumbering(stale_ids)
+        renumber_ids(index, renumber)
+        for entry in files.values():
+            entry["chunk_ids"] = renumber[entry["chunk_ids"]].tolist()
+
+    # after a truncated run, diff from the old commit next time so the files
+    # left out (or cut short) are picked up again
+    if not truncated:
+        manifest["commit"] = _head_commit(project_path)
+    manifest["next_id"] = live_chunks if renumber is not None else metadata.next_id
+    manifest["index"] = builder.info
+    manifest["chunker"] = _chunker_signature()
+    manifest["embedding"] = get_embedding_provider().signature()
+
+    try:
+        write_index(index, staging.index_path)
+        lexical.write(staging.lexical_path, metadata.next_id, stale_ids, renumber)
+        metadata.commit(stale_ids, compact=renumber is not None)
+
+        report("dependencies", files_total=files_total, files_scanned=files_scanned)
+        try:
+            graph_paths = candidates if previous is None else list(_walk_source_files(project_path))
+            graph = build_project_graph(project_name, project_path, graph_paths, staging.dependencies_path)
+            manifest["dependencies"] = {"files": len(graph), "edges": graph.edge_count}
+        except Exception as e:
+            # impact analysis is an add-on; don't fail the ingest over it
+            print(f"Error building dependency graph for '{project_name}': {e}")
 
-    index_path = indexes_dir / f"{project_name}.index"
-    chunks_path = metadata_dir / f"{project_name}.json"
+        manifest["generation"] = staging.name
+        with open(staging.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
 
-    faiss.write_index(index, str(index_path))
+        publish_generation(staging)
+    except BaseException:
+        discard_generation(staging)
+        raise
 
-    with open(chunks_path, "w", encoding="utf-8") as f:
-        json.dump(all_chunks, f)
+    # drop the resident copy now rather than waiting for the next query to notice
+    index_cache.invalidate(project_name)
 
     return {
         "message": "Ingested successfully",
-        "chunk_count": len(all_chunks)
-    }
\ No newline at end of file
+        "mode": mode,
+        "chunk_count": live_chunks,
+        "files_changed": files_changed,
+        "chunks_embedded": chunks_embedded,
+        "chunks_removed": len(stale_ids),
+        "index_rebuilt": index_rebuilt,
+        "chunk_store_compacted": renumber is not None,
+        "truncated": truncated,
+        "index": manifest.get("index"),
+        "dependencies": manifest.get("dependencies"),
+        "generation": staging.name
+    }
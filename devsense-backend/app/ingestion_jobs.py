@@ -0,0 +1,238 @@
+"""
+Background ingestion jobs.
+
+``POST /ingest`` holds the request open for the whole clone/embed/index run,
+which proxies time out on for large repositories. Jobs submitted here run on
+a bounded worker pool instead: the caller gets a job id back immediately and
+polls it for progress. Only one job per project is active at a time:
+submitting the same repository and options while one is queued or running
+returns the existing job, and anything else raises :class:`JobConflict`.
+The synchronous endpoint submits here too and waits on the job, so both
+paths share that per-project dedupe.
+"""
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.activity import log_activity
+from app.config import INGEST_WORKERS, INGEST_JOB_HISTORY, INDEX_TYPE, INDEX_QUANTIZATION
+from app.ingestion import ingest_repository, IngestionCancelled
+from app.repositories import normalize_source
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+CLONE_TIMEOUT_ERROR = "Repository clone timed out. The repository might be too large."
+
+
+class JobConflict(Exception):
+    """The project already has an active job for another repository or options."""
+
+    def __init__(self, job):
+        super().__init__(f"Project '{job.project_name}' is already being ingested by job {job.id}")
+        self.job = job
+
+
+class IngestionJob:
+    def __init__(self, repo_url, project_name, incremental=True,
+                 index_type=INDEX_TYPE, quantization=INDEX_QUANTIZATION):
+        self.id = uuid.uuid4().hex
+        self.repo_url = repo_url
+        self.project_name = project_name
+        self.incremental = incremental
+        self.index_type = index_type
+        self.quantization = quantization
+
+        self.status = QUEUED
+        self.stage = None
+        self.files_total = 0
+        self.files_scanned = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.result = None
+        self.error = None
+
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._embedding_started_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def matches(self, repo_url, incremental=True, index_type=INDEX_TYPE, quantization=INDEX_QUANTIZATION):
+        """Whether a request with these settings would run the same ingest."""
+        return (
+            normalize_source(repo_url) == normalize_source(self.repo_url)
+            and (incremental, index_type, quantization) == (self.incremental, self.index_type, self.quantization)
+        )
+
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def wait(self, timeout: float = None):
+        """Block until the job has finished; False if *timeout* passed first."""
+        return self._done.wait(timeout)
+
+    def _on_progress(self, stage, files_total=None, files_scanned=None, chunks_total=None, chunks_embedded=None):
+        if self._cancel.is_set():
+            raise IngestionCancelled()
+
+        self.stage = stage
+        if files_total is not None:
+            self.files_total = files_total
+        if files_scanned is not None:
+            self.files_scanned = files_scanned
+        if chunks_total is not None:
+            self.chunks_total = chunks_total
+        if chunks_embedded is not None:
+            self.chunks_embedded = chunks_embedded
+        if stage == "embedding" and self._embedding_started_at is None:
+            self._embedding_started_at = time.time()
+
+    def eta_seconds(self):
+        """Remaining embedding time extrapolated from the rate so far."""
+        if self.status != RUNNING or self._embedding_started_at is None or not self.chunks_embedded:
+            return None
+        elapsed = time.time() - self._embedding_started_at
+        remaining = max(self.chunks_total - self.chunks_embedded, 0)
+        return round(remaining * elapsed / self.chunks_embedded, 1)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "project_name": self.project_name,
+            "repo_url": self.repo_url,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": {
+                "files_total": self.files_total,
+                "files_scanned": self.files_scanned,
+                "chunks_total": self.chunks_total,
+                "chunks_embedded": self.chunks_embedded,
+                "eta_seconds": self.eta_seconds(),
+            },
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestionJobQueue:
+    def __init__(self, workers: int = INGEST_WORKERS, history: int = INGEST_JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+        self._active = {}  # project name -> queued or running job
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+
+    def submit(self, repo_url, project_name, **options):
+        """Queue an ingest. Returns ``(job, created)``; *created* is False when
+        the project already had an active job for the same repository and
+        options, which is returned instead. Raises :class:`JobConflict` if the
+        active job was submitted with a different repository or options."""
+        with self._lock:
+            job = self._active.get(project_name)
+            if job is not None:
+                if not job.matches(repo_url, **options):
+                    raise JobConflict(job)
+                return job, False
+
+            job = IngestionJob(repo_url, project_name, **options)
+            self._jobs[job.id] = job
+            self._active[project_name] = job
+            self._trim()
+
+        log_activity(project_name, "ingestion_queued", {"repo_url": repo_url, "job_id": job.id})
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, project_name=None):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if project_name is not None:
+            jobs = [job for job in jobs if job.project_name == project_name]
+        return jobs[::-1]
+
+    def cancel(self, job_id):
+        """Request cancellation. Queued jobs never start; running ones stop at
+        the next progress checkpoint (a clone in flight is not interrupted)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATES:
+                job._cancel.set()
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+        return job
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        log_activity(job.project_name, "ingestion_started", {"repo_url": job.repo_url, "job_id": job.id})
+        try:
+            result = ingest_repository(
+                job.repo_url,
+                job.project_name,
+                incremental=job.incremental,
+                index_type=job.index_type,
+                quantization=job.quantization,
+                progress=job._on_progress
+            )
+        except IngestionCancelled:
+            log_activity(job.project_name, "ingestion_cancelled", {"job_id": job.id})
+            with self._lock:
+                self._finish(job, CANCELLED)
+            return
+        except subprocess.TimeoutExpired:
+            job.error = CLONE_TIMEOUT_ERROR
+        except Exception as exc:
+            import traceback
+            print(f"Ingestion error: {traceback.format_exc()}")
+            job.error = str(exc)
+        else:
+            job.result = result
+            log_activity(job.project_name, "ingestion_completed", {**result, "job_id": job.id})
+            with self._lock:
+                self._finish(job, SUCCEEDED)
+            return
+
+        log_activity(job.project_name, "ingestion_failed", {"error": job.error, "job_id": job.id})
+        with self._lock:
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        # caller holds the lock
+        job.status = status
+        if status == SUCCEEDED:
+            job.stage = "done"
+        job.finished_at = time.time()
+        if self._active.get(job.project_name) is job:
+            del self._active[job.project_name]
+        job._done.set()
+
+    def _trim(self):
+        # forget the oldest finished jobs past the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+
+ingestion_jobs = IngestionJobQueue()
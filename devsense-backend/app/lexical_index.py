@@ -0,0 +1,277 @@
+"""
+BM25 inverted index over code identifiers.
+
+Questions about code often name an exact identifier (``calculate_impact_score``,
+``DEPENDENCY_PATH``) that embedding search ranks poorly. Each chunk is
+tokenized into its identifiers plus their camelCase/snake_case parts, and the
+postings are stored in one uncompressed ``.npz`` next to the FAISS index:
+
+- ``terms``        newline-joined UTF-8 vocabulary
+- ``term_offsets`` start of each term's postings (length = terms + 1)
+- ``doc_ids``      chunk ids, grouped by term
+- ``tfs``          term frequency per posting
+- ``doc_lens``     token count per chunk id (0 for removed chunks)
+
+Chunk ids are the FAISS/chunk-store ids, so lexical and vector results can be
+fused directly (see :func:`reciprocal_rank_fusion`).
+"""
+import os
+import re
+import struct
+import zipfile
+from collections import Counter
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_TOKEN_LENGTH = 2
+MAX_TF = np.iinfo(np.uint16).max
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+SUBWORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str):
+    """Lowercased identifiers and their sub-words, e.g. ``getUserName`` ->
+    ``getusername``, ``get``, ``user``, ``name``."""
+    tokens = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        if len(lowered) >= MIN_TOKEN_LENGTH:
+            tokens.append(lowered)
+        parts = SUBWORD_RE.findall(identifier)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts if len(part) >= MIN_TOKEN_LENGTH)
+    return tokens
+
+
+def lexical_index_path(index_path: str):
+    return os.path.splitext(str(index_path))[0] + ".lexical.npz"
+
+
+def _map_npz(path: str):
+    """Memory-map the arrays of an uncompressed ``.npz`` (as written by
+    ``np.savez``), or None if any member is compressed."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            # the member's data follows its local header, whose name and extra
+            # field lengths can differ from the central directory's
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if dtype.hasobject or int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+class LexicalIndex:
+    def __init__(self, terms, term_offsets, doc_ids, tfs, doc_lens):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+
+        live = doc_lens[doc_lens > 0]
+        self.n_docs = len(live)
+        self.avg_doc_len = float(live.mean()) if len(live) else 0.0
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False):
+        """Load the index; with *mmap* the posting arrays are mapped read-only
+        from the file rather than copied."""
+        data = _map_npz(path) if mmap else None
+        if data is None:
+            with np.load(path) as archive:
+                data = {name: archive[name] for name in archive.files}
+
+        blob = data["terms"].tobytes().decode("utf-8")
+        return cls(
+            blob.split("\n") if blob else [],
+            data["term_offsets"],
+            data["doc_ids"],
+            data["tfs"],
+            data["doc_lens"],
+        )
+
+    def nbytes(self):
+        return self.term_offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.doc_lens.nbytes
+
+    def postings(self, term: str):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def search(self, query: str, top_k: int):
+        """Return ``(chunk_ids, scores)`` of the best BM25 matches, best first."""
+        if not self.n_docs:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        ids, weights = [], []
+        for term in set(tokenize(query)):
+            found = self.postings(term)
+            if found is None:
+                continue
+            doc_ids, tfs = found
+            idf = np.log(1 + (self.n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            tf = tfs.astype("float32")
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[doc_ids] / self.avg_doc_len)
+            ids.append(doc_ids)
+            weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+
+        if not ids:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        scores = np.bincount(np.concatenate(ids), weights=np.concatenate(weights), minlength=len(self.doc_lens))
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order.astype("int64"), scores[order].astype("float32")
+
+
+class LexicalIndexBuilder:
+    """Accumulates postings while chunks stream in.
+
+    With *previous*, its postings are carried over (minus removed chunks) when
+    the index is written, so incremental ingests only tokenize new chunks.
+    """
+
+    def __init__(self, previous: LexicalIndex = None):
+        self._previous = previous
+        self._term_ids = {}
+        self._terms = []
+        self._triples = []  # (term id, doc id, tf) batches as arrays
+        self._pending = ([], [], [])
+        self._doc_lens = {}
+
+    def _term_id(self, term):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        return term_id
+
+    def add(self, chunk_id: int, text: str):
+        counts = Counter(tokenize(text))
+        term_ids, doc_ids, tfs = self._pending
+        for term, tf in counts.items():
+            term_ids.append(self._term_id(term))
+            doc_ids.append(chunk_id)
+            tfs.append(min(tf, MAX_TF))
+        self._doc_lens[chunk_id] = sum(counts.values())
+
+        if len(term_ids) >= 65536:
+            self._flush()
+
+    def _flush(self):
+        term_ids, doc_ids, tfs = self._pending
+        if term_ids:
+            self._triples.append((
+                np.array(term_ids, dtype="uint32"),
+                np.array(doc_ids, dtype="uint32"),
+                np.array(tfs, dtype="uint16"),
+            ))
+        self._pending = ([], [], [])
+
+    def _carry_over(self):
+        previous = self._previous
+        remap = np.array([self._term_id(term) for term in previous.terms], dtype="uint32")
+        term_ids = np.repeat(remap, np.diff(previous.term_offsets))
+        self._triples.append((term_ids, previous.doc_ids, previous.tfs))
+
+    def write(self, path: str, n_docs: int, removed_ids=(), renumber=None):
+        """Write the index for chunk ids ``0..n_docs-1``, dropping *removed_ids*.
+
+        *renumber* (old id -> new id, -1 for removed chunks) maps the ids of a
+        compacted chunk store.
+        """
+        self._flush()
+        removed = np.asarray(sorted(removed_ids), dtype="uint32")
+
+        doc_lens = np.zeros(n_docs, dtype="uint32")
+        if self._previous is not None:
+            carried = min(len(self._previous.doc_lens), n_docs)
+            doc_lens[:carried] = self._previous.doc_lens[:carried]
+            self._carry_over()
+        for chunk_id, length in self._doc_lens.items():
+            doc_lens[chunk_id] = length
+        doc_lens[removed[removed < n_docs]] = 0
+
+        if self._triples:
+            term_ids = np.concatenate([t for t, _, _ in self._triples])
+            doc_ids = np.concatenate([d for _, d, _ in self._triples])
+            tfs = np.concatenate([f for _, _, f in self._triples])
+        else:
+            term_ids = np.empty(0, dtype="uint32")
+            doc_ids = np.empty(0, dtype="uint32")
+            tfs = np.empty(0, dtype="uint16")
+
+        keep = ~np.isin(doc_ids, removed)
+        term_ids, doc_ids, tfs = term_ids[keep], doc_ids[keep], tfs[keep]
+        if renumber is not None:
+            doc_ids = renumber[doc_ids].astype("uint32")
+            doc_lens = doc_lens[renumber >= 0]
+
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        term_offsets = np.searchsorted(term_ids, np.arange(len(self._terms) + 1)).astype("int64")
+
+        os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+        tmp_path = str(path) + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.frombuffer("\n".join(self._terms).encode("utf-8"), dtype="uint8"),
+            term_offsets=term_offsets,
+            doc_ids=doc_ids,
+            tfs=tfs,
+            doc_lens=doc_lens,
+        )
+        os.replace(tmp_path, path)
+
+
+def chunk_terms_text(file_path: str, content: str):
+    # the path is indexed too, so "what does main.py do" finds main.py's chunks
+    return f"{file_path}\n{content}"
+
+
+def build_from_chunks(chunks):
+    """Builder pre-filled from an iterable of chunk dicts (None for removed ids)."""
+    builder = LexicalIndexBuilder()
+    for chunk_id, chunk in enumerate(chunks):
+        if chunk is not None:
+            builder.add(chunk_id, chunk_terms_text(chunk.get("file_path") or chunk.get("file", ""), chunk.get("content", "")))
+    return builder
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, with_scores: bool = False):
+    """Fuse ranked lists of chunk ids (or any hashable keys); returns ids
+    ordered by summed ``1 / (k + rank)``, as ``(id, score)`` pairs with
+    *with_scores*."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    fused = sorted(scores, key=lambda chunk_id: -scores[chunk_id])
+    if with_scores:
+        return [(chunk_id, scores[chunk_id]) for chunk_id in fused]
+    return fused
@@ -0,0 +1,4 @@
+class LLMErrorMessage(str):
+    """Text a provider returns in place of an answer (missing key, API error,
+    mock fallback). It is still a ``str``, so callers that show it to the
+    user are unaffected, but caches can tell it apart from a real answer."""
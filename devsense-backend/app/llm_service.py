@@ -8,16 +8,16 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
 
 # Import the appropriate service based on provider
 if LLM_PROVIDER == "gemini":
-    from app.llm_service_gemini import build_prompt, generate_response
+    from app.llm_service_gemini import build_prompt, generate_response, generate_response_async, stream_response_async
 elif LLM_PROVIDER == "anthropic":
-    from app.llm_service_anthropic import build_prompt, generate_response
+    from app.llm_service_anthropic import build_prompt, generate_response, generate_response_async, stream_response_async
 elif LLM_PROVIDER == "openai":
-    from app.llm_service_openai import build_prompt, generate_response
+    from app.llm_service_openai import build_prompt, generate_response, generate_response_async, stream_response_async
 elif LLM_PROVIDER == "bedrock":
-    from app.llm_service_bedrock import build_prompt, generate_response
+    from app.llm_service_bedrock import build_prompt, generate_response, generate_response_async, stream_response_async
 else:
     # Default to Gemini
-    from app.llm_service_gemini import build_prompt, generate_response
+    from app.llm_service_gemini import build_prompt, generate_response, generate_response_async, stream_response_async
 
 # Re-export for backward compatibility
-__all__ = ['build_prompt', 'generate_response']
\ No newline at end of file
+__all__ = ['build_prompt', 'generate_response', 'generate_response_async', 'stream_response_async']
\ No newline at end of file
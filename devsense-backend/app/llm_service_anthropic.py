@@ -4,13 +4,30 @@ LLM Service using direct Anthropic API (fallback when Bedrock not available)
 import os
 import json
 import requests
+import httpx
 from dotenv import load_dotenv
 from app.config import MAX_CONTEXT_CHARS
+from app.llm_errors import LLMErrorMessage
 
 load_dotenv()
 
 USE_ANTHROPIC_DIRECT = os.getenv("USE_ANTHROPIC_DIRECT", "false").lower() == "true"
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+ANTHROPIC_MODEL = "claude-3-5-sonnet-20241022"
+
+# shared pooled client for the async request path, created on first use
+_async_client = None
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+    return _async_client
 
 def build_prompt(query: str, retrieved_chunks: list):
     context_text = ""
@@ -43,45 +60,71 @@ Provide:
 """
 
 
+def _request_parts(prompt: str):
+    headers = {
+        "x-api-key": ANTHROPIC_API_KEY,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json"
+    }
+
+    data = {
+        "model": ANTHROPIC_MODEL,
+        "max_tokens": 2000,
+        "temperature": 0.2,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    }
+
+    return headers, data
+
+
+def _parse_response(response):
+    if response.status_code == 200:
+        result = response.json()
+        return result["content"][0]["text"]
+    else:
+        return LLMErrorMessage(f"Anthropic API error: {response.status_code} - {response.text}")
+
+
 def generate_response_anthropic(prompt: str):
     """Generate response using direct Anthropic API"""
     if not ANTHROPIC_API_KEY:
-        return "Anthropic API key not configured."
+        return LLMErrorMessage("Anthropic API key not configured.")
     
     try:
-        headers = {
-            "x-api-key": ANTHROPIC_API_KEY,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        
-        data = {
-            "model": "claude-3-5-sonnet-20241022",
-            "max_tokens": 2000,
-            "temperature": 0.2,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        }
+        headers, data = _request_parts(prompt)
         
         response = requests.post(
-            "https://api.anthropic.com/v1/messages",
+            ANTHROPIC_URL,
             headers=headers,
             json=data,
             timeout=30
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            return result["content"][0]["text"]
-        else:
-            return f"Anthropic API error: {response.status_code} - {response.text}"
+        return _parse_response(response)
             
     except Exception as e:
-        return f"Error calling Anthropic API: {str(e)}"
+        return LLMErrorMessage(f"Error calling Anthropic API: {str(e)}")
+
+
+async def generate_response_anthropic_async(prompt: str):
+    """Generate response using direct Anthropic API without blocking the event loop"""
+    if not ANTHROPIC_API_KEY:
+        return LLMErrorMessage("Anthropic API key not configured.")
+
+    try:
+        headers, data = _request_parts(prompt)
+
+        response = await _get_async_client().post(ANTHROPIC_URL, headers=headers, json=data)
+
+        return _parse_response(response)
+
+    except Exception as e:
+        return LLMErrorMessage(f"Error calling Anthropic API: {str(e)}")
 
 
 def generate_response(prompt: str):
@@ -90,4 +133,41 @@ def generate_response(prompt: str):
         return generate_response_anthropic(prompt)
     
     # Fallback to mock
-    return "AI response unavailable. Please configure Anthropic API key or wait for Bedrock approval."
+    return LLMErrorMessage("AI response unavailable. Please configure Anthropic API key or wait for Bedrock approval.")
+
+
+async def generate_response_async(prompt: str):
+    if USE_ANTHROPIC_DIRECT and ANTHROPIC_API_KEY:
+        return await generate_response_anthropic_async(prompt)
+
+    # Fallback to mock
+    return LLMErrorMessage("AI response unavailable. Please configure Anthropic API key or wait for Bedrock approval.")
+
+
+async def stream_response_async(prompt: str):
+    """Yield answer text as Anthropic streams it (server-sent events)"""
+    if not (USE_ANTHROPIC_DIRECT and ANTHROPIC_API_KEY):
+        yield await generate_response_async(prompt)
+        return
+
+    try:
+        headers, data = _request_parts(prompt)
+        data["stream"] = True
+
+        async with _get_async_client().stream("POST", ANTHROPIC_URL, headers=headers, json=data) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                yield LLMErrorMessage(f"Anthropic API error: {response.status_code} - {body.decode(errors='ignore')}")
+                return
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "content_block_delta":
+                    text = event.get("delta", {}).get("text")
+                    if text:
+                        yield text
+
+    except Exception as e:
+        yield LLMErrorMessage(f"Error calling Anthropic API: {str(e)}")
@@ -1,18 +1,33 @@
 import os
 import json
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
-from app.config import MAX_CONTEXT_CHARS
+from app.config import MAX_CONTEXT_CHARS, BEDROCK_LLM_CONCURRENCY
+from app.llm_errors import LLMErrorMessage
 
 load_dotenv()
 
 AWS_BEARER_TOKEN_BEDROCK = os.getenv("AWS_BEARER_TOKEN_BEDROCK", "")
 LLM_MODEL_ID = "anthropic.claude-sonnet-4-20250514-v1:0"
 
+# boto3 has no native async client; the async path runs invoke_model on a
+# dedicated pool with one pooled connection per thread, so slow model calls
+# neither queue behind each other nor occupy the loop's default executor
 bedrock_client = boto3.client(
     "bedrock-runtime",
-    region_name="us-east-1"
+    region_name="us-east-1",
+    config=Config(max_pool_connections=BEDROCK_LLM_CONCURRENCY)
 )
+_executor = ThreadPoolExecutor(max_workers=BEDROCK_LLM_CONCURRENCY, thread_name_prefix="bedrock-llm")
+
+
+async def _run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
 
 
 def build_prompt(query: str, retrieved_chunks: list):
@@ -46,21 +61,59 @@ Provide:
 """
 
 
+def _request_body(prompt: str):
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-06-01",
+        "max_tokens": 2000,
+        "temperature": 0.2,
+        "messages": [{"role": "user", "content": prompt}]
+    })
+
+
 def generate_response(prompt: str):
     if not AWS_BEARER_TOKEN_BEDROCK:
-        return "Error: AWS_BEARER_TOKEN_BEDROCK not configured"
+        return LLMErrorMessage("Error: AWS_BEARER_TOKEN_BEDROCK not configured")
     
     try:
         response = bedrock_client.invoke_model(
             modelId=LLM_MODEL_ID,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-06-01",
-                "max_tokens": 2000,
-                "temperature": 0.2,
-                "messages": [{"role": "user", "content": prompt}]
-            })
+            body=_request_body(prompt)
         )
         result = json.loads(response["body"].read())
         return result["content"][0]["text"]
     except Exception as e:
-        return f"Error calling Bedrock Claude: {str(e)}"
+        return LLMErrorMessage(f"Error calling Bedrock Claude: {str(e)}")
+
+
+async def generate_response_async(prompt: str):
+    return await _run(generate_response, prompt)
+
+
+async def stream_response_async(prompt: str):
+    """Yield answer text from invoke_model_with_response_stream.
+
+    The boto3 event stream is blocking, so each event is pulled on the Bedrock pool.
+    """
+    if not AWS_BEARER_TOKEN_BEDROCK:
+        yield LLMErrorMessage("Error: AWS_BEARER_TOKEN_BEDROCK not configured")
+        return
+
+    try:
+        response = await _run(
+            bedrock_client.invoke_model_with_response_stream,
+            modelId=LLM_MODEL_ID,
+            body=_request_body(prompt)
+        )
+        events = iter(response["body"])
+
+        while True:
+            event = await _run(next, events, None)
+            if event is None:
+                break
+            payload = json.loads(event["chunk"]["bytes"]) if "chunk" in event else {}
+            if payload.get("type") == "content_block_delta":
+                text = payload.get("delta", {}).get("text")
+                if text:
+                    yield text
+    except Exception as e:
+        yield LLMErrorMessage(f"Error calling Bedrock Claude: {str(e)}")
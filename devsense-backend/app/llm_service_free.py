@@ -4,8 +4,10 @@ No AWS costs, works globally, free tier: 32,000 requests/month
 """
 import os
 import requests
+import httpx
 from dotenv import load_dotenv
 from app.config import MAX_CONTEXT_CHARS
+from app.llm_errors import LLMErrorMessage
 
 load_dotenv()
 
@@ -15,6 +17,19 @@ HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-I
 
 USE_HF = os.getenv("USE_HF", "false").lower() == "true"
 
+# shared pooled client for the async request path, created on first use
+_async_client = None
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+    return _async_client
+
 
 def build_prompt(query: str, retrieved_chunks: list):
     context_text = ""
@@ -47,45 +62,78 @@ Provide:
 """
 
 
+def _request_parts(prompt: str):
+    headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+    payload = {
+        "inputs": prompt,
+        "parameters": {
+            "max_length": 2000,
+            "temperature": 0.2,
+        }
+    }
+    return headers, payload
+
+
+def _parse_response(response):
+    if response.status_code == 200:
+        result = response.json()
+
+        # Handle different response formats
+        if isinstance(result, list) and len(result) > 0:
+            if "generated_text" in result[0]:
+                return result[0]["generated_text"]
+
+        return str(result)
+
+    elif response.status_code == 429:
+        return LLMErrorMessage("⚠️ Rate limited. Hugging Face free tier: 32,000 requests/month. Upgrade at https://huggingface.co")
+
+    else:
+        error_msg = response.json().get("error", response.text)
+        return LLMErrorMessage(f"⚠️ Hugging Face API Error: {error_msg}")
+
+
 def generate_response(prompt: str):
     """Generate response using FREE Hugging Face API"""
     
     if not USE_HF:
-        return "Mock response (Hugging Face disabled). Set USE_HF=true"
+        return LLMErrorMessage("Mock response (Hugging Face disabled). Set USE_HF=true")
     
     if not HF_API_TOKEN:
-        return "⚠️ ERROR: HF_API_TOKEN not set. Get free token from https://huggingface.co/settings/tokens"
+        return LLMErrorMessage("⚠️ ERROR: HF_API_TOKEN not set. Get free token from https://huggingface.co/settings/tokens")
     
     try:
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_length": 2000,
-                "temperature": 0.2,
-            }
-        }
+        headers, payload = _request_parts(prompt)
         
         response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # Handle different response formats
-            if isinstance(result, list) and len(result) > 0:
-                if "generated_text" in result[0]:
-                    return result[0]["generated_text"]
-            
-            return str(result)
-        
-        elif response.status_code == 429:
-            return "⚠️ Rate limited. Hugging Face free tier: 32,000 requests/month. Upgrade at https://huggingface.co"
-        
-        else:
-            error_msg = response.json().get("error", response.text)
-            return f"⚠️ Hugging Face API Error: {error_msg}"
+        return _parse_response(response)
     
     except requests.exceptions.Timeout:
-        return "⚠️ Request timeout. Hugging Face API might be slow. Try again."
+        return LLMErrorMessage("⚠️ Request timeout. Hugging Face API might be slow. Try again.")
+    except Exception as e:
+        return LLMErrorMessage(f"⚠️ Error: {str(e)}")
+
+
+async def generate_response_async(prompt: str):
+    """Generate response using FREE Hugging Face API without blocking the event loop"""
+
+    if not USE_HF:
+        return LLMErrorMessage("Mock response (Hugging Face disabled). Set USE_HF=true")
+
+    if not HF_API_TOKEN:
+        return LLMErrorMessage("⚠️ ERROR: HF_API_TOKEN not set. Get free token from https://huggingface.co/settings/tokens")
+
+    try:
+        headers, payload = _request_parts(prompt)
+        response = await _get_async_client().post(HF_API_URL, headers=headers, json=payload)
+        return _parse_response(response)
+
+    except httpx.TimeoutException:
+        return LLMErrorMessage("⚠️ Request timeout. Hugging Face API might be slow. Try again.")
     except Exception as e:
-        return f"⚠️ Error: {str(e)}"
+        return LLMErrorMessage(f"⚠️ Error: {str(e)}")
+
+
+async def stream_response_async(prompt: str):
+    # the Inference API endpoint used here returns the whole completion at once
+    yield await generate_response_async(prompt)
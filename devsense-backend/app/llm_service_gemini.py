@@ -2,6 +2,7 @@ import os
 import google.generativeai as genai
 from dotenv import load_dotenv
 from app.config import MAX_CONTEXT_CHARS
+from app.llm_errors import LLMErrorMessage
 
 load_dotenv()
 
@@ -44,18 +45,54 @@ Provide:
 """
 
 
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 2000,
+}
+
+
 def generate_response(prompt: str):
     if not GEMINI_API_KEY:
-        return "Error: GEMINI_API_KEY not configured in .env file"
+        return LLMErrorMessage("Error: GEMINI_API_KEY not configured in .env file")
     
     try:
         response = model.generate_content(
             prompt,
-            generation_config={
-                "temperature": 0.2,
-                "max_output_tokens": 2000,
-            }
+            generation_config=GENERATION_CONFIG
         )
         return response.text
     except Exception as e:
-        return f"Error calling Gemini: {str(e)}"
+        return LLMErrorMessage(f"Error calling Gemini: {str(e)}")
+
+
+async def generate_response_async(prompt: str):
+    if not GEMINI_API_KEY:
+        return LLMErrorMessage("Error: GEMINI_API_KEY not configured in .env file")
+
+    try:
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=GENERATION_CONFIG
+        )
+        return response.text
+    except Exception as e:
+        return LLMErrorMessage(f"Error calling Gemini: {str(e)}")
+
+
+async def stream_response_async(prompt: str):
+    """Yield answer text as Gemini streams it"""
+    if not GEMINI_API_KEY:
+        yield LLMErrorMessage("Error: GEMINI_API_KEY not configured in .env file")
+        return
+
+    try:
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=GENERATION_CONFIG,
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    except Exception as e:
+        yield LLMErrorMessage(f"Error calling Gemini: {str(e)}")
@@ -5,11 +5,17 @@ import os
 import json
 from dotenv import load_dotenv
 from app.config import MAX_CONTEXT_CHARS
+from app.llm_errors import LLMErrorMessage
 
 load_dotenv()
 
 USE_OPENAI = os.getenv("USE_OPENAI", "false").lower() == "true"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_MODEL = "gpt-4o-mini"  # Fast and cheap, or use "gpt-4o" for better quality
+SYSTEM_MESSAGE = "You are DevSense, an AI developer assistant. Provide clear, technical explanations based on the code context provided."
+
+# shared async client (keeps its HTTP connection pool), created on first use
+_async_client = None
 
 def build_prompt(query: str, retrieved_chunks: list):
     context_text = ""
@@ -35,35 +41,39 @@ Provide a clear, technical explanation. Reference specific code when relevant. I
 Answer:"""
 
 
+def _messages(prompt: str):
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_MESSAGE
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
 def generate_response(prompt: str):
     """Generate response using OpenAI API"""
     if not USE_OPENAI:
-        return "OpenAI not enabled. Set USE_OPENAI=true in .env"
+        return LLMErrorMessage("OpenAI not enabled. Set USE_OPENAI=true in .env")
     
     if not OPENAI_API_KEY:
-        return "OpenAI API key not configured. Add OPENAI_API_KEY to .env"
+        return LLMErrorMessage("OpenAI API key not configured. Add OPENAI_API_KEY to .env")
     
     try:
         # Try to import openai
         try:
             from openai import OpenAI
         except ImportError:
-            return "OpenAI library not installed. Run: pip install openai"
+            return LLMErrorMessage("OpenAI library not installed. Run: pip install openai")
         
         client = OpenAI(api_key=OPENAI_API_KEY)
         
         response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Fast and cheap, or use "gpt-4o" for better quality
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are DevSense, an AI developer assistant. Provide clear, technical explanations based on the code context provided."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            model=OPENAI_MODEL,
+            messages=_messages(prompt),
             max_tokens=2000,
             temperature=0.2
         )
@@ -71,4 +81,71 @@ def generate_response(prompt: str):
         return response.choices[0].message.content
         
     except Exception as e:
-        return f"OpenAI API error: {str(e)}"
+        return LLMErrorMessage(f"OpenAI API error: {str(e)}")
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _async_client
+
+
+def _unavailable_reason():
+    if not USE_OPENAI:
+        return LLMErrorMessage("OpenAI not enabled. Set USE_OPENAI=true in .env")
+
+    if not OPENAI_API_KEY:
+        return LLMErrorMessage("OpenAI API key not configured. Add OPENAI_API_KEY to .env")
+
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        return LLMErrorMessage("OpenAI library not installed. Run: pip install openai")
+
+    return None
+
+
+async def generate_response_async(prompt: str):
+    """Generate response using OpenAI's async client"""
+    reason = _unavailable_reason()
+    if reason:
+        return reason
+
+    try:
+        response = await _get_async_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_messages(prompt),
+            max_tokens=2000,
+            temperature=0.2
+        )
+
+        return response.choices[0].message.content
+
+    except Exception as e:
+        return LLMErrorMessage(f"OpenAI API error: {str(e)}")
+
+
+async def stream_response_async(prompt: str):
+    """Yield answer text as OpenAI streams it"""
+    reason = _unavailable_reason()
+    if reason:
+        yield reason
+        return
+
+    try:
+        stream = await _get_async_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_messages(prompt),
+            max_tokens=2000,
+            temperature=0.2,
+            stream=True
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        yield LLMErrorMessage(f"OpenAI API error: {str(e)}")
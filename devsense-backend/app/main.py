@@ -1,13 +1,22 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import subprocess
-from app.ingestion import ingest_repository
-from app.query_engine import query_codebase
-from app.llm_service import build_prompt, generate_response
-from app.cache import get_cached, set_cache
-from app.dependency_analyzer import load_dependency_map, calculate_impact_score
+from typing import List, Optional
+import json
+from itertools import islice
+from app.activity import log_activity
+from app.ingestion_jobs import ingestion_jobs, JobConflict, SUCCEEDED, CANCELLED, CLONE_TIMEOUT_ERROR
+from app.query_engine import query_codebase_async, stream_query_codebase, search_projects, query_projects_async
+from app.llm_service import generate_response_async
+from app.cache import answer_cache
+from app.chat_memory import session_store
+from app.dependency_analyzer import dependency_graph_cache, analyze_impact
 from app.vector_store import VectorStore
+from app.index_cache import index_cache
+from app.repositories import list_files
+from app.config import INDEX_PRELOAD_PROJECTS, INDEX_TYPE, INDEX_QUANTIZATION, FEDERATED_MAX_PROJECTS
 
 app = FastAPI(title="DevSense AI Backend")
 
@@ -30,16 +39,33 @@ app.add_middleware(
 class RepoRequest(BaseModel):
     repo_url: str
     project_name: str
+    incremental: bool = True
+    index_type: str = INDEX_TYPE  # auto, flat, hnsw, ivf_flat, ivf_pq
+    quantization: str = INDEX_QUANTIZATION  # none, fp16, int8
 
 
 class QueryRequest(BaseModel):
     project_name: str
     session_id: str
     query: str
+    nprobe: Optional[int] = None  # IVF lists to scan (IVF indexes only)
+    ef_search: Optional[int] = None  # HNSW search breadth (HNSW indexes only)
+
+
+class FederatedQueryRequest(BaseModel):
+    project_names: List[str]
+    session_id: Optional[str] = None  # only needed by /query/federated
+    query: str
+    top_k: int = 10
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
 
 
 class ImpactRequest(BaseModel):
-    file_path: str
+    project_name: str = "default"
+    file_path: Optional[str] = None
+    file_paths: List[str] = []  # analyze several files at once, e.g. all files in a PR
+    max_depth: Optional[int] = None  # dependents up to this many imports away, None for all
 
 
 class FeedbackRequest(BaseModel):
@@ -49,71 +75,201 @@ class FeedbackRequest(BaseModel):
     category: str
 
 
+@app.on_event("startup")
+def preload_indexes():
+    if INDEX_PRELOAD_PROJECTS:
+        index_cache.preload(INDEX_PRELOAD_PROJECTS)
+
+
 @app.get("/")
 def health_check():
     return {"status": "DevSense backend running"}
 
 
+def _submit_ingest(request: RepoRequest):
+    try:
+        return ingestion_jobs.submit(
+            request.repo_url,
+            request.project_name,
+            incremental=request.incremental,
+            index_type=request.index_type,
+            quantization=request.quantization
+        )
+    except JobConflict as exc:
+        raise HTTPException(status_code=409, detail={"message": str(exc), "job_id": exc.job.id})
+
+
 @app.post("/ingest")
 def ingest_repo(request: RepoRequest):
-    try:
-        log_activity(request.project_name, "ingestion_started", {"repo_url": request.repo_url})
-        result = ingest_repository(request.repo_url, request.project_name)
-        log_activity(request.project_name, "ingestion_completed", result)
-        return {"message": "Repository ingested successfully", **result}
-    except subprocess.TimeoutExpired:
-        log_activity(request.project_name, "ingestion_failed", {"error": "timeout"})
-        raise HTTPException(status_code=504, detail="Repository clone timed out. The repository might be too large.")
-    except Exception as exc:
-        # Log the full error for debugging
-        import traceback
-        print(f"Ingestion error: {traceback.format_exc()}")
-        log_activity(request.project_name, "ingestion_failed", {"error": str(exc)})
-        # Give user helpful feedback
-        error_msg = str(exc)
-        if "git" in error_msg.lower():
-            error_msg = f"Git error: {error_msg}. Make sure the repository URL is correct and accessible."
-        raise HTTPException(status_code=500, detail=error_msg)
+    """Ingest and wait for the result. Runs as a job on the ingestion queue, so
+    a request for a project that is already being ingested with the same
+    repository and options waits on that job."""
+    job, _ = _submit_ingest(request)
+    job.wait()
+
+    if job.status == SUCCEEDED:
+        return {"message": "Repository ingested successfully", **job.result}
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail="Ingestion was cancelled.")
+    if job.error == CLONE_TIMEOUT_ERROR:
+        raise HTTPException(status_code=504, detail=job.error)
+
+    # Give user helpful feedback
+    error_msg = job.error or "Ingestion failed."
+    if "git" in error_msg.lower():
+        error_msg = f"Git error: {error_msg}. Make sure the repository URL is correct and accessible."
+    raise HTTPException(status_code=500, detail=error_msg)
+
+
+@app.post("/ingest/jobs", status_code=202)
+def submit_ingest_job(request: RepoRequest):
+    """Queue an ingest and return its job id without waiting for it"""
+    job, created = _submit_ingest(request)
+    return {**job.to_dict(), "created": created}
+
+
+@app.get("/ingest/jobs")
+def list_ingest_jobs(project_name: Optional[str] = None):
+    return {"jobs": [job.to_dict() for job in ingestion_jobs.list(project_name)]}
+
+
+@app.get("/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found.")
+    return job.to_dict()
+
+
+@app.delete("/ingest/jobs/{job_id}")
+def cancel_ingest_job(job_id: str):
+    job = ingestion_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found.")
+    return job.to_dict()
 
 
 @app.post("/query")
-def query_endpoint(request: QueryRequest):
-    log_activity(request.project_name, "query_submitted", {"query": request.query[:100]})
-    response = query_codebase(
+async def query_endpoint(request: QueryRequest):
+    await run_in_threadpool(log_activity, request.project_name, "query_submitted", {"query": request.query[:100]})
+    response = await query_codebase_async(
         project_name=request.project_name,
         session_id=request.session_id,
-        query=request.query
+        query=request.query,
+        nprobe=request.nprobe,
+        ef_search=request.ef_search
     )
-    log_activity(request.project_name, "query_completed", {"query": request.query[:100]})
+    await run_in_threadpool(log_activity, request.project_name, "query_completed", {"query": request.query[:100]})
     return {"response": response}
 
 
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """Stream the answer as Server-Sent Events: sources, then tokens, then done"""
+    await run_in_threadpool(
+        log_activity, request.project_name, "query_submitted", {"query": request.query[:100], "stream": True}
+    )
+
+    async def event_stream():
+        async for event, data in stream_query_codebase(
+            project_name=request.project_name,
+            session_id=request.session_id,
+            query=request.query,
+            nprobe=request.nprobe,
+            ef_search=request.ef_search
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event == "done":
+                await run_in_threadpool(
+                    log_activity, request.project_name, "query_completed", {"query": request.query[:100], "stream": True}
+                )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _check_federated(request: FederatedQueryRequest):
+    if not request.project_names:
+        raise HTTPException(status_code=400, detail="project_names is required")
+    if len(set(request.project_names)) > FEDERATED_MAX_PROJECTS:
+        raise HTTPException(status_code=400, detail=f"At most {FEDERATED_MAX_PROJECTS} projects per query")
+
+
+@app.post("/search/federated")
+async def federated_search_endpoint(request: FederatedQueryRequest):
+    """Top chunks across several projects, tagged with their project, without an LLM answer"""
+    _check_federated(request)
+    chunks, missing = await run_in_threadpool(
+        search_projects, request.project_names, request.query, request.top_k, request.nprobe, request.ef_search
+    )
+    return {
+        "results": [
+            {
+                "project": chunk["project"],
+                "score": chunk["score"],
+                "id": chunk["id"],
+                "file_path": chunk["file_path"],
+                "start_line": chunk["start_line"],
+                "end_line": chunk["end_line"],
+                "content": chunk["content"]
+            }
+            for chunk in chunks
+        ],
+        "missing_projects": missing
+    }
+
+
+@app.post("/query/federated")
+async def federated_query_endpoint(request: FederatedQueryRequest):
+    """Answer a question from several projects at once"""
+    _check_federated(request)
+    for project_name in dict.fromkeys(request.project_names):
+        await run_in_threadpool(
+            log_activity, project_name, "query_submitted", {"query": request.query[:100], "federated": True}
+        )
+    response, sources, missing = await query_projects_async(
+        request.project_names, request.session_id, request.query, request.top_k, request.nprobe, request.ef_search
+    )
+    return {"response": response, "sources": sources, "missing_projects": missing}
+
 
 @app.post("/impact-analysis")
 def impact_analysis(request: ImpactRequest):
-    graph = load_dependency_map()
-    direct, indirect, score, risk = calculate_impact_score(
-        request.file_path, graph
-    )
+    file_paths = ([request.file_path] if request.file_path else []) + request.file_paths
+    if not file_paths:
+        raise HTTPException(status_code=400, detail="file_path or file_paths is required")
+
+    graph = dependency_graph_cache.get(request.project_name)
+    if graph is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No dependency graph for project '{request.project_name}'. Ingest it first."
+        )
+    impact = analyze_impact(graph, file_paths, request.max_depth)
 
     return {
-        "target_file": request.file_path,
-        "direct_dependencies": direct,
-        "indirect_dependencies": indirect,
-        "impact_score": score,
-        "risk_level": risk
+        "project_name": request.project_name,
+        "target_file": request.file_path or file_paths[0],
+        "direct_dependencies": impact["direct_dependents"],
+        "indirect_dependencies": impact["indirect_dependents"],
+        **impact
     }
 
 
 @app.get("/generate-architecture")
-def generate_architecture(project_name: str = "default"):
+async def generate_architecture(project_name: str = "default"):
     vector_store = VectorStore(project_name)
-    vector_store.load()
+    # a cold load reads the index from disk, keep it off the event loop
+    await run_in_threadpool(vector_store.load)
 
     if vector_store.index.ntotal == 0:
         return {"message": f"No project indexed for '{project_name}'."}
 
-    sample_chunks = vector_store.metadata[:10]
+    sample_chunks = list(islice((chunk for chunk in vector_store.metadata if chunk is not None), 10))
 
     prompt = f"""
 Generate a high-level architecture overview of this project ({project_name}):
@@ -121,7 +277,7 @@ Generate a high-level architecture overview of this project ({project_name}):
 {sample_chunks}
 """
 
-    response = generate_response(prompt)
+    response = await generate_response_async(prompt)
 
     return {"architecture_overview": response}
 
@@ -188,7 +344,11 @@ def get_dependencies(project_name: str = "default"):
 
 @app.get("/file-tree")
 def get_file_tree(project_name: str = "default"):
-    """Get the file tree structure of the ingested project"""
+    """Get the file tree structure of the ingested project.
+
+    Files are listed from the checked-out commit, not the working directory,
+    which is a sparse checkout holding only the files ingestion reads.
+    """
     from pathlib import Path
     import os
     
@@ -196,46 +356,47 @@ def get_file_tree(project_name: str = "default"):
     
     if not repo_path.exists():
         return {"tree": [], "message": f"Project '{project_name}' not found. Please ingest a project first."}
-    
-    def build_tree(path, depth=0, max_depth=3):
+
+    paths = list_files(repo_path)
+    if paths is None:
+        # not a git checkout: list what is on disk
+        paths = [
+            os.path.relpath(os.path.join(root, name), repo_path).replace(os.sep, "/")
+            for root, _, names in os.walk(repo_path) for name in names
+        ]
+
+    # Skip hidden folders and common ignore patterns
+    ignore_patterns = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'dist', 'build', '.next'}
+    root = {}
+    for path in paths:
+        parts = path.split("/")
+        if any((part.startswith('.') and part != '.gitignore') or part in ignore_patterns for part in parts):
+            continue
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part + "/", {})
+        node[parts[-1]] = None
+
+    def build_tree(node, prefix="", depth=0, max_depth=3):
         if depth > max_depth:
             return []
-        
+
         items = []
-        try:
-            # Skip hidden folders and common ignore patterns
-            ignore_patterns = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'dist', 'build', '.next'}
-            
-            for item in sorted(path.iterdir()):
-                if item.name.startswith('.') and item.name != '.gitignore':
-                    continue
-                if item.name in ignore_patterns:
-                    continue
-                    
-                if item.is_dir():
-                    items.append({
-                        "name": item.name + "/",
-                        "type": "folder",
-                        "depth": depth,
-                        "path": str(item.relative_to(repo_path))
-                    })
-                    # Recursively add children
-                    items.extend(build_tree(item, depth + 1, max_depth))
-                else:
-                    items.append({
-                        "name": item.name,
-                        "type": "file",
-                        "depth": depth,
-                        "path": str(item.relative_to(repo_path))
-                    })
-        except PermissionError:
-            pass
-        except Exception as e:
-            print(f"Error building tree: {e}")
-        
+        for name in sorted(node, key=lambda name: name.rstrip("/")):
+            children = node[name]
+            path = prefix + name.rstrip("/")
+            items.append({
+                "name": name,
+                "type": "folder" if children is not None else "file",
+                "depth": depth,
+                "path": str(Path(path))
+            })
+            if children is not None:
+                # Recursively add children
+                items.extend(build_tree(children, path + "/", depth + 1, max_depth))
         return items
-    
-    tree = build_tree(repo_path)
+
+    tree = build_tree(root)
     return {"tree": tree}
 
 
@@ -268,10 +429,12 @@ def submit_feedback(request: FeedbackRequest):
 @app.get("/settings")
 def get_settings():
     """Get current backend settings"""
-    from app.config import USE_BEDROCK, MAX_CHUNKS, MAX_FILE_SIZE_KB
+    from app.config import USE_BEDROCK, MAX_CHUNKS, MAX_FILE_SIZE_KB, EMBED_PROVIDER, EMBED_DIM
     
     return {
         "use_bedrock": USE_BEDROCK,
+        "embed_provider": EMBED_PROVIDER,
+        "embed_dim": EMBED_DIM,
         "max_chunks": MAX_CHUNKS,
         "max_file_size_kb": MAX_FILE_SIZE_KB,
         "backend_version": "1.0.0",
@@ -279,6 +442,22 @@ def get_settings():
     }
 
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Get hit/miss statistics for the backend caches"""
+    from app.embedding_cache import get_embedding_cache
+
+    embedding_cache = get_embedding_cache()
+
+    return {
+        "embeddings": embedding_cache.stats() if embedding_cache else {"enabled": False},
+        "indexes": index_cache.stats(),
+        "answers": answer_cache.stats() if answer_cache else {"enabled": False},
+        "sessions": session_store.stats(),
+        "dependency_graphs": dependency_graph_cache.stats()
+    }
+
+
 @app.get("/logs")
 def get_logs(project_name: str = "default", limit: int = 100):
     """Get recent activity logs"""
@@ -309,26 +488,3 @@ def get_logs(project_name: str = "default", limit: int = 100):
     
     return {"logs": logs, "total": len(logs)}
 
-
-def log_activity(project_name: str, action: str, details: dict = None):
-    """Helper function to log activities"""
-    import json
-    from pathlib import Path
-    from datetime import datetime
-    
-    logs_dir = Path("data/logs")
-    logs_dir.mkdir(exist_ok=True)
-    
-    log_file = logs_dir / f"{project_name}_logs.jsonl"
-    
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "action": action,
-        "details": details or {}
-    }
-    
-    try:
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception as e:
-        print(f"Error writing log: {e}")
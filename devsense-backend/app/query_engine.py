@@ -1,39 +1,55 @@
-import os
-import json
+import asyncio
+import functools
 import faiss
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from app.embeddings import generate_embedding, SEARCH_QUERY
+from app.index_cache import index_cache
+from app.index_factory import search
+from app.llm_service import generate_response, generate_response_async, stream_response_async
+from app.llm_errors import LLMErrorMessage
+from app.cache import answer_cache
+from app.chat_memory import session_store
+from app.lexical_index import reciprocal_rank_fusion
+from app.config import HYBRID_SEARCH_ENABLED, HYBRID_CANDIDATES, RRF_K, FEDERATED_SEARCH_WORKERS, QUERY_WORKERS
 
-from app.embeddings import generate_embedding, EMBED_DIM
-from app.vector_store import _make_paths
-from app.llm_service import generate_response
-
-MAX_HISTORY = 10
 MAX_CONTEXT_CHARS = 15000
+# extra vector hits fetched to make up for stale ones, at most this multiple of the request
+STALE_OVERFETCH_FACTOR = 2
 
-chat_sessions = {}
-
-def get_index_path(project_name: str):
-    idx_path, _ = _make_paths(project_name)
-    return idx_path
+# per-project searches of a federated query; FAISS releases the GIL while searching
+_federated_executor = ThreadPoolExecutor(max_workers=FEDERATED_SEARCH_WORKERS, thread_name_prefix="federated-search")
+# retrieval and session I/O of the async paths; kept apart from the loop's
+# default executor and from LLM calls so slow answers can't starve retrieval
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
 
 
-def get_chunks_path(project_name: str):
-    _, meta_path = _make_paths(project_name)
-    return meta_path
+async def _in_worker(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_query_executor, functools.partial(fn, *args))
 
 
 def embed_text(text: str):
-    # reuse the embedding logic from embeddings module; this handles
-    # USE_BEDROCK flag internally, producing mock vectors when disabled.
-    emb = generate_embedding(text)
+    # embedded by the configured provider (see app.embeddings)
+    emb = generate_embedding(text, SEARCH_QUERY)
     return emb.astype("float32")
 
 
-def ask_claude(session_id: str, question: str, context: str):
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
+def _query_matrix(cached, query_vector):
+    if query_vector.shape[-1] != cached.index.d:
+        raise ValueError(
+            f"Project '{cached.project_name}' was indexed with {cached.index.d}-dimensional embeddings "
+            f"but the embedding provider produces {query_vector.shape[-1]}; re-ingest it"
+        )
+    return query_vector.reshape(1, -1)
+
 
-    history = chat_sessions[session_id]
+def _build_chat_prompt(history: list, question: str, context: str):
+    """Build the prompt for a question following the chat *history*.
+
+    Earlier turns are replayed as plain questions and answers; only the
+    current question carries repository context.
+    """
 
     system_instruction = """You are a senior software engineer analyzing a repository.
 
@@ -61,50 +77,350 @@ User Question:
     # Add current question
     full_prompt += f"\nUser: {user_message}\n\nAssistant:"
 
-    try:
-        answer = generate_response(full_prompt)
+    return full_prompt
 
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": answer})
-        chat_sessions[session_id] = history[-MAX_HISTORY:]
 
-        return answer
-    except Exception as e:
-        return f"Error: {str(e)}"
+def _record_turn(session_id: str, question: str, answer: str):
+    session_store.add_turn(session_id, question, answer)
 
 
-def query_codebase(project_name: str, session_id: str, query: str, top_k: int = 10):
+def _fetch_count(cached, k: int):
+    """*k*, plus room for the stale vectors an index that can't delete
+    (HNSW) may return in place of live chunks."""
+    if not cached.stale_vectors:
+        return k
+    return min(cached.index.ntotal, k + min(cached.stale_vectors, k * STALE_OVERFETCH_FACTOR))
 
-    index_path = get_index_path(project_name)
-    chunks_path = get_chunks_path(project_name)
 
-    if not os.path.exists(index_path):
-        return f"Index not found for project '{project_name}'. Please ingest first."
+def _search_chunks(cached, query_vector, top_k: int, nprobe: int = None, ef_search: int = None,
+                   query: str = None):
+    """Top chunks for a query vector, fused with BM25 matches on *query*'s
+    identifiers when the project has a lexical index."""
+    lexical = cached.lexical if HYBRID_SEARCH_ENABLED and query else None
+    candidates = top_k * HYBRID_CANDIDATES if lexical is not None else top_k
 
-    index = faiss.read_index(index_path)
+    distances, indices = search(cached.index, _query_matrix(cached, query_vector), _fetch_count(cached, candidates),
+                                nprobe=nprobe, ef_search=ef_search)
 
-    with open(chunks_path, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
+    if lexical is None:
+        return _chunks_by_id(cached.chunks, indices[0])[:top_k]
 
-    query_vector = embed_text(query).reshape(1, EMBED_DIM)
+    vector_ids = [int(idx) for idx in indices[0] if idx >= 0]
+    lexical_ids, _ = lexical.search(query, candidates)
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids.tolist()], k=RRF_K)
+    return _chunks_by_id(cached.chunks, fused)[:top_k]
 
-    distances, indices = index.search(query_vector, top_k)
 
+def _chunks_by_id(chunks, ids):
     retrieved_chunks = []
-    for idx in indices[0]:
-        if idx < len(chunks):
-            retrieved_chunks.append(chunks[idx]["content"])
-
-    if not retrieved_chunks:
-        return "No relevant code found."
-
-    combined_context = "\n\n".join(retrieved_chunks)
+    for idx in ids:
+        if not 0 <= idx < len(chunks):
+            continue
+        chunk = chunks[idx]
+        # ids of chunks removed by an incremental re-ingest map to None
+        if chunk is not None:
+            chunk["id"] = int(idx)
+            retrieved_chunks.append(chunk)
+    return retrieved_chunks
+
+
+def retrieve_chunks(project_name: str, query: str, top_k: int = 10,
+                    nprobe: int = None, ef_search: int = None):
+    """Embed *query* and return the top matching chunk dicts (each tagged with
+    its chunk ``id``), or None if the project has not been ingested."""
+    cached = index_cache.get(project_name)
+
+    if cached is None:
+        return None
+
+    return _search_chunks(cached, embed_text(query), top_k, nprobe, ef_search, query)
+
+
+def _search_project(project_name: str, query_vector, query: str, candidates: int,
+                    nprobe: int = None, ef_search: int = None):
+    """Scored vector and BM25 hits of one project for a federated search, or
+    None if the project has not been ingested. Scores are higher-is-better."""
+    cached = index_cache.get(project_name)
+
+    if cached is None:
+        return None
+
+    distances, indices = search(cached.index, _query_matrix(cached, query_vector), _fetch_count(cached, candidates),
+                                nprobe=nprobe, ef_search=ef_search)
+    sign = 1.0 if cached.index.metric_type == faiss.METRIC_INNER_PRODUCT else -1.0
+    vector_hits = [(sign * float(distance), int(idx)) for distance, idx in zip(distances[0], indices[0]) if idx >= 0]
+
+    lexical_hits = []
+    if HYBRID_SEARCH_ENABLED and cached.lexical is not None:
+        ids, scores = cached.lexical.search(query, candidates)
+        lexical_hits = list(zip(scores.tolist(), ids.tolist()))
+
+    return cached, vector_hits, lexical_hits
+
+
+def search_projects(project_names, query: str, top_k: int = 10, nprobe: int = None, ef_search: int = None):
+    """Search several projects with one query embedding.
+
+    Each project's resident index is searched in parallel (nothing is copied
+    or merged into a combined index). Vector hits from all projects are
+    ranked together by distance and, with hybrid search, fused with the BM25
+    hits ranked by score. Returns ``(chunks, missing)``: the top chunk dicts,
+    each tagged with its ``project`` and fused ``score``, and the projects that
+    have not been ingested.
+    """
+    project_names = list(dict.fromkeys(project_names))
+    query_vector = embed_text(query)
+    candidates = top_k * HYBRID_CANDIDATES if HYBRID_SEARCH_ENABLED else top_k
+
+    results = list(_federated_executor.map(
+        lambda name: _search_project(name, query_vector, query, candidates, nprobe, ef_search),
+        project_names
+    ))
+
+    stores = {}
+    vector_hits, lexical_hits = [], []
+    for project_name, result in zip(project_names, results):
+        if result is None:
+            continue
+        cached, vectors, lexical = result
+        stores[project_name] = cached.chunks
+        vector_hits.extend((score, (project_name, idx)) for score, idx in vectors)
+        lexical_hits.extend((score, (project_name, idx)) for score, idx in lexical)
+
+    rankings = [[key for _, key in sorted(vector_hits, key=lambda hit: -hit[0])]]
+    if lexical_hits:
+        rankings.append([key for _, key in sorted(lexical_hits, key=lambda hit: -hit[0])])
+
+    chunks = []
+    for key, score in reciprocal_rank_fusion(rankings, k=RRF_K, with_scores=True):
+        project_name, idx = key
+        found = _chunks_by_id(stores[project_name], [idx])
+        if not found:
+            continue
+        chunk = found[0]
+        chunk["project"] = project_name
+        chunk["score"] = round(score, 6)
+        chunks.append(chunk)
+        if len(chunks) == top_k:
+            break
+
+    missing = [name for name, result in zip(project_names, results) if result is None]
+    return chunks, missing
+
+
+class _Retrieval:
+    """Chunks for a question, the session history it follows and, on an
+    answer-cache hit, the cached answer."""
+
+    def __init__(self, chunks, history, answer=None, cache_key=None, query_vector=None):
+        self.chunks = chunks
+        self.history = history
+        self.answer = answer
+        self.cache_key = cache_key
+        self.query_vector = query_vector
+
+    def store(self, answer: str):
+        # provider errors and mock fallbacks are not answers worth keeping
+        if isinstance(answer, LLMErrorMessage):
+            return
+        if answer_cache is not None and self.cache_key is not None and self.chunks:
+            answer_cache.put(self.cache_key, answer, [chunk["id"] for chunk in self.chunks], self.query_vector)
+
+
+def _retrieve(project_name: str, session_id: str, query: str, top_k: int = 10,
+              nprobe: int = None, ef_search: int = None):
+    """Load the session's history and look the question up in the answer
+    cache, falling back to embedding and search. Returns a
+    :class:`_Retrieval`, or None if the project has not been ingested.
+    Blocking; async callers run it on a worker thread."""
+    cached = index_cache.get(project_name)
+
+    if cached is None:
+        return None
+
+    history = session_store.get_history(session_id)
+    if answer_cache is None:
+        return _Retrieval(_search_chunks(cached, embed_text(query), top_k, nprobe, ef_search, query), history)
+
+    # the answer depends on the conversation so far, so the history is part of the key
+    key = answer_cache.make_key(project_name, cached.generation, query, top_k, nprobe, ef_search, history)
+    entry = answer_cache.get(key)
+    if entry is not None:
+        # same index generation, so the cached chunk ids are still valid
+        return _Retrieval(_chunks_by_id(cached.chunks, entry.chunk_ids), history, entry.answer)
+
+    query_vector = embed_text(query)
+    chunks = _search_chunks(cached, query_vector, top_k, nprobe, ef_search, query)
+    if chunks:
+        entry = answer_cache.get_similar(key, [chunk["id"] for chunk in chunks], query_vector)
+        if entry is not None:
+            return _Retrieval(chunks, history, entry.answer)
+
+    return _Retrieval(chunks, history, cache_key=key, query_vector=query_vector)
+
+
+def _combine_context(project_name: str, retrieved_chunks: list):
+    # label each chunk with its location so answers can cite file and lines
+    combined_context = "\n\n".join(
+        (f"Project: {chunk['project']}\n" if "project" in chunk else "")
+        + f"File: {chunk['file_path']} (Lines {chunk['start_line']}-{chunk['end_line']})\n{chunk['content']}"
+        for chunk in retrieved_chunks
+    )
     combined_context = combined_context[:MAX_CONTEXT_CHARS]
 
     print("Project:", project_name)
     print("Retrieved chunks:", len(retrieved_chunks))
     print("Context length:", len(combined_context))
 
-    answer = ask_claude(session_id, query, combined_context)
+    return combined_context
+
+
+def query_codebase(project_name: str, session_id: str, query: str, top_k: int = 10,
+                   nprobe: int = None, ef_search: int = None):
+
+    retrieval = _retrieve(project_name, session_id, query, top_k, nprobe, ef_search)
+
+    if retrieval is None:
+        return f"Index not found for project '{project_name}'. Please ingest first."
+
+    if not retrieval.chunks:
+        return "No relevant code found."
+
+    combined_context = _combine_context(project_name, retrieval.chunks)
+    full_prompt = _build_chat_prompt(retrieval.history, query, combined_context)
+
+    if retrieval.answer is None:
+        try:
+            answer = generate_response(full_prompt)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        retrieval.store(answer)
+    else:
+        answer = retrieval.answer
+
+    _record_turn(session_id, query, answer)
+    return answer
+
+
+async def query_codebase_async(project_name: str, session_id: str, query: str, top_k: int = 10,
+                               nprobe: int = None, ef_search: int = None):
+    """Async variant of :func:`query_codebase` for the request path.
+
+    Session history, embedding and FAISS search run on a worker thread and
+    the LLM call is awaited, so the event loop stays free while the model is
+    answering and while the session store waits on disk.
+    """
+    retrieval = await _in_worker(_retrieve, project_name, session_id, query, top_k, nprobe, ef_search)
+
+    if retrieval is None:
+        return f"Index not found for project '{project_name}'. Please ingest first."
+
+    if not retrieval.chunks:
+        return "No relevant code found."
+
+    combined_context = _combine_context(project_name, retrieval.chunks)
+    full_prompt = _build_chat_prompt(retrieval.history, query, combined_context)
+
+    if retrieval.answer is None:
+        try:
+            answer = await generate_response_async(full_prompt)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        retrieval.store(answer)
+    else:
+        answer = retrieval.answer
+
+    # the SQLite session store blocks on disk and locks
+    await _in_worker(_record_turn, session_id, query, answer)
+    return answer
+
+
+async def query_projects_async(project_names, session_id: str, query: str, top_k: int = 10,
+                               nprobe: int = None, ef_search: int = None):
+    """Answer *query* from several projects at once (see :func:`search_projects`).
+
+    Returns ``(answer, sources, missing)``. The turn is recorded only when a
+    *session_id* is given. Federated answers bypass the answer cache, whose
+    entries are scoped to a single project's index.
+    """
+    chunks, missing = await _in_worker(search_projects, project_names, query, top_k, nprobe, ef_search)
+
+    if not chunks:
+        if len(missing) == len(set(project_names)):
+            return "No ingested projects to search. Please ingest first.", [], missing
+        return "No relevant code found.", [], missing
+
+    history = await _in_worker(session_store.get_history, session_id)
+    combined_context = _combine_context(", ".join(dict.fromkeys(project_names)), chunks)
+    full_prompt = _build_chat_prompt(history, query, combined_context)
+
+    try:
+        answer = await generate_response_async(full_prompt)
+    except Exception as e:
+        return f"Error: {str(e)}", [], missing
+
+    if session_id:
+        await _in_worker(_record_turn, session_id, query, answer)
+    return answer, [_source_info(chunk) for chunk in chunks], missing
+
+
+def _source_info(chunk: dict):
+    info = {
+        "id": chunk.get("id"),
+        "file_path": chunk.get("file_path") or chunk.get("file"),
+        "start_line": chunk.get("start_line"),
+        "end_line": chunk.get("end_line"),
+    }
+    if "project" in chunk:
+        info["project"] = chunk["project"]
+        info["score"] = chunk["score"]
+    return info
+
+
+async def stream_query_codebase(project_name: str, session_id: str, query: str, top_k: int = 10,
+                                nprobe: int = None, ef_search: int = None):
+    """Answer *query* as a stream of ``(event, data)`` pairs.
+
+    Emits ``sources`` with the retrieved chunk locations as soon as search
+    finishes, then one ``token`` event per text delta from the model, and
+    finally ``done``. The turn is added to the chat history only once the
+    model has finished, so an abandoned stream leaves no half answer behind.
+    """
+    retrieval = await _in_worker(_retrieve, project_name, session_id, query, top_k, nprobe, ef_search)
+
+    if retrieval is None:
+        yield "error", {"message": f"Index not found for project '{project_name}'. Please ingest first."}
+        return
+
+    if not retrieval.chunks:
+        yield "error", {"message": "No relevant code found."}
+        return
+
+    yield "sources", [_source_info(chunk) for chunk in retrieval.chunks]
+
+    combined_context = _combine_context(project_name, retrieval.chunks)
+    full_prompt = _build_chat_prompt(retrieval.history, query, combined_context)
+
+    if retrieval.answer is not None:
+        # cached answers arrive as a single token
+        yield "token", {"text": retrieval.answer}
+        await _in_worker(_record_turn, session_id, query, retrieval.answer)
+        yield "done", {"length": len(retrieval.answer), "cached": True}
+        return
+
+    parts = []
+    try:
+        async for text in stream_response_async(full_prompt):
+            parts.append(text)
+            yield "token", {"text": text}
+    except Exception as e:
+        yield "error", {"message": f"Error: {str(e)}"}
+        return
+
+    answer = "".join(parts)
+    if any(isinstance(part, LLMErrorMessage) for part in parts):
+        answer = LLMErrorMessage(answer)
+    retrieval.store(answer)
+    await _in_worker(_record_turn, session_id, query, answer)
 
-    return answer
\ No newline at end of file
+    yield "done", {"length": len(answer)}
@@ -0,0 +1,167 @@
+"""
+Repository acquisition.
+
+Every source repository gets one bare, blobless mirror under
+REPO_MIRROR_PATH, keyed by its URL and refreshed with ``git fetch``, so a
+re-ingest only downloads new commits. Projects are git worktrees of their
+mirror checked out directly into ``data/repos/<project>`` (nothing is cloned
+to a temp dir and copied), optionally with a sparse checkout so only the
+files ingestion reads are materialized; with a blobless mirror only those
+blobs are ever downloaded. Anything that needs the whole repository's file
+list (such as the ``/file-tree`` endpoint) reads it from git with
+:func:`list_files` rather than from the sparse working tree.
+
+Sources may be remote URLs, ``file://`` URLs or local repository paths.
+"""
+import hashlib
+import os
+import re
+import shutil
+import stat
+import subprocess
+import threading
+from pathlib import Path
+
+from app.config import REPO_MIRROR_PATH, GIT_TIMEOUT_SECONDS
+
+# keeps the checked-out commit reachable so gc on the mirror can't drop it
+CHECKOUT_REF = "refs/devsense/head"
+
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+
+
+def run_git(args, cwd=None, timeout=GIT_TIMEOUT_SECONDS):
+    return subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+
+
+def _check(result, action):
+    if result.returncode != 0:
+        raise Exception(f"Git {action} failed: {result.stderr.strip()}")
+    return result
+
+
+def remove_tree(path: Path):
+    """Delete a directory tree, clearing read-only bits (git object files on
+    Windows) instead of sleeping and retrying."""
+    def on_error(func, failed_path, _):
+        os.chmod(failed_path, stat.S_IWRITE)
+        func(failed_path)
+
+    if path.exists():
+        shutil.rmtree(path, onerror=on_error)
+
+
+def normalize_source(repo_url: str):
+    """Local directories become absolute ``file://`` URLs; anything else is
+    passed to git unchanged."""
+    if "://" not in repo_url and os.path.isdir(repo_url):
+        return Path(repo_url).resolve().as_uri()
+    return repo_url.rstrip("/")
+
+
+def mirror_path(repo_url: str):
+    source = normalize_source(repo_url)
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", source.rsplit("/", 1)[-1])
+    if name.endswith(".git"):
+        name = name[:-4]
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return Path(REPO_MIRROR_PATH) / f"{name}-{digest}.git"
+
+
+def _mirror_lock(path: Path):
+    with _mirror_locks_lock:
+        return _mirror_locks.setdefault(str(path), threading.Lock())
+
+
+def _clone_mirror(source: str, mirror: Path):
+    tmp_path = mirror.with_name(mirror.name + ".tmp")
+    remove_tree(tmp_path)
+    mirror.parent.mkdir(parents=True, exist_ok=True)
+    _check(run_git(["clone", "--bare", "--filter=blob:none", source, str(tmp_path)]), "clone")
+    os.replace(tmp_path, mirror)
+
+
+def refresh_mirror(repo_url: str):
+    """Create or update the repository's mirror. Returns ``(mirror path, commit)``
+    of the remote's default branch."""
+    source = normalize_source(repo_url)
+    mirror = mirror_path(repo_url)
+
+    with _mirror_lock(mirror):
+        if not mirror.exists():
+            print(f"Creating mirror of {source} at {mirror}")
+            _clone_mirror(source, mirror)
+            commit = _check(run_git(["rev-parse", "HEAD"], cwd=mirror), "rev-parse").stdout.strip()
+        else:
+            result = run_git(["fetch", "--filter=blob:none", "--no-tags", source, "HEAD"], cwd=mirror)
+            if result.returncode != 0:
+                print(f"Git fetch into mirror failed, re-cloning it: {result.stderr.strip()}")
+                remove_tree(mirror)
+                _clone_mirror(source, mirror)
+                commit = _check(run_git(["rev-parse", "HEAD"], cwd=mirror), "rev-parse").stdout.strip()
+            else:
+                commit = _check(run_git(["rev-parse", "FETCH_HEAD"], cwd=mirror), "rev-parse").stdout.strip()
+
+        _check(run_git(["update-ref", CHECKOUT_REF, commit], cwd=mirror), "update-ref")
+
+    return mirror, commit
+
+
+def _is_worktree_of(project_path: Path, mirror: Path):
+    git_file = project_path / ".git"
+    if not git_file.is_file():
+        return False
+    try:
+        gitdir = git_file.read_text(encoding="utf-8").strip()
+    except OSError:
+        return False
+    if not gitdir.startswith("gitdir:"):
+        return False
+    worktree_dir = Path(gitdir[len("gitdir:"):].strip())
+    return worktree_dir.exists() and worktree_dir.resolve().parent.parent == mirror.resolve()
+
+
+def checkout_repository(repo_url: str, project_path: Path, sparse_patterns=None):
+    """Check out the latest commit of *repo_url* into *project_path* as a
+    worktree of its mirror, limited to *sparse_patterns* (gitignore-style)
+    when given. Returns the commit checked out."""
+    mirror, commit = refresh_mirror(repo_url)
+
+    if not _is_worktree_of(project_path, mirror):
+        # a project re-pointed at another repo, or a checkout from before mirrors
+        remove_tree(project_path)
+        project_path.parent.mkdir(parents=True, exist_ok=True)
+        with _mirror_lock(mirror):
+            run_git(["worktree", "prune"], cwd=mirror)
+            _check(run_git(
+                ["worktree", "add", "--no-checkout", "--detach", str(project_path.resolve()), commit],
+                cwd=mirror
+            ), "worktree add")
+
+    if sparse_patterns:
+        _check(run_git(["sparse-checkout", "set", "--no-cone", *sparse_patterns], cwd=project_path), "sparse-checkout")
+    else:
+        run_git(["sparse-checkout", "disable"], cwd=project_path)
+
+    _check(run_git(["checkout", "--detach", "--force", commit], cwd=project_path), "checkout")
+    return commit
+
+
+def list_files(project_path: Path):
+    """Paths of every file in the commit checked out at *project_path*,
+    including those a sparse checkout leaves out of the working tree, or None
+    if *project_path* is not a git checkout. Only tree objects are read, so
+    a blobless mirror downloads nothing."""
+    if not (project_path / ".git").exists():
+        return None
+    result = run_git(["ls-tree", "-r", "--name-only", "-z", "HEAD"], cwd=project_path)
+    if result.returncode != 0:
+        return None
+    return [path for path in result.stdout.split("\0") if path]
@@ -1,24 +1,28 @@
-import faiss
 import numpy as np
-import os
-import json
 
-BASE_INDEX_DIR = "data/indexes"
-BASE_METADATA_DIR = "data/metadata"
-EMBED_DIM = 1536  # Titan embedding dimension
+from app.index_cache import index_cache
+from app import index_factory
+from app.chunk_store import write_chunk_store
+from app.lexical_index import build_from_chunks
+from app.generations import current_generation, begin_generation, discard_generation, publish_generation
+from app.embeddings import EMBED_DIM
 
 
 def _make_paths(project_name: str):
-    name = project_name or "default"
-    index_path = os.path.join(BASE_INDEX_DIR, f"{name}.index")
-    metadata_path = os.path.join(BASE_METADATA_DIR, f"{name}.json")
-    return index_path, metadata_path
+    """Index path and chunk store prefix of the project's published
+    generation, or None for both if it has none."""
+    generation = current_generation(project_name or "default")
+    if generation is None:
+        return None, None
+    return str(generation.index_path), str(generation.chunks_prefix)
 
 
 class VectorStore:
-    def __init__(self, project_name: str = None):
+    def __init__(self, project_name: str = None, index_type: str = "flat", quantization: str = "none"):
         self.project_name = project_name or "default"
-        self.index = faiss.IndexFlatL2(EMBED_DIM)
+        self.index_type = index_type
+        self.quantization = quantization
+        self.index, _ = index_factory.build_index(EMBED_DIM, 0, "flat")
         self.metadata = []
 
     # ----------------------------
@@ -40,44 +44,49 @@ class VectorStore:
                 f"does not match expected {EMBED_DIM}"
             )
 
-        # reset to prevent stacking old vectors
-        self.index.reset()
+        # start from a fresh index to prevent stacking old vectors; the
+        # previous one may be shared through the index cache
+        self.index, _ = index_factory.build_index(EMBED_DIM, len(vectors), self.index_type, self.quantization)
         self.metadata = []
 
-        self.index.add(vectors)
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self.index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
         self.metadata.extend(chunks)
 
     # ----------------------------
     # SAVE
     # ----------------------------
     def save(self):
-        os.makedirs(BASE_INDEX_DIR, exist_ok=True)
-        os.makedirs(BASE_METADATA_DIR, exist_ok=True)
-
-        idx_path, meta_path = _make_paths(self.project_name)
-
-        faiss.write_index(self.index, idx_path)
+        # written as a new generation, so readers never see a partial save
+        staging = begin_generation(self.project_name)
+        try:
+            index_factory.write_index(self.index, staging.index_path)
+            build_from_chunks(self.metadata).write(staging.lexical_path, len(self.metadata))
+            write_chunk_store(staging.chunks_prefix, self.metadata)
+            publish_generation(staging)
+        except BaseException:
+            discard_generation(staging)
+            raise
 
-        with open(meta_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f)
+        index_cache.invalidate(self.project_name)
 
     # ----------------------------
     # LOAD
     # ----------------------------
     def load(self):
-        idx_path, meta_path = _make_paths(self.project_name)
-
-        if os.path.exists(idx_path):
-            self.index = faiss.read_index(idx_path)
+        # served from the process-wide cache; the index and metadata are
+        # shared with other readers and must not be mutated in place
+        cached = index_cache.get(self.project_name)
 
-        if os.path.exists(meta_path):
-            with open(meta_path, "r", encoding="utf-8") as f:
-                self.metadata = json.load(f)
+        if cached is not None:
+            self.index = cached.index
+            self.metadata = cached.chunks
 
     # ----------------------------
     # SEARCH
     # ----------------------------
-    def search(self, query_embedding, top_k=4):
+    def search(self, query_embedding, top_k=4, nprobe=None, ef_search=None):
 
         if self.index.ntotal == 0:
             return []
@@ -91,13 +100,13 @@ class VectorStore:
             )
 
         try:
-            distances, indices = self.index.search(query_vector, top_k)
+            distances, indices = index_factory.search(self.index, query_vector, top_k, nprobe, ef_search)
         except Exception as exc:
             raise RuntimeError(f"FAISS search failed: {exc}")
 
         results = []
         for idx in indices[0]:
-            if 0 <= idx < len(self.metadata):
+            if 0 <= idx < len(self.metadata) and self.metadata[idx] is not None:
                 results.append(self.metadata[idx])
 
         return results
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+Deterministic fixture repositories with labeled questions.
+
+Each fixture is generated from a seed: Python and JavaScript modules grouped
+by domain, every function documented in prose, and one question per
+function paraphrasing that documentation. A question is answered by the
+chunk of the expected file whose line span covers the function, so the
+labels follow the generated code exactly and recall can be measured at
+chunk granularity.
+
+Every (domain, entity, action) triple appears once across a fixture, so
+each question has a single correct location.
+"""
+import os
+import random
+import subprocess
+from pathlib import Path
+
+SEED = 1729
+
+DOMAINS = [
+    "billing", "auth", "inventory", "shipping", "search", "notifications",
+    "analytics", "payments", "reports", "accounts", "orders", "catalog",
+]
+
+ENTITIES = [
+    "invoice", "token", "session", "product", "parcel", "query", "email",
+    "metric", "refund", "report", "profile", "cart", "coupon", "webhook",
+    "schedule", "warehouse",
+]
+
+MODULE_KINDS = ["service", "handlers", "store", "jobs", "utils"]
+
+# action -> (docstring, question); both formatted with domain and entity
+ACTIONS = {
+    "validate": (
+        "Check that a {entity} submitted to {domain} has every required field before it is accepted.",
+        "Where do we make sure a {domain} {entity} has all of its required fields?",
+    ),
+    "serialize": (
+        "Convert a {entity} into a JSON payload for the {domain} API.",
+        "How is a {entity} turned into JSON for the {domain} endpoints?",
+    ),
+    "archive": (
+        "Move closed {entity} records of {domain} into cold storage.",
+        "Which code moves old {domain} {entity} records to cold storage?",
+    ),
+    "expire": (
+        "Mark a {entity} as expired once its {domain} retention window has passed.",
+        "When does a {entity} in {domain} get marked as expired?",
+    ),
+    "reconcile": (
+        "Compare {domain} {entity} totals with the ledger and report any mismatch.",
+        "How do we find mismatches between {entity} totals and the ledger in {domain}?",
+    ),
+    "notify": (
+        "Send the owner of a {entity} a {domain} notification about its status.",
+        "Where are owners told about status changes of a {domain} {entity}?",
+    ),
+    "compute": (
+        "Compute the aggregate score of all {entity} entries for a {domain} dashboard.",
+        "How is the dashboard score of {entity} entries calculated for {domain}?",
+    ),
+    "merge": (
+        "Merge duplicate {entity} entries in {domain}, keeping the newest values.",
+        "What combines duplicate {domain} {entity} entries?",
+    ),
+    "retry": (
+        "Retry a failed {domain} {entity} operation with exponential backoff.",
+        "Where is a failed {entity} operation retried with backoff in {domain}?",
+    ),
+    "throttle": (
+        "Limit how many {entity} requests a client may send to {domain} per minute.",
+        "How are clients rate limited when sending {entity} requests to {domain}?",
+    ),
+    "import": (
+        "Load {entity} rows from a CSV export into {domain}.",
+        "Which function reads a CSV file of {entity} rows into {domain}?",
+    ),
+    "export": (
+        "Write every {domain} {entity} to a CSV file for download.",
+        "How can {domain} {entity} data be downloaded as CSV?",
+    ),
+    "lock": (
+        "Acquire an exclusive lock on a {entity} while {domain} updates it.",
+        "Where does {domain} take an exclusive lock on a {entity}?",
+    ),
+    "audit": (
+        "Record who changed a {entity} and when in the {domain} audit trail.",
+        "How are changes to a {entity} written to the {domain} audit trail?",
+    ),
+    "schedule": (
+        "Queue a background job that refreshes a {entity} in {domain} every night.",
+        "Which code queues the nightly refresh of {domain} {entity} data?",
+    ),
+    "encrypt": (
+        "Encrypt the sensitive fields of a {entity} before {domain} stores it.",
+        "Where are sensitive {entity} fields encrypted before {domain} saves them?",
+    ),
+}
+
+PY_BODIES = [
+    [
+        "records = [item for item in (store or []) if item.get(\"{entity}_id\") == {entity}.get(\"id\")]",
+        "if not records:",
+        "    return None",
+        "return sorted(records, key=lambda item: item.get(\"updated_at\", 0))[-1]",
+    ],
+    [
+        "result = dict({entity})",
+        "result[\"domain\"] = \"{domain}\"",
+        "result[\"version\"] = result.get(\"version\", 0) + 1",
+        "return result",
+    ],
+    [
+        "total = 0",
+        "for item in (store or []):",
+        "    total += item.get(\"amount\", 0)",
+        "return {{\"{entity}\": {entity}.get(\"id\"), \"total\": total}}",
+    ],
+]
+
+JS_BODIES = [
+    [
+        "const records = (store || []).filter((item) => item.{entity}Id === {entity}.id);",
+        "if (records.length === 0) {{",
+        "  return null;",
+        "}}",
+        "return records.sort((a, b) => a.updatedAt - b.updatedAt).pop();",
+    ],
+    [
+        "const result = {{ ...{entity}, domain: '{domain}' }};",
+        "result.version = (result.version || 0) + 1;",
+        "return result;",
+    ],
+]
+
+SIZES = {
+    "small": 40,
+    "medium": 400,
+    "large": 960,
+}
+
+JS_SHARE = 0.25  # fraction of modules written as JavaScript
+
+
+def _camel(*words):
+    return words[0] + "".join(word.capitalize() for word in words[1:])
+
+
+class Question:
+    def __init__(self, text, file_path, start_line, end_line):
+        self.text = text
+        self.file_path = file_path
+        self.start_line = start_line
+        self.end_line = end_line
+
+    def to_dict(self):
+        return {
+            "question": self.text,
+            "file_path": self.file_path,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+        }
+
+
+class Fixture:
+    """A generated repository: its files (path -> text) and labeled questions."""
+
+    def __init__(self, name, files, questions):
+        self.name = name
+        self.files = files
+        self.questions = questions
+
+    def write(self, path: Path):
+        """Write the fixture as a single-commit git repository at *path*.
+
+        Author, committer and dates are fixed so the commit id is the same
+        on every run.
+        """
+        path = Path(path)
+        for rel_path, text in self.files.items():
+            target = path / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(text, encoding="utf-8")
+
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@example.com",
+            GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@example.com",
+            GIT_AUTHOR_DATE="2024-01-01T00:00:00Z", GIT_COMMITTER_DATE="2024-01-01T00:00:00Z",
+        )
+        for args in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", f"{self.name} fixture"]):
+            subprocess.run(["git", *args], cwd=path, env=env, check=True, capture_output=True)
+        return path
+
+
+def _render_python(domain, entity, kind, actions, imports, rng):
+    lines = [f'"""{domain.capitalize()} {entity} {kind}."""']
+    for module, function in imports:
+        lines.append(f"from src.{domain}.{module} import {function}")
+    lines.append("")
+
+    spans = []
+    for action in actions:
+        doc = ACTIONS[action][0].format(domain=domain, entity=entity)
+        body = rng.choice(PY_BODIES)
+        lines += ["", ""]
+        start = len(lines) + 1
+        lines.append(f"def {action}_{entity}({entity}, store=None):")
+        lines.append(f'    """{doc}"""')
+        lines += ["    " + line.format(domain=domain, entity=entity) for line in body]
+        spans.append((action, start, len(lines)))
+    return "\n".join(lines) + "\n", spans
+
+
+def _render_js(domain, entity, kind, actions, imports, rng):
+    lines = [f"// {domain.capitalize()} {entity} {kind}."]
+    for module, function in imports:
+        lines.append(f"import {{ {function} }} from './{module}';")
+    lines.append("")
+
+    spans = []
+    for action in actions:
+        doc = ACTIONS[action][0].format(domain=domain, entity=entity)
+        body = rng.choice(JS_BODIES)
+        lines.append("")
+        start = len(lines) + 1
+        lines.append("/**")
+        lines.append(f" * {doc}")
+        lines.append(" */")
+        lines.append(f"export function {_camel(action, entity)}({entity}, store) {{")
+        lines += ["  " + line.format(domain=domain, entity=entity) for line in body]
+        lines.append("}")
+        spans.append((action, start, len(lines)))
+    return "\n".join(lines) + "\n", spans
+
+
+def generate_fixture(name: str, seed: int = SEED):
+    """Build the fixture *name* (one of SIZES) in memory."""
+    rng = random.Random(f"{seed}-{name}")
+    modules = [(d, e, k) for d in DOMAINS for e in ENTITIES for k in MODULE_KINDS]
+    modules = sorted(rng.sample(modules, SIZES[name]))
+
+    # each (domain, entity) pair spreads a shuffled action list over its kinds
+    action_order = {}
+    per_module = len(ACTIONS) // len(MODULE_KINDS)
+
+    files = {}
+    questions = []
+    exported = {}
+    for domain, entity, kind in modules:
+        pair = (domain, entity)
+        if pair not in action_order:
+            action_order[pair] = rng.sample(sorted(ACTIONS), len(ACTIONS))
+        slot = MODULE_KINDS.index(kind)
+        actions = action_order[pair][slot * per_module:(slot + 1) * per_module]
+
+        javascript = rng.random() < JS_SHARE
+        siblings = exported.get((domain, javascript), [])
+        imports = rng.sample(siblings, min(len(siblings), rng.randint(0, 2)))
+
+        if javascript:
+            module = _camel(entity, kind)
+            rel_path = f"web/{domain}/{module}.js"
+            text, spans = _render_js(domain, entity, kind, actions, imports, rng)
+            functions = [_camel(action, entity) for action in actions]
+        else:
+            module = f"{entity}_{kind}"
+            rel_path = f"src/{domain}/{module}.py"
+            text, spans = _render_python(domain, entity, kind, actions, imports, rng)
+            functions = [f"{action}_{entity}" for action in actions]
+
+        files[rel_path] = text
+        exported.setdefault((domain, javascript), []).append((module, functions[0]))
+        for action, start, end in spans:
+            question = ACTIONS[action][1].format(domain=domain, entity=entity)
+            questions.append(Question(question, rel_path, start, end))
+
+    for domain in sorted({domain for domain, _, _ in modules}):
+        if f"src/{domain}/__init__.py" not in files and any(path.startswith(f"src/{domain}/") for path in files):
+            files[f"src/{domain}/__init__.py"] = ""
+    files["README.md"] = f"# {name} fixture\n\nGenerated benchmark repository ({len(modules)} modules).\n"
+    return Fixture(name, files, questions)
@@ -0,0 +1,355 @@
+"""
+Retrieval quality and latency benchmark.
+
+Ingests the generated fixture repositories (see :mod:`benchmarks.fixtures`)
+with the offline hashing embedding provider (see
+:mod:`app.embeddings_hashing`) and a stubbed LLM, so it needs neither
+network nor credentials, then measures:
+
+- ingest: wall time, files/s, chunks/s and peak RSS of a full build (run in
+  a child process so the peak is its own), plus a no-op re-ingest
+- latency percentiles of ``VectorStore.search``, ``retrieve_chunks`` and
+  ``query_codebase`` (answer cache cold and warm), in milliseconds
+- recall@k and MRR of ``retrieve_chunks`` against the labeled questions: a
+  hit is a chunk of the expected file overlapping the expected function
+
+Results are written as JSON. With ``--baseline`` they are compared with an
+earlier run and the process exits 1 on a regression, so CI can gate changes
+to index types, chunkers or caches::
+
+    python -m benchmarks.run --fixtures small medium --output bench.json
+    python -m benchmarks.run --baseline bench.json
+
+Run it from ``devsense-backend``; all data is written under a temporary
+working directory. Settings from the environment (INDEX_TYPE, EMBED_DIM,
+CHUNK_MAX_TOKENS, HYBRID_SEARCH_ENABLED, ...) apply as usual.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.fixtures import SIZES, generate_fixture
+
+FORMAT_VERSION = 1
+RECALL_AT = (1, 5, 10)
+PERCENTILES = (50, 90, 95, 99)
+STUB_ANSWER = "benchmark answer"
+
+# relative change tolerated before --baseline reports a regression
+DEFAULT_TOLERANCE = {
+    "quality": 0.0,      # deterministic, so any drop counts
+    "throughput": 0.25,
+    "latency": 0.25,
+    "memory": 0.15,
+}
+
+
+def _setup_environment():
+    # must happen before app modules read their settings at import time
+    os.environ["USE_BEDROCK"] = "false"
+    os.environ["EMBED_PROVIDER"] = "hashing"
+
+
+def _install_stubs():
+    from app import query_engine
+
+    query_engine.generate_response = lambda prompt: STUB_ANSWER
+
+
+def _peak_rss_mb(children=False):
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _ingest_worker(workdir, repo_path, project_name, index_type, quantization):
+    """Full ingest followed by a no-op re-ingest, in a fresh process."""
+    os.chdir(workdir)
+    _setup_environment()
+    with contextlib.redirect_stdout(sys.stderr):
+        _install_stubs()
+        from app.ingestion import ingest_repository
+
+        kwargs = {}
+        if index_type:
+            kwargs["index_type"] = index_type
+        if quantization:
+            kwargs["quantization"] = quantization
+
+        start = time.perf_counter()
+        result = ingest_repository(repo_path, project_name, incremental=False, **kwargs)
+        seconds = time.perf_counter() - start
+        peak_rss_mb = _peak_rss_mb()
+
+        start = time.perf_counter()
+        ingest_repository(repo_path, project_name, incremental=True)
+        reingest_seconds = time.perf_counter() - start
+
+    return {
+        "result": result,
+        "seconds": seconds,
+        "reingest_seconds": reingest_seconds,
+        "peak_rss_mb": peak_rss_mb,
+        "peak_rss_workers_mb": _peak_rss_mb(children=True),
+    }
+
+
+def _ingest(workdir, repo_path, project_name, index_type, quantization, file_count):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        run = executor.submit(
+            _ingest_worker, str(workdir), str(repo_path), project_name, index_type, quantization
+        ).result()
+
+    result = run["result"]
+    chunks = result.get("chunk_count", 0)
+    return {
+        "files": file_count,
+        "chunks": chunks,
+        "seconds": round(run["seconds"], 3),
+        "files_per_second": round(file_count / run["seconds"], 1),
+        "chunks_per_second": round(chunks / run["seconds"], 1),
+        "peak_rss_mb": run["peak_rss_mb"],
+        "peak_rss_workers_mb": run["peak_rss_workers_mb"],
+        "reingest_seconds": round(run["reingest_seconds"], 3),
+        "index": result.get("index"),
+    }
+
+
+def _summarize(samples):
+    samples = np.asarray(samples) * 1000.0
+    summary = {f"p{p}": round(float(np.percentile(samples, p)), 3) for p in PERCENTILES}
+    summary["mean"] = round(float(samples.mean()), 3)
+    summary["count"] = len(samples)
+    return summary
+
+
+def _timed(fn, args_list, repeat):
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _measure_latency(project_name, questions, top_k, repeat):
+    from app import query_engine
+    from app.embeddings import generate_embedding
+    from app.vector_store import VectorStore
+
+    store = VectorStore(project_name)
+    store.load()
+    vectors = [generate_embedding(question.text) for question in questions]
+
+    # warm-up: index load and first-touch of the mapped files
+    query_engine.retrieve_chunks(project_name, questions[0].text, top_k)
+
+    latency = {
+        "vector_store_search": _summarize(_timed(store.search, [(vector, top_k) for vector in vectors], repeat)),
+        "retrieve_chunks": _summarize(_timed(
+            query_engine.retrieve_chunks, [(project_name, question.text, top_k) for question in questions], repeat
+        )),
+    }
+
+    # a fresh session per call: answers are only cached for questions
+    # without earlier turns, and prompts don't grow with chat history
+    def calls(run):
+        return [(project_name, f"bench-{run}-{i}", question.text, top_k) for i, question in enumerate(questions)]
+
+    latency["query_codebase_cold"] = _summarize(_timed(query_engine.query_codebase, calls(0), 1))
+    latency["query_codebase_warm"] = _summarize(sum(
+        (_timed(query_engine.query_codebase, calls(run), 1) for run in range(1, repeat + 1)), []
+    ))
+    return latency
+
+
+def _measure_quality(project_name, questions, top_k):
+    from app import query_engine
+
+    depth = max(max(RECALL_AT), top_k)
+    hits = {k: 0 for k in RECALL_AT}
+    reciprocal_ranks = []
+
+    for question in questions:
+        chunks = query_engine.retrieve_chunks(project_name, question.text, depth) or []
+        rank = None
+        for position, chunk in enumerate(chunks, start=1):
+            if (chunk["file_path"] == question.file_path
+                    and chunk["start_line"] <= question.end_line
+                    and chunk["end_line"] >= question.start_line):
+                rank = position
+                break
+
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in RECALL_AT:
+            if rank is not None and rank <= k:
+                hits[k] += 1
+
+    quality = {f"recall@{k}": round(hits[k] / len(questions), 4) for k in RECALL_AT}
+    quality["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    quality["questions"] = len(questions)
+    return quality
+
+
+def run_fixture(name, workdir, args):
+    fixture = generate_fixture(name)
+    repo_path = fixture.write(workdir / "fixtures" / name)
+    project_name = f"bench-{name}"
+    code_files = sum(1 for path in fixture.files if path.endswith((".py", ".js")))
+
+    print(f"[{name}] ingesting {code_files} files", file=sys.stderr)
+    ingest = _ingest(workdir, repo_path, project_name, args.index_type, args.quantization, code_files)
+
+    questions = fixture.questions
+    if args.max_questions:
+        questions = questions[:args.max_questions]
+
+    print(f"[{name}] querying {len(questions)} questions", file=sys.stderr)
+    with contextlib.redirect_stdout(sys.stderr):
+        quality = _measure_quality(project_name, questions, args.top_k)
+        latency = _measure_latency(project_name, questions, args.top_k, args.repeat)
+
+    return {"ingest": ingest, "latency_ms": latency, "quality": quality}
+
+
+def _environment():
+    import faiss
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", None),
+    }
+
+
+def _config(args):
+    from app import config
+    from app.embeddings import get_embedding_provider
+
+    return {
+        "index_type": args.index_type or config.INDEX_TYPE,
+        "quantization": args.quantization or config.INDEX_QUANTIZATION,
+        "top_k": args.top_k,
+        "repeat": args.repeat,
+        "chunk_max_tokens": config.CHUNK_MAX_TOKENS,
+        "hybrid_search": config.HYBRID_SEARCH_ENABLED,
+        "answer_cache": config.ANSWER_CACHE_ENABLED,
+        "index_mmap": config.INDEX_MMAP,
+        "embedding": get_embedding_provider().signature(),
+    }
+
+
+# ----------------------------
+# BASELINE COMPARISON
+# ----------------------------
+def _regressions(baseline, current, tolerance):
+    """Descriptions of every metric in *current* that is worse than in
+    *baseline* by more than its tolerance."""
+    checks = []
+    for name, fixture in current["fixtures"].items():
+        base = baseline.get("fixtures", {}).get(name)
+        if base is None:
+            continue
+
+        for metric, value in fixture["quality"].items():
+            if metric != "questions":
+                checks.append((name, f"quality.{metric}", base["quality"].get(metric), value, "quality", False))
+        for metric in ("files_per_second", "chunks_per_second"):
+            checks.append((name, f"ingest.{metric}", base["ingest"].get(metric), fixture["ingest"][metric], "throughput", False))
+        checks.append((name, "ingest.peak_rss_mb", base["ingest"].get("peak_rss_mb"), fixture["ingest"]["peak_rss_mb"], "memory", True))
+        for operation, summary in fixture["latency_ms"].items():
+            base_summary = base["latency_ms"].get(operation, {})
+            checks.append((name, f"latency_ms.{operation}.p95", base_summary.get("p95"), summary["p95"], "latency", True))
+
+    failures = []
+    for name, metric, before, after, kind, lower_is_better in checks:
+        if before is None or after is None:
+            continue
+        allowed = tolerance[kind] * abs(before)
+        worse = after - before if lower_is_better else before - after
+        if worse > allowed + 1e-9:
+            failures.append(f"{name}: {metric} {before} -> {after} (tolerance {tolerance[kind]:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DevSense retrieval quality and latency benchmark")
+    parser.add_argument("--fixtures", nargs="+", choices=sorted(SIZES), default=["small", "medium"])
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results to compare against; exit 1 on regression")
+    parser.add_argument("--index-type", help="override INDEX_TYPE for the full ingest")
+    parser.add_argument("--quantization", help="override INDEX_QUANTIZATION for the full ingest")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the questions per latency measurement")
+    parser.add_argument("--max-questions", type=int, default=0, help="limit questions per fixture (0 = all)")
+    for kind, value in DEFAULT_TOLERANCE.items():
+        parser.add_argument(f"--{kind}-tolerance", type=float, default=value)
+    parser.add_argument("--workdir", help="keep working data here instead of a temporary directory")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="devsense-bench-")).resolve()
+    if args.workdir:
+        # fixtures are regenerated every run
+        shutil.rmtree(workdir / "fixtures", ignore_errors=True)
+    workdir.mkdir(parents=True, exist_ok=True)
+    output_path = Path(args.output).resolve() if args.output else None
+
+    _setup_environment()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            _install_stubs()
+        results = {
+            "format_version": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "environment": _environment(),
+            "config": _config(args),
+            "fixtures": {name: run_fixture(name, workdir, args) for name in args.fixtures},
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if output_path is not None:
+        output_path.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if baseline is not None:
+        tolerance = {kind: getattr(args, f"{kind}_tolerance") for kind in DEFAULT_TOLERANCE}
+        failures = _regressions(baseline, results, tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,8 +15,13 @@ export async function queryCodebase({ project_name, session_id, query }) {
   return res.data;
 }
 
-export async function impactAnalysis({ file_path }) {
-  const res = await API.post("/impact-analysis", { file_path });
+export async function impactAnalysis({ project_name, file_path, file_paths, max_depth }) {
+  const res = await API.post("/impact-analysis", {
+    project_name,
+    file_path,
+    file_paths,
+    max_depth,
+  });
   return res.data;
 }
 